@@ -0,0 +1,324 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from django.urls import URLPattern, URLResolver
+from foodgram.routers import primary_reads
+from recipes.autocomplete import ingredient_index
+from recipes.cache import aids, recipe_response_cache, tag_cache, version_time
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from api.authentication import CachedTokenAuthentication
+from api.conditional import async_conditional
+from api.mixins import READ_METHODS
+from api.serializers import SubscriptionRepresentationSerializer
+from api.views import (IngredientViewSet, RecipeViewSet,
+                       SubscriptionRepresentationView, TagViewSet)
+
+
+async def aprefetch_related_objects(instances, *lookups):
+    """
+    `prefetch_related_objects` for async views, run in the request
+    thread: the async ORM of Django 4.1 does not run prefetches
+    """
+    if instances and lookups:
+        await sync_to_async(prefetch_related_objects)(instances, *lookups)
+
+
+async def aserialize(serializer):
+    """
+    Serializer data, built in the request thread: the serializers read
+    the reference caches, which may rebuild themselves from the database
+    """
+    return await sync_to_async(lambda: serializer.data)()
+
+
+class AsyncReadMixin:
+    """
+    Async GET and HEAD actions of a DRF view for the ASGI deployment.
+
+    The request is authenticated, paginated and its objects are loaded
+    with the async ORM, the rest of the DRF request cycle (content
+    negotiation, permissions, replica routing, exception handling and
+    headers) is the one of the view. Other methods, and requests for
+    other renderers than JSON, are handed over to the sync view in a
+    worker thread, so one URL is served by both.
+    """
+    async_authentication = CachedTokenAuthentication()
+
+    @classmethod
+    def as_async_view(cls, action, fallback):
+        async def view(request, *args, **kwargs):
+            if request.method not in READ_METHODS:
+                return await sync_to_async(fallback)(
+                    request, *args, **kwargs
+                )
+            self = cls()
+            self.fallback = fallback
+            return await self.adispatch(action, request, *args, **kwargs)
+
+        view.cls = cls
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, action, request, *args, **kwargs):
+        with primary_reads():
+            return await self.ahandle(action, request, *args, **kwargs)
+
+    async def ahandle(self, action, request, *args, **kwargs):
+        # Handlers of a viewset are bound like ViewSetMixin.as_view does
+        self.action_map = getattr(self.fallback, 'actions', {})
+        for method, name in self.action_map.items():
+            setattr(self, method, getattr(self, name))
+        self.setup(request, *args, **kwargs)
+        django_request = request
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            self.format_kwarg = self.get_format_suffix(**kwargs)
+            renderer, media_type = self.perform_content_negotiation(request)
+            if not isinstance(renderer, JSONRenderer):
+                return await sync_to_async(self.fallback)(
+                    django_request, *args, **kwargs
+                )
+            request.accepted_renderer = renderer
+            request.accepted_media_type = media_type
+            request.user, request.auth = await self.aauthenticate(request)
+            self.check_permissions(request)
+            await self.aroute_reads(request)
+            response = await getattr(self, f'a{action}')(
+                request, *args, **kwargs
+            )
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    async def aauthenticate(self, request):
+        result = await self.async_authentication.aauthenticate(request)
+        return result or (AnonymousUser(), None)
+
+    async def afilter_queryset(self, queryset):
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def aannotate(self, objects):
+        """
+        Set per-user attributes of the loaded objects
+        """
+
+    async def aload(self, objects, lookups):
+        await asyncio.gather(
+            aprefetch_related_objects(objects, *lookups),
+            self.aannotate(objects)
+        )
+
+    async def apaginate_queryset(self, queryset):
+        page = await self.paginator.apaginate_queryset(
+            queryset.prefetch_related(None), self.request
+        )
+        await self.aload(page, queryset._prefetch_related_lookups)
+        return page
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.prefetch_related(None).aget(**{
+                self.lookup_field: self.kwargs[lookup_url_kwarg]
+            })
+        except (queryset.model.DoesNotExist, TypeError, ValueError,
+                ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        await self.aload([obj], queryset._prefetch_related_lookups)
+        return obj
+
+
+def areference_state(reference):
+    async def get_state(view, request, *args, **kwargs):
+        version, _ = await reference.aget_versioned()
+        return version, version_time(version)
+
+    return get_state
+
+
+class AsyncRecipeViewSet(AsyncReadMixin, RecipeViewSet):
+    """
+    Async list and retrieve of RecipeViewSet. Author, tags and
+    ingredients are prefetched while the flags of the current user are
+    loaded.
+    """
+    def get_queryset(self):
+        return Recipe.objects.with_related(self.request.user).defer(
+            'search_vector'
+        )
+
+    async def aannotate(self, recipes):
+        """
+        is_favorited and is_in_shopping_cart of the current user: a single
+        recipe is checked with two EXISTS queries, a page reads the ids of
+        its recipes in the favorites and the shopping cart
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            flags = [(False, False)] * len(recipes)
+        elif len(recipes) == 1:
+            recipe = recipes[0]
+            flags = [await asyncio.gather(
+                Favorite.objects.filter(user=user, recipe=recipe).aexists(),
+                ShoppingCart.objects.filter(
+                    user=user, recipe=recipe
+                ).aexists(),
+            )]
+        else:
+            ids = [recipe.pk for recipe in recipes]
+            favorites, shopping_cart = await asyncio.gather(
+                aids(Favorite.objects.filter(
+                    user=user, recipe_id__in=ids
+                ), 'recipe_id'),
+                aids(ShoppingCart.objects.filter(
+                    user=user, recipe_id__in=ids
+                ), 'recipe_id'),
+            )
+            flags = [
+                (recipe.pk in favorites, recipe.pk in shopping_cart)
+                for recipe in recipes
+            ]
+        for recipe, (favorited, in_shopping_cart) in zip(recipes, flags):
+            recipe.is_favorited = favorited
+            recipe.is_in_shopping_cart = in_shopping_cart
+
+    async def alist(self, request):
+        if not self.is_cacheable(request):
+            return await self.arender_list(request)
+        key = await recipe_response_cache.akey(*self.list_key(request))
+        return await self.acached_response(
+            request, key, functools.partial(self.arender_list, request)
+        )
+
+    async def arender_list(self, request):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        return self.get_paginated_response(
+            await aserialize(self.get_serializer(page, many=True))
+        )
+
+    async def aretrieve(self, request, pk):
+        key = await recipe_response_cache.akey(*self.detail_key(request, pk))
+        cached = await recipe_response_cache.aget(key)
+        if cached is None:
+            recipe = await self.aget_object()
+            updated_at = recipe.updated_at
+            data = await aserialize(self.get_serializer(recipe))
+            await recipe_response_cache.aset(key, (
+                updated_at, self.apply_user_flags(data, self.no_flags)
+            ))
+        else:
+            updated_at, data = cached
+            if request.user.is_authenticated:
+                data = self.apply_user_flags(
+                    data, await recipe_response_cache.auser_flags(request.user)
+                )
+        (tags_version, _), (ingredients_version, _) = await asyncio.gather(
+            tag_cache.aget_versioned(), ingredient_index.aget_versioned()
+        )
+        return self.detail_response(
+            request, pk, updated_at, data, tags_version, ingredients_version
+        )
+
+
+class AsyncIngredientViewSet(AsyncReadMixin, IngredientViewSet):
+    """
+    Async list and retrieve of IngredientViewSet
+    """
+    @async_conditional(areference_state(ingredient_index))
+    async def alist(self, request):
+        _, snapshot = await ingredient_index.aget_versioned()
+        return Response(self.search(request, snapshot))
+
+    @async_conditional(areference_state(ingredient_index))
+    async def aretrieve(self, request, pk):
+        _, snapshot = await ingredient_index.aget_versioned()
+        ingredient = ingredient_index.get(
+            int(pk), snapshot
+        ) if pk.isdigit() else None
+        if ingredient is None:
+            raise exceptions.NotFound()
+        return Response(ingredient)
+
+
+class AsyncTagViewSet(AsyncReadMixin, TagViewSet):
+    """
+    Async list and retrieve of TagViewSet
+    """
+    @async_conditional(areference_state(tag_cache))
+    async def alist(self, request):
+        _, snapshot = await tag_cache.aget_versioned()
+        return Response(tag_cache.all(snapshot))
+
+    @async_conditional(areference_state(tag_cache))
+    async def aretrieve(self, request, pk):
+        _, snapshot = await tag_cache.aget_versioned()
+        tag = tag_cache.get(int(pk), snapshot) if pk.isdigit() else None
+        if tag is None:
+            raise exceptions.NotFound()
+        return Response(tag)
+
+
+class AsyncSubscriptionRepresentationView(
+        AsyncReadMixin, SubscriptionRepresentationView):
+    """
+    Async list of SubscriptionRepresentationView
+    """
+    async def alist(self, request):
+        page = await self.apaginate_queryset(self.get_queryset())
+        return self.get_paginated_response(await aserialize(
+            SubscriptionRepresentationSerializer(
+                page, many=True, context={'request': request}
+            )
+        ))
+
+
+# URL name: async view class and the action it serves
+ASYNC_VIEWS = {
+    'recipes-list': (AsyncRecipeViewSet, 'list'),
+    'recipes-detail': (AsyncRecipeViewSet, 'retrieve'),
+    'ingredients-list': (AsyncIngredientViewSet, 'list'),
+    'ingredients-detail': (AsyncIngredientViewSet, 'retrieve'),
+    'tags-list': (AsyncTagViewSet, 'list'),
+    'tags-detail': (AsyncTagViewSet, 'retrieve'),
+    'subscription': (AsyncSubscriptionRepresentationView, 'list'),
+}
+
+
+def with_async_views(patterns):
+    """
+    Copy of the URL patterns where the routes of ASYNC_VIEWS are served
+    by their async views, with the sync views as fallback
+    """
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern, with_async_views(pattern.url_patterns),
+                pattern.default_kwargs, pattern.app_name, pattern.namespace
+            )
+        elif pattern.name in ASYNC_VIEWS:
+            view_class, action = ASYNC_VIEWS[pattern.name]
+            pattern = URLPattern(
+                pattern.pattern,
+                view_class.as_async_view(action, pattern.callback),
+                pattern.default_args, pattern.name
+            )
+        result.append(pattern)
+    return result
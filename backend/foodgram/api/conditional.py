@@ -0,0 +1,103 @@
+import functools
+import hashlib
+
+from django.utils.cache import (get_conditional_response, patch_vary_headers,
+                                quote_etag)
+from django.utils.http import http_date
+from recipes.cache import version_time
+from rest_framework import status
+
+
+def check_conditional(request, etag, last_modified):
+    """
+    Quoted ETag, Last-Modified timestamp and the 304/412 response to
+    the conditional request, None when the resource has to be sent
+    """
+    etag = quote_etag(etag)
+    timestamp = last_modified and int(last_modified.timestamp())
+    return etag, timestamp, get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+
+
+def set_conditional_headers(response, etag, timestamp, vary):
+    response.headers['ETag'] = etag
+    if timestamp:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    patch_vary_headers(response, vary)
+    return response
+
+
+def recipe_etag(user, pk, updated_at, data, tags_version,
+                ingredients_version):
+    """
+    ETag and Last-Modified of a recipe response, from the update time of
+    the recipe and the versions of the tag and ingredient tables. Flags
+    of an authenticated user in the response are part of the ETag; they
+    have no modification time, so such responses are sent without
+    Last-Modified.
+    """
+    parts = [pk, tags_version, ingredients_version, updated_at]
+    if user.is_authenticated:
+        parts += [
+            data['is_favorited'], data['is_in_shopping_cart'],
+            data['author']['is_subscribed'], user.pk,
+        ]
+        last_modified = None
+    else:
+        last_modified = max(filter(None, (
+            updated_at, version_time(tags_version),
+            version_time(ingredients_version)
+        )))
+    etag = hashlib.md5(
+        '|'.join(map(str, parts)).encode(), usedforsecurity=False
+    ).hexdigest()
+    return etag, last_modified
+
+
+def conditional(get_state, vary=()):
+    """
+    Answer conditional GET requests of a view method without calling it.
+
+    `get_state(view, request, *args, **kwargs)` returns the ETag and the
+    Last-Modified datetime (or None) of the resource, computed without
+    serializing it, or None to let the view answer by itself.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            state = get_state(self, request, *args, **kwargs)
+            if state is None:
+                return method(self, request, *args, **kwargs)
+            etag, timestamp, response = check_conditional(request, *state)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            return set_conditional_headers(response, etag, timestamp, vary)
+
+        return wrapper
+
+    return decorator
+
+
+def async_conditional(get_state, vary=()):
+    """
+    `conditional` for async view methods, `get_state` is a coroutine
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, request, *args, **kwargs):
+            state = await get_state(self, request, *args, **kwargs)
+            if state is None:
+                return await method(self, request, *args, **kwargs)
+            etag, timestamp, response = check_conditional(request, *state)
+            if response is None:
+                response = await method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            return set_conditional_headers(response, etag, timestamp, vary)
+
+        return wrapper
+
+    return decorator
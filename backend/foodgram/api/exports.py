@@ -0,0 +1,221 @@
+import csv
+
+from django.db.models import F
+
+from recipes.models import ShoppingListItem
+
+TITLE = 'Список покупок'
+ITERATOR_CHUNK_SIZE = 500
+
+PDF_FONT_SIZE = 11
+PDF_LEADING = 15
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_ENCODING = 'cp1251'
+
+
+def shopping_list_rows(user):
+    """
+    Ingredients of every recipe in the user's shopping cart with their
+    summed amounts, read from the materialized shopping list of the user
+    with a single server-side iterated query.
+    """
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit',
+        amount_sum=F('amount')
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+def format_row(row):
+    return (
+        f"{row['ingredient__name']} - "
+        f"{row['amount_sum']} {row['ingredient__measurement_unit']}"
+    )
+
+
+def render_txt(rows):
+    yield f'{TITLE}:\n'
+    for row in rows:
+        yield f'{format_row(row)}\n'
+
+
+class Echo:
+    """
+    File-like object that returns written value instead of storing it
+    """
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'amount', 'measurement_unit'])
+    for row in rows:
+        yield writer.writerow([
+            row['ingredient__name'],
+            row['amount_sum'],
+            row['ingredient__measurement_unit'],
+        ])
+
+
+def pdf_string(text):
+    encoded = text.encode(PDF_ENCODING, errors='replace')
+    return b'(' + encoded.replace(b'\\', b'\\\\').replace(
+        b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def pdf_glyph_name(char):
+    """
+    Adobe glyph name of a character: afii names for the russian
+    alphabet, which viewers substitute reliably, uniXXXX otherwise.
+    """
+    code = ord(char)
+    if char == 'Ё':
+        return 'afii10023'
+    if char == 'ё':
+        return 'afii10071'
+    if 'А' <= char <= 'я':
+        base, offset = (10017, code - ord('А')) if char <= 'Я' else (
+            10065, code - ord('а')
+        )
+        return f'afii{base + offset + (offset > 5)}'
+    return f'uni{code:04X}'
+
+
+def pdf_high_chars():
+    return [
+        (code, bytes([code]).decode(PDF_ENCODING, errors='replace'))
+        for code in range(128, 256)
+    ]
+
+
+def pdf_font(to_unicode):
+    """
+    Courier with a cp1251 encoding, so cyrillic text renders
+    without an embedded font.
+    """
+    differences = ' '.join(
+        f'/{pdf_glyph_name(char)}' for _, char in pdf_high_chars()
+    )
+    widths = ' '.join(['600'] * (256 - 32))
+    return (
+        f'<< /Type /Font /Subtype /Type1 /BaseFont /Courier '
+        f'/FirstChar 32 /LastChar 255 /Widths [{widths}] '
+        f'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        f'/Differences [128 {differences}] >> '
+        f'/ToUnicode {to_unicode} 0 R >>'
+    ).encode()
+
+
+def pdf_to_unicode():
+    """
+    CMap that lets viewers extract and copy the cp1251 encoded text
+    """
+    chars = '\n'.join(
+        f'<{code:02X}> <{ord(char):04X}>' for code, char in pdf_high_chars()
+    )
+    cmap = (
+        '/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n'
+        '/CMapName /cp1251 def\n/CMapType 2 def\n'
+        '1 begincodespacerange\n<00> <FF>\nendcodespacerange\n'
+        '1 beginbfrange\n<20> <7F> <0020>\nendbfrange\n'
+        f'128 beginbfchar\n{chars}\nendbfchar\n'
+        'endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend'
+    ).encode()
+    return b'<< /Length %d >>\nstream\n' % len(cmap) + cmap + b'\nendstream'
+
+
+def pdf_page_content(lines):
+    top = PDF_PAGE_HEIGHT - PDF_MARGIN
+    commands = [
+        b'BT',
+        f'/F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL '
+        f'{PDF_MARGIN} {top} Td'.encode(),
+    ]
+    commands.extend(pdf_string(line) + b" '" for line in lines)
+    commands.append(b'ET')
+    return b'\n'.join(commands)
+
+
+def render_pdf(rows):
+    """
+    Write a PDF document page by page while rows are fetched.
+    Only object offsets are kept in memory; the page tree is written
+    last, once the number of pages is known.
+    """
+    catalog, pages, font, to_unicode = 1, 2, 3, 4
+    offsets = {}
+    position = 0
+    next_object = to_unicode + 1
+    page_objects = []
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    def write_page(lines):
+        nonlocal next_object
+        content, page = next_object, next_object + 1
+        next_object += 2
+        page_objects.append(page)
+        stream = pdf_page_content(lines)
+        chunk = write_object(
+            content,
+            b'<< /Length %d >>\nstream\n' % len(stream)
+            + stream + b'\nendstream'
+        )
+        chunk += write_object(page, (
+            f'<< /Type /Page /Parent {pages} 0 R '
+            f'/MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] '
+            f'/Contents {content} 0 R '
+            f'/Resources << /Font << /F1 {font} 0 R >> >> >>'
+        ).encode())
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write_object(catalog, (
+        f'<< /Type /Catalog /Pages {pages} 0 R >>'
+    ).encode())
+    yield write_object(font, pdf_font(to_unicode))
+    yield write_object(to_unicode, pdf_to_unicode())
+
+    lines = [f'{TITLE}:']
+    for row in rows:
+        lines.append(format_row(row))
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield write_page(lines)
+            lines = []
+    if lines or not page_objects:
+        yield write_page(lines)
+
+    kids = ' '.join(f'{page} 0 R' for page in page_objects)
+    yield write_object(pages, (
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(page_objects)} >>'
+    ).encode())
+
+    xref = [b'xref\n0 %d\n' % next_object, b'0000000000 65535 f \n']
+    xref.extend(
+        b'%010d 00000 n \n' % offsets[number]
+        for number in range(1, next_object)
+    )
+    yield b''.join(xref) + (
+        f'trailer\n<< /Size {next_object} /Root {catalog} 0 R >>\n'
+        f'startxref\n{position}\n%%EOF\n'
+    ).encode()
+
+
+EXPORT_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+DEFAULT_EXPORT_FORMAT = 'pdf'
@@ -0,0 +1,65 @@
+import base64
+import binascii
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+from rest_framework import serializers
+
+# Multiple of 4, so every chunk of base64 text decodes on its own
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+class ChunkedBase64ImageField(serializers.ImageField):
+    """
+    Image field accepting a base64 data URL.
+
+    The payload size is checked before decoding, the data is decoded chunk
+    by chunk into a spooled temporary file instead of a second in-memory
+    copy, and the image is validated by its header without loading pixels.
+    """
+    default_error_messages = {
+        'invalid': 'Upload a valid base64 encoded image.',
+        'too_large': 'Image size has to be at most {max_size} bytes.',
+        'too_many_pixels': 'Image has to be at most {max_pixels} pixels.',
+        'invalid_format': 'Image format has to be one of: {formats}.',
+    }
+    formats = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or ';base64,' not in data:
+            self.fail('invalid')
+        encoded = data.split(';base64,', 1)[1]
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(encoded) // 4 * 3 > max_size:
+            self.fail('too_large', max_size=max_size)
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    encoded[start:start + DECODE_CHUNK_SIZE], validate=True
+                ))
+            file.seek(0)
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+                image.verify()
+        except (binascii.Error, ValueError, OSError, SyntaxError,
+                Image.DecompressionBombError):
+            file.close()
+            self.fail('invalid')
+        if image_format not in self.formats:
+            file.close()
+            self.fail('invalid_format', formats=', '.join(self.formats))
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if width * height > max_pixels:
+            file.close()
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        file.seek(0)
+        return File(
+            file, name=f'{uuid.uuid4()}.{self.formats[image_format]}'
+        )
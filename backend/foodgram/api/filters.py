@@ -1,11 +1,7 @@
 from django_filters import rest_framework as rest_filter
-from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe, Tag
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
+from recipes.search import search_recipes
 
 
 class RecipeFilter(rest_filter.FilterSet):
@@ -22,10 +18,12 @@ class RecipeFilter(rest_filter.FilterSet):
     is_in_shopping_cart = rest_filter.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = rest_filter.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search']
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -36,3 +34,8 @@ class RecipeFilter(rest_filter.FilterSet):
         if self.request.user.is_authenticated and value:
             return queryset.filter(shoppingcart__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
@@ -0,0 +1,129 @@
+import ipaddress
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus exposition sense
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield str(bound), total
+        yield '+Inf', self.count
+
+
+class Registry:
+    """
+    Process-local metrics of every view, labelled by view name
+    """
+    histograms = {
+        'foodgram_request_duration_seconds': (
+            'Total request latency', DURATION_BUCKETS
+        ),
+        'foodgram_db_duration_seconds': (
+            'Time spent in SQL queries', DURATION_BUCKETS
+        ),
+        'foodgram_serialization_duration_seconds': (
+            'Time spent building the serializer data', DURATION_BUCKETS
+        ),
+        'foodgram_render_duration_seconds': (
+            'Time spent rendering the response body', DURATION_BUCKETS
+        ),
+        'foodgram_db_queries': (
+            'SQL queries per request', QUERY_BUCKETS
+        ),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = defaultdict(int)
+            self._histograms = {
+                name: {} for name in self.histograms
+            }
+
+    def observe(self, view, method, status, values):
+        with self._lock:
+            self._requests[(view, method, status)] += 1
+            for name, value in values.items():
+                histograms = self._histograms[name]
+                if view not in histograms:
+                    histograms[view] = Histogram(self.histograms[name][1])
+                histograms[view].observe(value)
+
+    def render(self):
+        """
+        Metrics in the Prometheus text exposition format
+        """
+        lines = [
+            '# HELP foodgram_requests_total Requests handled by the worker',
+            '# TYPE foodgram_requests_total counter',
+        ]
+        with self._lock:
+            for (view, method, status), count in sorted(
+                    self._requests.items()):
+                lines.append(
+                    f'foodgram_requests_total{{view="{view}",'
+                    f'method="{method}",status="{status}"}} {count}'
+                )
+            for name, (description, _) in self.histograms.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                            f'{count}'
+                        )
+                    lines.append(
+                        f'{name}_sum{{view="{view}"}} {histogram.sum}'
+                    )
+                    lines.append(
+                        f'{name}_count{{view="{view}"}} {histogram.count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def scrape_allowed(request):
+    """
+    Metrics are scraped from METRICS_ALLOWED_NETWORKS directly: requests
+    proxied by nginx and requests from other addresses are refused
+    """
+    if 'HTTP_X_FORWARDED_FOR' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
@@ -0,0 +1,181 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connections
+from foodgram.routers import apin_to_primary, pin_to_primary
+from rest_framework.permissions import SAFE_METHODS
+
+from api.metrics import registry
+
+logger = logging.getLogger('foodgram.performance')
+
+
+class QueryCollector:
+    """
+    Database execute wrapper counting queries, their time and
+    repetitions of the same SQL statement
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, SQL query count, SQL time, serialization time and
+    response rendering time of every view into the process-local metrics
+    registry, and log slow requests with their most repeated SQL
+    statements.
+    Streaming responses are measured until their content is consumed.
+    Serialization time is added by CompiledRepresentationMixin.
+
+    Under ASGI the query wrappers are installed in the thread that runs
+    the ORM queries of the request. foodgram.asgi reads streaming content
+    in that thread as well, one chunk at a time.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        collector = QueryCollector()
+        self.start(request)
+        with self.collect_queries(collector):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, collector
+            )
+        else:
+            self.finish(request, response, collector)
+        return response
+
+    async def __acall__(self, request):
+        collector = QueryCollector()
+        self.start(request)
+        queries = await sync_to_async(self.collect_queries)(collector)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, collector
+            )
+        else:
+            self.finish(request, response, collector)
+        return response
+
+    def start(self, request):
+        request._metrics_start = time.perf_counter()
+        request._metrics_serialization = 0
+        request._metrics_serializing = False
+        request._metrics_render = 0
+
+    def process_template_response(self, request, response):
+        render_start = time.perf_counter()
+
+        def record_render_time(response):
+            request._metrics_render += time.perf_counter() - render_start
+
+        response.add_post_render_callback(record_render_time)
+        return response
+
+    def collect_queries(self, collector):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        return stack
+
+    def stream(self, content, request, response, collector):
+        try:
+            with self.collect_queries(collector):
+                yield from content
+        finally:
+            self.finish(request, response, collector)
+
+    def finish(self, request, response, collector):
+        duration = time.perf_counter() - request._metrics_start
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.observe(view, request.method, response.status_code, {
+            'foodgram_request_duration_seconds': duration,
+            'foodgram_db_duration_seconds': collector.duration,
+            'foodgram_serialization_duration_seconds': (
+                request._metrics_serialization
+            ),
+            'foodgram_render_duration_seconds': request._metrics_render,
+            'foodgram_db_queries': collector.count,
+        })
+        if duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            repeated = [
+                f'{count}x {sql}' for sql, count
+                in collector.statements.most_common(
+                    settings.SLOW_REQUEST_TOP_QUERIES
+                ) if count > 1
+            ]
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries, '
+                '%.1f ms in db%s',
+                request.method, request.get_full_path(), view,
+                duration * 1000, collector.count, collector.duration * 1000,
+                ''.join(f'\n  {line}' for line in repeated)
+            )
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin an authenticated user to the primary database after each of
+    their write requests, so that their next reads see the write even
+    if the replicas have not caught up yet
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_write(self, request):
+        user = getattr(request, 'user', None)
+        return bool(settings.DATABASE_REPLICAS) and (
+            request.method not in SAFE_METHODS
+        ) and user is not None and user.is_authenticated
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            if self.is_write(request):
+                pin_to_primary(request.user)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            if self.is_write(request):
+                await apin_to_primary(request.user)
@@ -1,36 +1,227 @@
+import functools
+
 from django.shortcuts import get_object_or_404
-from rest_framework import status, views
+from foodgram.routers import (ais_pinned, is_pinned, primary_reads,
+                              use_replicas)
+from recipes import relations
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_response_cache, tag_cache
+from recipes.models import Recipe
+from rest_framework import exceptions, status, views
 from rest_framework.response import Response
 
-from recipes.models import Recipe
+from api.conditional import (check_conditional, recipe_etag,
+                             set_conditional_headers)
+from api.serializers import (FavoriteRepresentationSerializer,
+                             RecipeIdsSerializer)
+
+RECIPE_FIELDS = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaReadMixin:
+    """
+    Read from the replicas on GET and HEAD requests, once the user is
+    authenticated: users who wrote recently are pinned to the primary.
+    Token lookups and writes always go to the primary.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        with primary_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in READ_METHODS and not is_pinned(request.user):
+            use_replicas()
+
+    async def aroute_reads(self, request):
+        """
+        `initial` routing for async views
+        """
+        if request.method in READ_METHODS and not (
+                await ais_pinned(request.user)):
+            use_replicas()
 
 
 class FavoriteShoppingCartView(views.APIView):
     """
-    Favorite ShoppingCart model api view: create/destroy
+    Favorite ShoppingCart model api view: create/destroy.
+
+    Both methods are idempotent and race-free: adding runs a single
+    INSERT ignoring an existing row, removing a single DELETE.
     """
     def post(self, request, id):
-        data = {
-            'user': request.user.id,
-            'recipe': id
-        }
-        if not self.model.objects.filter(
-                user=request.user,
-                recipe__id=id
-        ).exists():
-            serializer = self.serializer_class(data=data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED
-            )
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        recipe = get_object_or_404(Recipe.objects.only(*RECIPE_FIELDS), id=id)
+        relations.add(self.model, request.user, [recipe.pk])
+        return Response(
+            FavoriteRepresentationSerializer(recipe).data,
+            status=status.HTTP_201_CREATED
+        )
 
     def delete(self, request, id):
-        recipe = get_object_or_404(Recipe, id=id)
-        if self.model.objects.filter(
-                user=request.user, recipe=recipe).exists():
-            self.model.objects.filter(
-                user=request.user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not relations.remove(self.model, request.user, [id]):
+            get_object_or_404(Recipe.objects.only('id'), id=id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FavoriteShoppingCartBulkView(views.APIView):
+    """
+    Favorite ShoppingCart model api view: create/destroy for a list
+    of recipes in a single query
+    """
+    def get_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['recipes']))
+
+    def post(self, request):
+        ids = self.get_ids(request)
+        recipes = Recipe.objects.only(*RECIPE_FIELDS).in_bulk(ids)
+        missing = [pk for pk in ids if pk not in recipes]
+        if missing:
+            raise exceptions.ValidationError(
+                {'recipes': f'Recipes do not exist: {missing}.'}
+            )
+        relations.add(self.model, request.user, ids)
+        return Response(
+            FavoriteRepresentationSerializer(
+                [recipes[pk] for pk in ids], many=True
+            ).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def delete(self, request):
+        relations.remove(self.model, request.user, self.get_ids(request))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CachedRecipeResponseMixin:
+    """
+    Serve list and retrieve of RecipeViewSet from the shared response
+    cache. The body is cached as an anonymous user sees it and the flags
+    of the current user are applied on top of it, so one body serves
+    everyone. Lists filtered by the user's own favorites or shopping
+    cart are not cached.
+    """
+    user_filters = ('is_favorited', 'is_in_shopping_cart')
+    no_flags = {'favorites': (), 'shopping_cart': (), 'subscriptions': ()}
+
+    def is_cacheable(self, request):
+        return not (request.user.is_authenticated and any(
+            request.query_params.get(name) not in (None, '', '0', 'false')
+            for name in self.user_filters
+        ))
+
+    def origin(self, request):
+        """
+        Scheme and host of the absolute image URLs in the cached body
+        """
+        return request.scheme, request.get_host()
+
+    def list_key(self, request):
+        query = sorted(
+            (name, value) for name, values in request.query_params.lists()
+            for value in values
+        )
+        return 'list', *self.origin(request), query
+
+    def detail_key(self, request, pk):
+        return 'detail', *self.origin(request), pk
+
+    def cached_response(self, request, key, render):
+        data = recipe_response_cache.get(key)
+        if data is None:
+            response = render()
+            if response.status_code == status.HTTP_200_OK:
+                recipe_response_cache.set(key, self.apply_user_flags(
+                    response.data, self.no_flags
+                ))
+            return response
+        if request.user.is_authenticated:
+            data = self.apply_user_flags(
+                data, recipe_response_cache.user_flags(request.user)
+            )
+        return Response(data)
+
+    async def acached_response(self, request, key, render):
+        """
+        `cached_response` for async views, `render` is a coroutine
+        """
+        data = await recipe_response_cache.aget(key)
+        if data is None:
+            response = await render()
+            if response.status_code == status.HTTP_200_OK:
+                await recipe_response_cache.aset(key, self.apply_user_flags(
+                    response.data, self.no_flags
+                ))
+            return response
+        if request.user.is_authenticated:
+            data = self.apply_user_flags(
+                data, await recipe_response_cache.auser_flags(request.user)
+            )
+        return Response(data)
+
+    def apply_user_flags(self, data, flags):
+        def apply(recipe):
+            author = recipe['author']
+            return {
+                **recipe,
+                'author': {
+                    **author,
+                    'is_subscribed': author['id'] in flags['subscriptions'],
+                },
+                'is_favorited': recipe['id'] in flags['favorites'],
+                'is_in_shopping_cart': recipe['id'] in flags['shopping_cart'],
+            }
+
+        if 'results' in data:
+            return {**data, 'results': list(map(apply, data['results']))}
+        return apply(data)
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        key = recipe_response_cache.key(*self.list_key(request))
+        return self.cached_response(request, key, functools.partial(
+            super().list, request, *args, **kwargs
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Recipe detail, cached with the update time of the recipe: the
+        ETag is computed from the cached entry or from the loaded recipe,
+        without a query of its own
+        """
+        pk = kwargs[self.lookup_field]
+        key = recipe_response_cache.key(*self.detail_key(request, pk))
+        cached = recipe_response_cache.get(key)
+        if cached is None:
+            recipe = self.get_object()
+            updated_at = recipe.updated_at
+            data = self.get_serializer(recipe).data
+            recipe_response_cache.set(key, (
+                updated_at, self.apply_user_flags(data, self.no_flags)
+            ))
+        else:
+            updated_at, data = cached
+            if request.user.is_authenticated:
+                data = self.apply_user_flags(
+                    data, recipe_response_cache.user_flags(request.user)
+                )
+        return self.detail_response(
+            request, pk, updated_at, data,
+            tag_cache.version, ingredient_index.version
+        )
+
+    def detail_response(self, request, pk, updated_at, data, tags_version,
+                        ingredients_version):
+        """
+        Recipe detail response, or 304 when the client has it already
+        """
+        etag, timestamp, response = check_conditional(request, *recipe_etag(
+            request.user, pk, updated_at, data, tags_version,
+            ingredients_version
+        ))
+        return set_conditional_headers(
+            response or Response(data), etag, timestamp, ('Authorization',)
+        )
@@ -1,4 +1,17 @@
+import base64
+import binascii
+import functools
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
@@ -8,3 +21,187 @@ class CustomPagination(PageNumberPagination):
     """
     page_size = 6
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        `paginate_queryset` for async views: the page is counted and
+        fetched with the async ORM. Prefetches of the queryset are not
+        run, the view loads related objects itself.
+        """
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.request = request
+        self.page.object_list = [
+            obj async for obj in self.page.object_list.aiterator()
+        ]
+        return self.page.object_list
+
+
+def approximate_count(queryset):
+    """
+    Row estimate of the query planner, None where it is not available
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class RecipePagination(CustomPagination):
+    """
+    Page number pagination with an opt-in keyset mode for RecipeViewSet.
+
+    Passing ?cursor= (empty for the first page) switches to keyset
+    pagination over (pub_date, id): each page is an indexed range scan
+    after the last recipe of the previous page, so the cost doesn't
+    grow with depth. The total is not counted unless ?count=exact, or
+    ?count=approx for the planner's estimate. Ranked results (?search=)
+    have no keyset order and are paginated by page number only.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ranked_query_params = ('search',)
+    ordering = ('-pub_date', '-id')
+
+    def use_keyset(self, request):
+        if self.cursor_query_param not in request.query_params:
+            return False
+        for name in self.ranked_query_params:
+            if request.query_params.get(name, '').strip():
+                raise ValidationError({self.cursor_query_param: (
+                    f'Ranked results of ?{name}= are paginated with '
+                    f'?page= only.'
+                )})
+        return True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.count = self.get_count(queryset, request)
+        return self.paginate_keyset(
+            functools.partial(self.page_after, queryset), request
+        )
+
+    async def apaginate_queryset(self, queryset, request):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return await super().apaginate_queryset(queryset, request)
+        self.count = await self.aget_count(queryset, request)
+        position = self.start_keyset(request)
+        return self.end_keyset([
+            obj async for obj in self.keyset_queryset(
+                queryset, position, self.page_size + 1
+            ).aiterator()
+        ])
+
+    def keyset_queryset(self, queryset, position, limit):
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        return queryset[:limit]
+
+    def page_after(self, queryset, position, limit):
+        return list(self.keyset_queryset(queryset, position, limit))
+
+    def paginate_keyset(self, page_after, request):
+        """
+        Page of recipes after the cursor position, `page_after(position,
+        limit)` returns up to `limit` of them in the keyset order
+        """
+        position = self.start_keyset(request)
+        return self.end_keyset(page_after(position, self.page_size + 1))
+
+    def start_keyset(self, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        return self.decode_cursor(
+            request.query_params.get(self.cursor_query_param, '')
+        )
+
+    def end_keyset(self, page):
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return approximate_count(queryset)
+        return None
+
+    async def aget_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return await queryset.acount()
+        if mode == 'approx':
+            return await sync_to_async(approximate_count)(queryset)
+        return None
+
+    def encode_cursor(self, recipe):
+        value = f'{recipe.pub_date.isoformat()}|{recipe.pk}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = base64.urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last)
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class FeedPagination(RecipePagination):
+    """
+    Keyset-only pagination of the subscription feed, paginating a
+    `page_after(position, limit)` function instead of a queryset
+    """
+    def paginate_queryset(self, page_after, request, view=None):
+        self.keyset = True
+        self.count = None
+        return self.paginate_keyset(page_after, request)
@@ -0,0 +1,42 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+LINE_SEPARATORS = (
+    (b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029')
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson. Responses are the same bytes the
+    standard renderer produces with the default settings: compact UTF-8
+    with U+2028 and U+2029 escaped. The API has no float fields: floats
+    in exponent notation are written as 1e300 instead of 1e+300, and
+    non-finite ones as null where the strict encoder fails. Datetimes,
+    lazy strings, decimals and other types orjson does not encode the
+    same way go through the DRF encoder; indented responses, non-default
+    JSON settings and data orjson cannot encode are rendered by
+    JSONRenderer.
+    """
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not (
+                self.compact and self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for character, escaped in LINE_SEPARATORS:
+            content = content.replace(character, escaped)
+        return content
@@ -1,20 +1,28 @@
 import re
+from functools import cached_property
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
-from rest_framework import exceptions, serializers
-
+from rest_framework import serializers
+
+from api.fields import ChunkedBase64ImageField
+from api.representation import CompiledRepresentationMixin
+from recipes.autocomplete import ingredient_index
+from recipes.cache import tag_cache
+from recipes.feed import fan_out
+from recipes.images import schedule_variants
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.search import update_search_index
+from recipes.shopping_list import refresh_recipe
 from users.models import Subscription
 
 CustomUser = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(CompiledRepresentationMixin, UserSerializer):
     """
     Custom User model serialization
     """
@@ -26,6 +34,8 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
@@ -44,7 +54,8 @@ class CustomUserCreateSerializer(UserCreateSerializer):
                   'last_name', 'password')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+        CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Ingredient model serialization
     """
@@ -53,7 +64,8 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(
+        CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Realated m2m model serialization
     """
@@ -67,8 +79,23 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    @cached_property
+    def snapshot(self):
+        """
+        Ingredient index snapshot, read once for all rows of a response
+        """
+        return ingredient_index.get_snapshot()
+
+    def to_representation(self, instance):
+        ingredient = ingredient_index.get(
+            instance.ingredient_id, self.snapshot
+        )
+        if ingredient is None:
+            return super().to_representation(instance)
+        return {**ingredient, 'amount': instance.amount}
+
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Tag model serialization
     """
@@ -76,13 +103,26 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
+    @cached_property
+    def snapshot(self):
+        """
+        Tag cache snapshot, read once for all rows of a response
+        """
+        return tag_cache.get_snapshot()
+
+    def to_representation(self, instance):
+        return tag_cache.get(
+            instance.id, self.snapshot
+        ) or super().to_representation(instance)
+
     def validate_color(self, value):
         if not re.fullmatch(r'^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$', value):
             raise serializers.ValidationError('Color must be in HEX-format')
         return value
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(
+        CompiledRepresentationMixin, serializers.ModelSerializer):
     """Recipe model representation serializer"""
     author = CustomUserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
@@ -96,15 +136,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'name', 'is_in_shopping_cart', 'text', 'cooking_time',
-                  'image')
+                  'image', 'image_thumbnail', 'image_full')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
@@ -113,6 +157,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
 
+class CookableRecipeSerializer(RecipeSerializer):
+    """
+    Recipe representation with the number of its ingredients covered
+    by the requested ones and the number of missing ingredients
+    """
+    covered = serializers.IntegerField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('covered', 'missing')
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
     """
     Additional model of adding to the Ingredient model.
@@ -133,10 +189,8 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     """
     author = CustomUserSerializer(read_only=True)
     ingredients = AddIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
-    image = Base64ImageField()
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = ChunkedBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -148,44 +202,132 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         for ingredient_obj in value:
             amount = ingredient_obj.get('amount')
             if int(amount) < 1:
-                raise exceptions.APIException(
-                    detail='Ingredients amount has to be greater than 0',
-                    code=400
+                raise serializers.ValidationError(
+                    'Ingredients amount has to be greater than 0'
                 )
             if ingredient_obj['id'] in ingredient_list:
-                raise exceptions.APIException(
-                    detail='Ingredients have to be unique.',
-                    code=400
+                raise serializers.ValidationError(
+                    'Ingredients have to be unique.'
                 )
             ingredient_list.append(ingredient_obj['id'])
+        found = Ingredient.objects.in_bulk(ingredient_list)
+        missing = [pk for pk in ingredient_list if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ingredients do not exist: {missing}'
+            )
         return value
 
+    def validate_tags(self, value):
+        found = Tag.objects.in_bulk(value)
+        missing = [pk for pk in value if pk not in found]
+        if missing:
+            raise serializers.ValidationError(f'Tags do not exist: {missing}')
+        return list(found.values())
+
     def create_ingredients(self, ingredients, recipe):
         RecipeIngredient.objects.bulk_create([
-            RecipeIngredient(ingredient=get_object_or_404(
-                Ingredient, id=ingredient.get('id')), recipe=recipe,
-                amount=ingredient.get('amount')) for ingredient in
-            ingredients])
+            RecipeIngredient(
+                ingredient_id=ingredient['id'],
+                recipe=recipe,
+                amount=ingredient['amount']
+            ) for ingredient in ingredients
+        ])
+
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Apply only the difference between the stored and the new
+        ingredients: delete removed rows, update changed amounts
+        and bulk-insert the added ones. Return the ids of the removed,
+        changed and added ingredients.
+        """
+        existing = {
+            relation.ingredient_id: relation
+            for relation in recipe.ingredient_relation.all()
+        }
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, relation in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and relation.amount != amount:
+                relation.amount = amount
+                changed.append(relation)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['id'] not in existing
+        ]
+        self.create_ingredients(added, recipe)
+        return removed | {
+            relation.ingredient_id for relation in changed
+        } | {ingredient['id'] for ingredient in added}
+
+    def store_image(self, validated_data):
+        """
+        Write the uploaded image to the storage before the transaction
+        is opened, so that no database locks are held during the upload,
+        and reset the resized variants to be generated again.
+        """
+        image = validated_data.get('image')
+        if image is None:
+            return False
+        field = Recipe._meta.get_field('image')
+        validated_data['image'] = field.storage.save(
+            field.generate_filename(None, image.name), image,
+            max_length=field.max_length
+        )
+        image.close()
+        validated_data['image_thumbnail'] = None
+        validated_data['image_full'] = None
+        return True
 
-    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         author = self.context.get('request').user
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients(ingredients, recipe)
+        image_changed = self.store_image(validated_data)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                author=author, ingredients_count=len(ingredients),
+                **validated_data
+            )
+            recipe.tags.add(*tags)
+            self.create_ingredients(ingredients, recipe)
+            update_search_index(Recipe.objects.filter(pk=recipe.pk))
+            fan_out(recipe)
+            if image_changed:
+                schedule_variants(recipe)
         return recipe
 
-    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop(
-            'ingredients', instance.ingredients.all()
+        image_changed = self.store_image(validated_data)
+        searchable_changed = not validated_data.keys().isdisjoint(
+            ('name', 'text', 'ingredients')
         )
-        instance.tags.set(validated_data.pop('tags', instance.tags.all()))
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            if 'tags' in validated_data:
+                instance.tags.set(validated_data.pop('tags'))
+            if 'ingredients' in validated_data:
+                ingredients = validated_data.pop('ingredients')
+                refresh_recipe(
+                    instance.pk, self.update_ingredients(ingredients, instance)
+                )
+                validated_data['ingredients_count'] = len(ingredients)
+            instance = super().update(instance, validated_data)
+            if searchable_changed:
+                update_search_index(Recipe.objects.filter(pk=instance.pk))
+            if image_changed:
+                schedule_variants(instance)
+        return instance
 
     def to_representation(self, instance):
         return RecipeSerializer(instance, context={
@@ -193,28 +335,28 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         }).data
 
 
-class FavoriteRepresentationSerializer(serializers.ModelSerializer):
+class FavoriteRepresentationSerializer(
+        CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Favorite model representation serialization
     """
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class RecipeIdsSerializer(serializers.Serializer):
     """
-    Favorite model serialization
+    Recipe ids of bulk favorite and shopping cart requests
     """
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-    def to_representation(self, instance):
-        return FavoriteRepresentationSerializer(instance.recipe).data
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=settings.RECIPE_BULK_TOGGLE_LIMIT
+    )
 
 
-class SubscriptionRepresentationSerializer(serializers.ModelSerializer):
+class SubscriptionRepresentationSerializer(
+        CompiledRepresentationMixin, serializers.ModelSerializer):
     """
     Subscription model representation serialization
     """
@@ -228,6 +370,8 @@ class SubscriptionRepresentationSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
@@ -239,37 +383,14 @@ class SubscriptionRepresentationSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        recipes = Recipe.objects.filter(author=obj)
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj, 'recent_recipes'):
+            recipes = obj.recent_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj)
+            limit = request.query_params.get('recipes_limit')
+            if limit and limit.isdigit():
+                recipes = recipes[:int(limit)]
         return FavoriteRepresentationSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
-
-class SubscriptionSerializer(serializers.ModelSerializer):
-    """
-    Subscription model serialization
-    """
-    class Meta:
-        model = Subscription
-        fields = ('user', 'author')
-
-    def to_representation(self, instance):
-        return SubscriptionRepresentationSerializer(instance.author, context={
-            'request': self.context.get('request')
-        }).data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """
-    Shopping cart model serialization
-    """
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-
-    def to_representation(self, instance):
-        return FavoriteRepresentationSerializer(instance.recipe).data
+        return obj.recipes_count
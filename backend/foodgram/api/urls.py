@@ -1,13 +1,18 @@
 from django.urls import include, path
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import DefaultRouter, SimpleRouter
 
-from api.views import (FavoriteView, IngredientViewSet, RecipeViewSet,
-                       ShoppingCartView, SubscriptionRepresentationView,
-                       SubscriptionView, TagViewSet, download_shopping_cart)
+from api.views import (CookableRecipeView, CustomUserViewSet, FavoriteBulkView,
+                       FavoriteView, FeedView, IngredientViewSet,
+                       RecipeViewSet, ShoppingCartBulkView, ShoppingCartView,
+                       SubscriptionRepresentationView, SubscriptionView,
+                       TagViewSet, download_shopping_cart)
 
 app_name = 'api'
 
 router = DefaultRouter()
+# Djoser user routes, served by its viewset with annotated subscriptions
+users_router = SimpleRouter()
+users_router.register(r'users', CustomUserViewSet)
 
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
@@ -19,6 +24,11 @@ urlpatterns = [
         FavoriteView.as_view(),
         name='favorite'
     ),
+    path(
+        'recipes/favorite/',
+        FavoriteBulkView.as_view(),
+        name='favorite_bulk'
+    ),
     path(
         'users/<int:id>/subscribe/',
         SubscriptionView.as_view(),
@@ -34,12 +44,27 @@ urlpatterns = [
         ShoppingCartView.as_view(),
         name='shopping_cart'
     ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartBulkView.as_view(),
+        name='shopping_cart_bulk'
+    ),
     path(
         'recipes/download_shopping_cart/',
         download_shopping_cart,
         name='download_shopping_cart'
     ),
+    path(
+        'recipes/feed/',
+        FeedView.as_view(),
+        name='feed'
+    ),
+    path(
+        'recipes/cook/',
+        CookableRecipeView.as_view(),
+        name='cook'
+    ),
     path('auth/', include('djoser.urls.authtoken')),
-    path('', include('djoser.urls')),
+    path('', include(users_router.urls)),
     path('', include(router.urls)),
 ]
@@ -1,161 +1,377 @@
+import functools
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Subquery,
+                              Value)
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from rest_framework import (decorators, generics, permissions, status,
-                            views, viewsets)
+from djoser.views import UserViewSet
+from recipes import feed, relations
+from recipes.autocomplete import ingredient_index
+from recipes.cache import tag_cache, version_time
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from rest_framework import (decorators, exceptions, generics, permissions,
+                            status, views, viewsets)
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import FavoriteShoppingCartView
-from api.pagination import CustomPagination
+from api.conditional import conditional
+from api.exports import (DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS,
+                         shopping_list_rows)
+from api.filters import RecipeFilter
+from api.metrics import registry, scrape_allowed
+from api.mixins import (CachedRecipeResponseMixin,
+                        FavoriteShoppingCartBulkView, FavoriteShoppingCartView,
+                        ReplicaReadMixin)
+from api.pagination import (CustomPagination, FeedPagination,
+                            RecipePagination)
 from api.permissions import IsAuthorOrAdminOrReadOnly
-from api.serializers import (CreateRecipeSerializer, FavoriteSerializer,
+from api.serializers import (CookableRecipeSerializer, CreateRecipeSerializer,
                              IngredientSerializer, RecipeSerializer,
-                             ShoppingCartSerializer,
                              SubscriptionRepresentationSerializer,
-                             SubscriptionSerializer, TagSerializer)
+                             TagSerializer)
 
 from users.models import Subscription
 
 CustomUser = get_user_model()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+def reference_state(reference):
+    """
+    ETag and Last-Modified of a reference table: its shared version
+    """
+    def get_state(view, request, *args, **kwargs):
+        version = reference.version
+        return version, version_time(version)
+
+    return get_state
+
+
+class RecipeViewSet(ReplicaReadMixin, CachedRecipeResponseMixin,
+                    viewsets.ModelViewSet):
     """
     Recipe model viewset: list/create/retrieve/partial_update/destroy
     """
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrAdminOrReadOnly]
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        user = self.request.user
+        return Recipe.objects.with_related(user).with_user_flags(
+            user
+        ).defer('search_vector')
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return CreateRecipeSerializer
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
-    Ingredient model viewset, read only: list, retrieve
+    Ingredient model viewset, read only: list, retrieve.
+    Served from the in-memory autocomplete index: ?name= returns
+    prefix matches first, then substring matches, at most ?limit= items
     """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
-    filter_backends = (IngredientFilter,)
-    search_fields = ('name',)
+
+    def search(self, request, snapshot=None):
+        name = request.query_params.get('name', '')
+        if not name.strip():
+            return ingredient_index.all(snapshot)
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+            ))
+        except ValueError:
+            limit = settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, settings.INGREDIENT_AUTOCOMPLETE_MAX_LIMIT))
+        return ingredient_index.search(name, limit, snapshot)
+
+    @conditional(reference_state(ingredient_index))
+    def list(self, request):
+        return Response(self.search(request))
+
+    @conditional(reference_state(ingredient_index))
+    def retrieve(self, request, pk):
+        ingredient = ingredient_index.get(int(pk)) if pk.isdigit() else None
+        if ingredient is None:
+            raise exceptions.NotFound()
+        return Response(ingredient)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
-    Tag model viewset, read only: list, retrieve
+    Tag model viewset, read only: list, retrieve.
+    Served from the process-local tag cache
     """
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
+    @conditional(reference_state(tag_cache))
+    def list(self, request):
+        return Response(tag_cache.all())
+
+    @conditional(reference_state(tag_cache))
+    def retrieve(self, request, pk):
+        tag = tag_cache.get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise exceptions.NotFound()
+        return Response(tag)
+
 
 class FavoriteView(FavoriteShoppingCartView):
     """
     Favorite model api view: create, destroy
     """
     model = Favorite
-    serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
 
 
+class FavoriteBulkView(FavoriteShoppingCartBulkView):
+    """
+    Favorite model api view: create, destroy for a list of recipes
+    """
+    model = Favorite
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class CustomUserViewSet(UserViewSet):
+    """
+    Djoser user viewset with is_subscribed annotated in one query
+    instead of one subscription lookup per serialized user
+    """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(is_subscribed=Value(False))
+        return queryset.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('pk'))
+        ))
+
+
 class SubscriptionView(views.APIView):
     """
-    Subscription model api view: create/destroy
+    Subscription model api view: create/destroy, idempotent like
+    the favorite and shopping cart views
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, id):
-        data = {
-            'user': request.user.id,
-            'author': id
-        }
-        if not Subscription.objects.filter(
-                user=request.user, author__id=id
-        ).exists() and id != request.user.id:
-            serializer = SubscriptionSerializer(
-                data=data,
-                context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+        if id == request.user.id:
             return Response(
-                serializer.data, status=status.HTTP_201_CREATED
+                {'errors': 'You cannot subscribe to yourself.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        author = get_object_or_404(
+            CustomUser.objects.annotate(is_subscribed=Value(True)), id=id
+        )
+        relations.add(Subscription, request.user, [author.pk], field='author')
+        serializer = SubscriptionRepresentationSerializer(
+            author, context={'request': request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        author = get_object_or_404(CustomUser, id=id)
-        if Subscription.objects.filter(
-                user=request.user,
-                author=author
-        ).exists():
-            subsription_obj = get_object_or_404(
-                Subscription, user=request.user, author=author
-            )
-            subsription_obj.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not relations.remove(
+                Subscription, request.user, [id], field='author'):
+            get_object_or_404(CustomUser.objects.only('id'), id=id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SubscriptionRepresentationView(generics.ListAPIView):
+class SubscriptionRepresentationView(ReplicaReadMixin, generics.ListAPIView):
     """
     Subscription list representation listapi generic view
     """
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
 
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if limit is None:
+            return None
+        if not limit.isdigit() or int(limit) < 1:
+            raise exceptions.ValidationError(
+                {'recipes_limit': 'Has to be a positive integer.'}
+            )
+        return int(limit)
+
+    def get_queryset(self):
+        limit = self.get_recipes_limit()
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_thumbnail', 'cooking_time',
+            'author', 'pub_date'
+        )
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:limit]
+            ))
+        return CustomUser.objects.filter(
+            author__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True)
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recent_recipes')
+        )
+
     def list(self, request):
-        user = request.user
-        queryset = CustomUser.objects.filter(author__user=user)
-        page = self.paginate_queryset(queryset)
+        page = self.paginate_queryset(self.get_queryset())
         serializer = SubscriptionRepresentationSerializer(
             page, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
 
+class FeedView(generics.ListAPIView):
+    """
+    Recipes of the followed authors, newest first, with cursor pagination
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FeedPagination
+    serializer_class = RecipeSerializer
+
+    def list(self, request):
+        page = self.paginate_queryset(
+            functools.partial(feed.page, request.user)
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class CookableRecipeView(generics.ListAPIView):
+    """
+    Recipes that can be cooked from the given ingredients: list.
+    ?ingredients= (repeated) are the ingredient ids at hand. Recipes are
+    ranked by the number of their ingredients covered, then by the number
+    of missing ones; ?max_missing= drops those missing more
+    """
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CustomPagination
+
+    def get_ingredient_ids(self):
+        values = self.request.query_params.getlist('ingredients')
+        if not values or not all(value.isdigit() for value in values):
+            raise exceptions.ValidationError(
+                {'ingredients': 'Pass one or more ingredient ids.'}
+            )
+        if len(values) > settings.RECIPE_COOK_MAX_INGREDIENTS:
+            raise exceptions.ValidationError({'ingredients': (
+                f'At most {settings.RECIPE_COOK_MAX_INGREDIENTS} '
+                f'ingredients are allowed.'
+            )})
+        return set(map(int, values))
+
+    def get_max_missing(self):
+        value = self.request.query_params.get('max_missing')
+        if value is None:
+            return None
+        if not value.isdigit():
+            raise exceptions.ValidationError(
+                {'max_missing': 'Has to be a non-negative integer.'}
+            )
+        return int(value)
+
+    def get_queryset(self):
+        """
+        Ranking in a single grouped query: recipe ingredient rows of the
+        given ingredients are found through the (ingredient, recipe)
+        index, counted per recipe and compared with the stored number
+        of the recipe ingredients
+        """
+        ranking = Recipe.objects.filter(
+            ingredient_relation__ingredient_id__in=self.get_ingredient_ids()
+        ).annotate(
+            covered=Count('ingredient_relation__ingredient')
+        ).annotate(
+            missing=F('ingredients_count') - F('covered')
+        )
+        max_missing = self.get_max_missing()
+        if max_missing is not None:
+            ranking = ranking.filter(missing__lte=max_missing)
+        return ranking.order_by(
+            '-covered', 'missing', '-pub_date', '-id'
+        ).values_list('pk', 'covered', 'missing')
+
+    def list(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        recipes = Recipe.objects.with_related(
+            request.user
+        ).with_user_flags(request.user).defer('search_vector').in_bulk(
+            [pk for pk, _, _ in page]
+        )
+        results = []
+        for pk, covered, missing in page:
+            recipe = recipes.get(pk)
+            if recipe is not None:
+                recipe.covered, recipe.missing = covered, missing
+                results.append(recipe)
+        serializer = CookableRecipeSerializer(
+            results, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+
 class ShoppingCartView(FavoriteShoppingCartView):
     """
     ShoppingCart model api view: create/destroy
     """
     model = ShoppingCart
-    serializer_class = ShoppingCartSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class ShoppingCartBulkView(FavoriteShoppingCartBulkView):
+    """
+    ShoppingCart model api view: create/destroy for a list of recipes
+    """
+    model = ShoppingCart
     permission_classes = [permissions.IsAuthenticated]
 
 
 @decorators.api_view(['GET'])
+@decorators.permission_classes([permissions.IsAuthenticated])
 def download_shopping_cart(request):
     """
-    Shopping cart downloading api view: retrieve
-    """
-    ingredient_list = "Cписок покупок:"
-    ingredients = RecipeIngredient.objects.filter(
-        recipe__shoppingcart__user=request.user
-    ).values(
-        'ingredient__name', 'ingredient__measurement_unit'
-    ).annotate(amount_sum=Sum('amount'))
-    for num, i in enumerate(ingredients):
-        ingredient_list += (
-            f"\n{i['ingredient__name']} - "
-            f"{i['amount_sum']} {i['ingredient__measurement_unit']}"
+    Shopping cart downloading api view: retrieve.
+    File type is chosen with ?type=txt|csv|pdf, pdf by default
+    """
+    file_type = request.query_params.get('type', DEFAULT_EXPORT_FORMAT)
+    if file_type not in EXPORT_FORMATS:
+        return Response(
+            {'type': f'Choose one of: {", ".join(EXPORT_FORMATS)}'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        if num < ingredients.count() - 1:
-            ingredient_list += ', '
-    file = 'shopping_list'
-    response = HttpResponse(ingredient_list, 'Content-Type: application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{file}.pdf"'
+    render, content_type = EXPORT_FORMATS[file_type]
+    response = StreamingHttpResponse(
+        render(shopping_list_rows(request.user)),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_type}"'
+    )
     return response
+
+
+def metrics(request):
+    """
+    Request metrics of this worker in the Prometheus text format
+    """
+    if not scrape_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,7 +1,52 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+
+class AsyncReadHandler(ASGIHandler):
+    """
+    ASGI handler resolving requests against foodgram.asgi_urls, where
+    the read-heavy endpoints are served by async views
+    """
+    urlconf = 'foodgram.asgi_urls'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+    async def send_response(self, response, send):
+        """
+        Read streaming content chunk by chunk in the thread of the
+        request's ORM queries, since the iterator may query the database,
+        and send each chunk right away. The handler of Django 4.1 would
+        iterate it in the event loop.
+        """
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        content = response.streaming_content
+        response.streaming_content = ()
+
+        async def send_with_content(message):
+            # The stock handler closes the body with an empty message
+            if message['type'] == 'http.response.body' and (
+                    'body' not in message):
+                while (part := await sync_to_async(next)(
+                        content, None)) is not None:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            await send(message)
+
+        await super().send_response(response, send_with_content)
+
+
+django.setup(set_prefix=False)
+application = AsyncReadHandler()
@@ -0,0 +1,4 @@
+from api.async_views import with_async_views
+from foodgram.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = with_async_views(sync_urlpatterns)
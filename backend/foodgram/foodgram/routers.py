@@ -0,0 +1,80 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Whether the reads of the current request may go to a replica
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def use_replicas():
+    replica_reads.set(True)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside the block, the previous routing is
+    restored on exit
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def reads_from_replicas():
+    return bool(settings.DATABASE_REPLICAS) and replica_reads.get()
+
+
+def in_transaction():
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin_to_primary(user):
+    """
+    Send the reads of the user to the primary for DATABASE_REPLICA_LAG
+    seconds, so that they see their own writes before the replicas do
+    """
+    cache.set(pin_key(user.pk), True, settings.DATABASE_REPLICA_LAG)
+
+
+async def apin_to_primary(user):
+    await cache.aset(pin_key(user.pk), True, settings.DATABASE_REPLICA_LAG)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+
+
+async def ais_pinned(user):
+    return user.is_authenticated and (
+        await cache.aget(pin_key(user.pk)) is not None
+    )
+
+
+class ReplicaRouter:
+    """
+    Send reads to a random database of DATABASE_REPLICAS while replica
+    reads are enabled for the current request, and everything else to
+    the primary. Reads inside a transaction stay on the primary, so the
+    transaction sees its own writes.
+    """
+    def db_for_read(self, model, **hints):
+        if reads_from_replicas() and not in_transaction():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -36,13 +36,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'djoser',
-    'debug_toolbar',
     'django_filters',
 ]
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,9 +50,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'api.middleware.PrimaryPinMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -94,6 +98,31 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, comma separated hosts.
+# GET requests of the recipe, tag, ingredient and subscription views
+# read from them; users who wrote within DATABASE_REPLICA_LAG seconds
+# read from the primary.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASE_REPLICAS.append(f'replica_{number}')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'], 'HOST': host.strip()
+    }
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+DATABASE_REPLICA_LAG = 5
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -146,13 +175,69 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+REFERENCE_CACHE_CHECK_INTERVAL = 5
+RECIPE_RESPONSE_CACHE_TIMEOUT = 10 * 60
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_LOCAL_TTL = 5
+TOKEN_CACHE_TIMEOUT = 10 * 60
+
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_FALLBACK_LIMIT = 1000
+RECIPE_COOK_MAX_INGREDIENTS = 100
+RECIPE_BULK_TOGGLE_LIMIT = 100
+# Authors with this many subscribers are merged into feeds on read
+# instead of being written to every subscriber's feed
+FEED_FANOUT_LIMIT = 10_000
+FEED_BACKFILL_SIZE = 100
+
+DATA_IMPORT_BATCH_SIZE = 1000
+
+SLOW_REQUEST_THRESHOLD_MS = int(
+    os.getenv('SLOW_REQUEST_THRESHOLD_MS', default=500)
+)
+SLOW_REQUEST_TOP_QUERIES = 5
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    'METRICS_ALLOWED_NETWORKS',
+    default='127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+).split(',')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
+}
+
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_PROCESSING_WORKERS = int(
+    os.getenv('IMAGE_PROCESSING_WORKERS', default=2)
+)
+IMAGE_QUALITY = 82
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = 100
+
 
 DJOSER = {
     'SERIALIZERS': {
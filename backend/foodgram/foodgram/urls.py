@@ -1,11 +1,13 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import metrics
 from foodgram.settings import DEBUG
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 if DEBUG:
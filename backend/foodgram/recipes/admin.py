@@ -1,7 +1,11 @@
 from django.contrib.admin import ModelAdmin, TabularInline, register, site
 
+from recipes.counters import count_subquery
+from recipes.feed import fan_out
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.search import update_search_index
+from recipes.shopping_list import refresh_recipe
 
 
 class IngredientsInline(TabularInline):
@@ -11,14 +15,45 @@ class IngredientsInline(TabularInline):
 
 @register(Recipe)
 class RecipeAdmin(ModelAdmin):
-    list_display = ('author', 'name', 'favorite_count')
+    list_display = ('author', 'name', 'favorites_count')
+    list_select_related = ('author',)
     list_filter = ('author', 'name', 'tags')
     search_fields = ('name',)
     filter_horizontal = ('tags',)
     inlines = (IngredientsInline,)
 
-    def favorite_count(self, obj):
-        return obj.favorite_set.count()
+    def changed_ingredients(self, formsets):
+        """
+        Ids of the ingredients added, removed, replaced or with a changed
+        amount in the inline forms
+        """
+        ids = set()
+        for formset in formsets:
+            if formset.model is not RecipeIngredient:
+                continue
+            for inline in formset.forms:
+                if inline.has_changed() or inline in formset.deleted_forms:
+                    ids.update((
+                        inline.initial.get('ingredient'),
+                        inline.instance.ingredient_id
+                    ))
+        ids.discard(None)
+        return ids
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        recipes = Recipe.objects.filter(pk=recipe.pk)
+        ingredients = self.changed_ingredients(formsets)
+        if ingredients:
+            recipes.update(ingredients_count=count_subquery(
+                RecipeIngredient, 'recipe'
+            ))
+            refresh_recipe(recipe.pk, ingredients)
+        if ingredients or {'name', 'text'} & set(form.changed_data):
+            update_search_index(recipes)
+        if not change:
+            fan_out(recipe)
 
 
 @register(Ingredient)
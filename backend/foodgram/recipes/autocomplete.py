@@ -0,0 +1,55 @@
+import bisect
+
+from recipes.cache import ReferenceCache
+from recipes.models import Ingredient
+
+
+class IngredientIndex(ReferenceCache):
+    """
+    In-memory autocomplete index over the ingredient catalog.
+
+    Ingredients are kept pre-serialized and sorted by their lowercased
+    name, so prefix matches are a binary search over the sorted keys.
+    Substring matches are looked up only when prefix matches do not fill
+    the requested limit.
+    """
+    version_key = 'reference:ingredients:version'
+
+    def build(self):
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].lower(), row['id'])
+        )
+        keys = [row['name'].lower() for row in items]
+        by_id = {row['id']: row for row in items}
+        return keys, items, by_id
+
+    def all(self, snapshot=None):
+        return (snapshot or self.get_snapshot())[1]
+
+    def get(self, pk, snapshot=None):
+        return (snapshot or self.get_snapshot())[2].get(pk)
+
+    def search(self, query, limit, snapshot=None):
+        """
+        Return at most `limit` ingredients whose name starts with the
+        query, followed by those which contain it elsewhere.
+        """
+        keys, items, _ = snapshot or self.get_snapshot()
+        query = query.strip().lower()
+        if not query:
+            return items[:limit]
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_right(keys, query + '\uffff', lo=start)
+        result = items[start:min(end, start + limit)]
+        if len(result) < limit:
+            for position, key in enumerate(keys):
+                if start <= position < end or query not in key:
+                    continue
+                result.append(items[position])
+                if len(result) == limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
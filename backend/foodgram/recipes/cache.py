@@ -0,0 +1,255 @@
+import abc
+import asyncio
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from foodgram.routers import primary_reads, reads_from_replicas
+
+from recipes.models import Favorite, ShoppingCart, Tag
+from users.models import Subscription
+
+
+def new_version():
+    """
+    Version token: the time of the change in nanoseconds, so that it
+    also serves as the Last-Modified time of the versioned data
+    """
+    return str(time.time_ns())
+
+
+def version_time(version):
+    try:
+        return datetime.fromtimestamp(int(version) / 1e9, timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def shared_version(key):
+    """
+    Version token stored in the shared cache, created on first use
+    """
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, new_version(), None)
+    return cache.get(key)
+
+
+async def ashared_version(key):
+    version = await cache.aget(key)
+    if version is not None:
+        return version
+    await cache.aadd(key, new_version(), None)
+    return await cache.aget(key)
+
+
+async def aids(queryset, field):
+    return {
+        pk async for pk in queryset.values_list(field, flat=True).aiterator()
+    }
+
+
+class ReferenceCache(abc.ABC):
+    """
+    Process-local cache of a small, almost immutable table.
+    Readers take an optional snapshot, so that async views can pass the
+    one they got from `aget_versioned`.
+
+    Rows are kept pre-serialized in every worker. Each snapshot remembers
+    the version stored under `version_key` in the shared cache backend;
+    the version is re-read at most once per REFERENCE_CACHE_CHECK_INTERVAL
+    seconds, so in steady state neither the database nor the shared cache
+    is touched. `invalidate` drops the local snapshot and bumps the shared
+    version, which makes the other workers rebuild theirs.
+    """
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (version, snapshot), replaced as a whole
+        self._current = None
+        self._checked_at = 0
+
+    @abc.abstractmethod
+    def build(self):
+        """
+        Snapshot of the table, built on the primary
+        """
+
+    def _is_fresh(self, version):
+        now = time.monotonic()
+        if now - self._checked_at < settings.REFERENCE_CACHE_CHECK_INTERVAL:
+            return True
+        self._checked_at = now
+        return shared_version(self.version_key) == version
+
+    def get_versioned(self):
+        """
+        Current snapshot together with the version it was built for
+        """
+        current = self._current
+        if current is not None and self._is_fresh(current[0]):
+            return current
+        with self._lock:
+            if self._current is None or self._current is current:
+                version = shared_version(self.version_key)
+                self._checked_at = time.monotonic()
+                # A lagging replica would store old rows under the version
+                with primary_reads():
+                    self._current = version, self.build()
+            return self._current
+
+    async def aget_versioned(self):
+        """
+        `get_versioned` for async views: the snapshot is returned without
+        leaving the event loop while it is fresh, and is rechecked or
+        rebuilt in a worker thread
+        """
+        current = self._current
+        if current is not None and (
+                time.monotonic() - self._checked_at
+                < settings.REFERENCE_CACHE_CHECK_INTERVAL):
+            return current
+        return await sync_to_async(self.get_versioned)()
+
+    def get_snapshot(self):
+        return self.get_versioned()[1]
+
+    @property
+    def version(self):
+        return self.get_versioned()[0]
+
+    def invalidate(self):
+        self._current = None
+        cache.set(self.version_key, new_version(), None)
+
+
+class TagCache(ReferenceCache):
+    """
+    Pre-serialized tags ordered by id
+    """
+    version_key = 'reference:tags:version'
+
+    def build(self):
+        items = list(
+            Tag.objects.order_by('id').values('id', 'name', 'color', 'slug')
+        )
+        return items, {item['id']: item for item in items}
+
+    def all(self, snapshot=None):
+        return (snapshot or self.get_snapshot())[0]
+
+    def get(self, pk, snapshot=None):
+        return (snapshot or self.get_snapshot())[1].get(pk)
+
+
+tag_cache = TagCache()
+
+
+class RecipeResponseCache:
+    """
+    Shared cache of serialized recipe responses.
+
+    Bodies are stored as an anonymous user sees them, under keys that
+    include a shared version: `invalidate` bumps the version and makes
+    every cached page stale at once. The parts that differ between users,
+    favorite, shopping cart and subscription flags, are cached per user
+    as sets of ids and laid over the shared body by the views.
+    """
+    version_key = 'recipes:responses:version'
+
+    def digest(self, parts):
+        return hashlib.md5(
+            '|'.join(map(str, parts)).encode(), usedforsecurity=False
+        ).hexdigest()
+
+    def key(self, *parts):
+        version = shared_version(self.version_key)
+        return f'recipes:responses:{version}:{self.digest(parts)}'
+
+    async def akey(self, *parts):
+        version = await ashared_version(self.version_key)
+        return f'recipes:responses:{version}:{self.digest(parts)}'
+
+    def get(self, key):
+        return cache.get(key)
+
+    async def aget(self, key):
+        return await cache.aget(key)
+
+    def timeout(self, version):
+        """
+        A body read from a replica less than DATABASE_REPLICA_LAG seconds
+        after the last invalidation may miss the change, it is only kept
+        until the replicas have caught up
+        """
+        if reads_from_replicas():
+            age = time.time() - version_time(version).timestamp()
+            if age < settings.DATABASE_REPLICA_LAG:
+                return max(settings.DATABASE_REPLICA_LAG - age, 1)
+        return settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+
+    def set(self, key, data):
+        cache.set(key, data, self.timeout(shared_version(self.version_key)))
+
+    async def aset(self, key, data):
+        await cache.aset(key, data, self.timeout(
+            await ashared_version(self.version_key)
+        ))
+
+    def invalidate(self):
+        cache.set(self.version_key, new_version(), None)
+
+    def user_flags_key(self, user_id):
+        return f'recipes:responses:flags:{user_id}'
+
+    def user_flags(self, user):
+        key = self.user_flags_key(user.pk)
+        flags = cache.get(key)
+        if flags is None:
+            flags = {
+                'favorites': set(Favorite.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)),
+                'shopping_cart': set(ShoppingCart.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)),
+                'subscriptions': set(Subscription.objects.filter(
+                    user=user
+                ).values_list('author_id', flat=True)),
+            }
+            cache.set(key, flags, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+        return flags
+
+    async def auser_flags(self, user):
+        """
+        `user_flags` for async views, the three sets are read concurrently
+        """
+        key = self.user_flags_key(user.pk)
+        flags = await cache.aget(key)
+        if flags is None:
+            favorites, shopping_cart, subscriptions = await asyncio.gather(
+                aids(Favorite.objects.filter(user=user), 'recipe_id'),
+                aids(ShoppingCart.objects.filter(user=user), 'recipe_id'),
+                aids(Subscription.objects.filter(user=user), 'author_id'),
+            )
+            flags = {
+                'favorites': favorites,
+                'shopping_cart': shopping_cart,
+                'subscriptions': subscriptions,
+            }
+            await cache.aset(
+                key, flags, settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+            )
+        return flags
+
+    def invalidate_user(self, user_id):
+        cache.delete(self.user_flags_key(user_id))
+
+
+recipe_response_cache = RecipeResponseCache()
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, RecipeIngredient
+from users.models import Subscription
+
+User = get_user_model()
+
+# (model, counter field, counted model, counted model foreign key)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'ingredients_count', RecipeIngredient, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def count_subquery(counted_model, field):
+    return Coalesce(Subquery(
+        counted_model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def increment(model, pks, counter):
+    model.objects.filter(pk__in=pks).update(**{counter: F(counter) + 1})
+
+
+def decrement(model, pks, counter):
+    model.objects.filter(pk__in=pks, **{f'{counter}__gt': 0}).update(
+        **{counter: F(counter) - 1}
+    )
+
+
+def count_mismatches(model, counter, counted_model, field):
+    return model.objects.annotate(
+        actual=count_subquery(counted_model, field)
+    ).exclude(**{counter: F('actual')}).count()
+
+
+def rebuild(model, counter, counted_model, field):
+    return model.objects.update(
+        **{counter: count_subquery(counted_model, field)}
+    )
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Subscription
+
+
+def followers(author_id):
+    return Subscription.objects.filter(
+        author_id=author_id,
+        author__subscribers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values_list('user', flat=True)
+
+
+def fan_out(recipe):
+    """
+    Add a new recipe to the feeds of its author's subscribers, unless
+    the author has FEED_FANOUT_LIMIT of them or more: those recipes are
+    merged into the feeds on read
+    """
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe.pk,
+                author_id=recipe.author_id, pub_date=recipe.pub_date
+            ) for user_id in followers(recipe.author_id).iterator()
+        ),
+        batch_size=settings.DATA_IMPORT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def quoted(model, field=None):
+    quote = connections[router.db_for_write(FeedEntry)].ops.quote_name
+    if field is None:
+        return quote(model._meta.db_table)
+    return quote(model._meta.get_field(field).column)
+
+
+def fill(author_ids, subscribers, user_id=None):
+    """
+    Add the latest FEED_BACKFILL_SIZE recipes of the given authors having
+    `subscribers` (an SQL condition on their count, like '< %s') to the
+    feeds of their subscribers, or of the one user, with a single
+    INSERT ... SELECT. Existing entries are kept.
+    """
+    if not author_ids:
+        return
+    author = quoted(Recipe, 'author')
+    pub_date = quoted(Recipe, 'pub_date')
+    statement = (
+        f'INSERT INTO {quoted(FeedEntry)} ({quoted(FeedEntry, "user")}, '
+        f'{quoted(FeedEntry, "recipe")}, {quoted(FeedEntry, "author")}, '
+        f'{quoted(FeedEntry, "pub_date")}) '
+        f'SELECT s.{quoted(Subscription, "user")}, ranked.id, '
+        f'ranked.author_id, ranked.pub_date '
+        f'FROM {quoted(Subscription)} AS s JOIN ('
+        f'SELECT r.id, r.{author} AS author_id, r.{pub_date} AS pub_date, '
+        f'ROW_NUMBER() OVER (PARTITION BY r.{author} '
+        f'ORDER BY r.{pub_date} DESC, r.id DESC) AS position '
+        f'FROM {quoted(Recipe)} AS r JOIN {quoted(CustomUser)} AS u '
+        f'ON u.id = r.{author} '
+        f'WHERE r.{author} IN ({", ".join(["%s"] * len(author_ids))}) '
+        f'AND u.{quoted(CustomUser, "subscribers_count")} {subscribers}'
+        f') AS ranked '
+        f'ON ranked.author_id = s.{quoted(Subscription, "author")} '
+        f'WHERE ranked.position <= %s'
+    )
+    params = [*author_ids, settings.FEED_FANOUT_LIMIT,
+              settings.FEED_BACKFILL_SIZE]
+    if user_id is not None:
+        statement += f' AND s.{quoted(Subscription, "user")} = %s'
+        params.append(user_id)
+    with connections[router.db_for_write(FeedEntry)].cursor() as cursor:
+        cursor.execute(statement + ' ON CONFLICT DO NOTHING', params)
+
+
+def backfill(user_id, author_ids):
+    """
+    Add the latest recipes of newly followed authors to the user's feed
+    """
+    fill(author_ids, '< %s', user_id)
+
+
+def refill(author_ids):
+    """
+    Authors who just fell below FEED_FANOUT_LIMIT subscribers get their
+    latest recipes written to all feeds again: the ones published while
+    they were merged on read have no entries yet
+    """
+    fill(author_ids, '= %s - 1')
+
+
+def drop(user_id, author_ids):
+    FeedEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def rebuild():
+    """
+    Rewrite all feeds from the subscriptions: the latest recipes of every
+    fanned out author for each of the author's subscribers
+    """
+    FeedEntry.objects.all().delete()
+    authors = CustomUser.objects.filter(
+        subscribers_count__gt=0,
+        subscribers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', flat=True)
+    total = 0
+    for author_id in authors.iterator():
+        recipes = list(Recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list(
+            'pk', 'pub_date'
+        )[:settings.FEED_BACKFILL_SIZE])
+        if not recipes:
+            continue
+        entries = [
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+                pub_date=pub_date
+            )
+            for user_id in Subscription.objects.filter(
+                author_id=author_id
+            ).values_list('user', flat=True)
+            for recipe_id, pub_date in recipes
+        ]
+        FeedEntry.objects.bulk_create(
+            entries, batch_size=settings.DATA_IMPORT_BATCH_SIZE
+        )
+        total += len(entries)
+    return total
+
+
+def after(queryset, position, date_field, id_field):
+    if position is None:
+        return queryset
+    pub_date, pk = position
+    return queryset.filter(
+        Q(**{f'{date_field}__lt': pub_date})
+        | Q(**{date_field: pub_date, f'{id_field}__lt': pk})
+    )
+
+
+def entry_keys(user, position):
+    return after(
+        FeedEntry.objects.filter(user=user), position,
+        'pub_date', 'recipe_id'
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )
+
+
+def merged_keys(user, position):
+    return after(
+        Recipe.objects.filter(author__in=Subscription.objects.filter(
+            user=user,
+            author__subscribers_count__gte=settings.FEED_FANOUT_LIMIT
+        ).values('author')), position, 'pub_date', 'pk'
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'pk')
+
+
+def page(user, position, limit):
+    """
+    Recipes of the user's feed after the (pub_date, id) position, newest
+    first: a range scan of the materialized entries merged with the
+    recipes of followed authors that are not fanned out
+    """
+    keys = sorted(
+        set(entry_keys(user, position)[:limit])
+        | set(merged_keys(user, position)[:limit]),
+        reverse=True
+    )[:limit]
+    recipes = Recipe.objects.with_related(user).with_user_flags(
+        user
+    ).defer('search_vector').in_bulk([pk for _, pk in keys])
+    return [recipes[pk] for _, pk in keys if pk in recipes]
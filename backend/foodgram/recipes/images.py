@@ -0,0 +1,97 @@
+import functools
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from recipes.cache import recipe_response_cache
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Recipe image field: bounding box of the variant
+VARIANTS = {
+    'image_thumbnail': (480, 480),
+    'image_full': (1280, 1280),
+}
+
+if features.check('webp'):
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'WEBP', 'webp'
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = 'JPEG', 'jpg'
+
+
+@functools.cache
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_PROCESSING_WORKERS,
+        thread_name_prefix='recipe-images'
+    )
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    variant.save(buffer, VARIANT_FORMAT, quality=settings.IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe_id):
+    """
+    Render resized copies of the recipe image and store them in the
+    variant fields. The image is decoded once, in draft mode for JPEG,
+    so at most the full-size variant is held in memory.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only('id', 'image').first()
+    if recipe is None or not recipe.image:
+        return
+    name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    largest = max(VARIANTS.values())
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image.draft('RGB', largest)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail(largest, Image.Resampling.LANCZOS)
+        stored = {}
+        for field, size in VARIANTS.items():
+            file_field = getattr(recipe, field)
+            file_field.save(
+                f'{name}.{VARIANT_EXTENSION}',
+                render_variant(image, size),
+                save=False
+            )
+            stored[field] = file_field.name
+    if Recipe.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        updated_at=timezone.now(), **stored
+    ):
+        recipe_response_cache.invalidate()
+
+
+def run_in_worker(recipe_id):
+    close_old_connections()
+    try:
+        generate_variants(recipe_id)
+    except Exception:
+        logger.exception('Image variants of recipe %s failed', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(recipe):
+    """
+    Generate image variants in the worker pool once the current
+    transaction is committed, or inline if the pool is disabled.
+    """
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(run_in_worker, recipe.pk)
+        else:
+            generate_variants(recipe.pk)
+
+    transaction.on_commit(submit)
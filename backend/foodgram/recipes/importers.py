@@ -0,0 +1,388 @@
+import csv
+import io
+import json
+import re
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_response_cache, tag_cache
+from recipes.models import Ingredient, Tag
+
+FORMATS = ('csv', 'json')
+JSON_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+
+class DataImportError(Exception):
+    pass
+
+
+class Dataset:
+    """
+    Reference data importable by `load_data`: `fields` in the order of
+    the CSV columns, `key` fields identifying an existing row and cache
+    invalidations to run once the import is committed.
+    """
+    def __init__(self, model, fields, key, invalidate=()):
+        self.model = model
+        self.fields = fields
+        self.key = key
+        self.update_fields = tuple(
+            field for field in fields if field not in key
+        )
+        # Unique on their own besides the key: a row reusing such a value
+        # of another row cannot be saved
+        self.unique_fields = tuple(
+            field for field in self.update_fields
+            if model._meta.get_field(field).unique
+        )
+        self.invalidate = invalidate
+
+    def clean(self, row):
+        """
+        Tuple of stripped field values of a CSV row or JSON object,
+        None if the row is malformed or a value is empty or too long
+        """
+        if isinstance(row, dict):
+            row = [row.get(field) for field in self.fields]
+        if len(row) != len(self.fields):
+            return None
+        values = []
+        for field, value in zip(self.fields, row):
+            if not isinstance(value, str):
+                return None
+            value = value.strip()
+            max_length = self.model._meta.get_field(field).max_length
+            if not value or len(value) > max_length:
+                return None
+            values.append(value)
+        return tuple(values)
+
+    def key_of(self, values):
+        return tuple(
+            value for field, value in zip(self.fields, values)
+            if field in self.key
+        )
+
+    def unique_of(self, values):
+        return [
+            (field, value) for field, value in zip(self.fields, values)
+            if field in self.unique_fields
+        ]
+
+
+DATASETS = {
+    'ingredients': Dataset(
+        Ingredient, ('name', 'measurement_unit'),
+        key=('name', 'measurement_unit'),
+        invalidate=(ingredient_index.invalidate,)
+    ),
+    'tags': Dataset(
+        Tag, ('name', 'color', 'slug'),
+        key=('slug',),
+        invalidate=(tag_cache.invalidate, recipe_response_cache.invalidate)
+    ),
+}
+
+
+class JSONArrayReader:
+    """
+    Objects of a top-level JSON array, decoded one at a time from
+    fixed-size chunks so the file is never loaded whole
+    """
+    decoder = json.JSONDecoder()
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer, self.position = '', 0
+
+    def read(self):
+        chunk = self.file.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            raise DataImportError('Unexpected end of the JSON file.')
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        while True:
+            self.position = WHITESPACE.match(
+                self.buffer, self.position
+            ).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            self.read()
+
+    def decode(self):
+        if self.peek() != '{':
+            raise DataImportError('JSON array has to contain objects.')
+        while True:
+            try:
+                row, self.position = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                self.read()
+                continue
+            return row
+
+    def __iter__(self):
+        if self.peek() != '[':
+            raise DataImportError('JSON file has to contain an array.')
+        self.position += 1
+        if self.peek() == ']':
+            return
+        while True:
+            yield self.decode()
+            char = self.peek()
+            if char == ']':
+                return
+            if char != ',':
+                raise DataImportError('Malformed JSON array.')
+            self.position += 1
+
+
+READERS = {'csv': csv.reader, 'json': JSONArrayReader}
+
+
+def batches(dataset, rows, batch_size, counts):
+    """
+    Cleaned rows in lists of `batch_size`, each numbered by its line.
+    Malformed rows are counted as skipped.
+    """
+    batch = []
+    for line, row in enumerate(rows, 1):
+        values = dataset.clean(row)
+        if values is None:
+            counts['skipped'] += 1
+            continue
+        batch.append((line, values))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def conflict_message(dataset, line, field, value):
+    return 'line {}: {} "{}" belongs to another {}, skipped'.format(
+        line, field, value, dataset.model._meta.model_name
+    )
+
+
+def owners(dataset, manager, rows):
+    """
+    Keys of the stored rows holding the unique values of the given rows,
+    by field and value
+    """
+    found = {field: {} for field in dataset.unique_fields}
+    if not dataset.unique_fields:
+        return found
+    lookup = Q()
+    for field in dataset.unique_fields:
+        lookup |= Q(**{f'{field}__in': {
+            dict(dataset.unique_of(values))[field] for _, values in rows
+        }})
+    for values in manager.filter(lookup).values_list(*dataset.fields):
+        for field, value in dataset.unique_of(values):
+            found[field][value] = dataset.key_of(values)
+    return found
+
+
+def without_conflicts(dataset, manager, rows, claimed, counts, report):
+    """
+    Rows whose unique values are neither held by another stored row nor
+    claimed by an earlier row of the file. Conflicting rows are counted
+    as skipped and reported instead of failing the whole import.
+    """
+    stored = owners(dataset, manager, rows.values())
+    result = {}
+    for key, (line, values) in rows.items():
+        pairs = dataset.unique_of(values)
+        taken = [
+            (field, value) for field, value in pairs
+            if claimed[field].get(value, stored[field].get(value, key))
+            != key
+        ]
+        if taken:
+            counts['skipped'] += 1
+            counts['conflicting'] += 1
+            for field, value in taken:
+                report(conflict_message(dataset, line, field, value))
+            continue
+        for field, value in pairs:
+            claimed[field][value] = key
+        result[key] = values
+    return result
+
+
+def upsert(dataset, rows, batch_size, counts, using, report):
+    """
+    Per batch, read the existing rows with the same keys, then insert
+    new and changed rows with a single INSERT ... ON CONFLICT. The first
+    occurrence of a key in the file wins, later ones are skipped, as are
+    rows reusing a unique value of another row.
+    """
+    model = dataset.model
+    manager = model.objects.using(using)
+    options = {'ignore_conflicts': True}
+    if dataset.update_fields:
+        options = {
+            'update_conflicts': True,
+            'unique_fields': dataset.key,
+            'update_fields': dataset.update_fields,
+        }
+    seen = set()
+    claimed = {field: {} for field in dataset.unique_fields}
+    for batch in batches(dataset, rows, batch_size, counts):
+        unique = {}
+        for line, values in batch:
+            key = dataset.key_of(values)
+            if key in seen:
+                counts['skipped'] += 1
+                continue
+            seen.add(key)
+            unique[key] = (line, values)
+        unique = without_conflicts(
+            dataset, manager, unique, claimed, counts, report
+        )
+        existing = {
+            dataset.key_of(values): values
+            for values in manager.filter(**{
+                f'{dataset.key[0]}__in': {key[0] for key in unique}
+            }).values_list(*dataset.fields)
+        }
+        changed = []
+        for key, values in unique.items():
+            if key not in existing:
+                counts['inserted'] += 1
+            elif existing[key] != values:
+                counts['updated'] += 1
+            else:
+                counts['skipped'] += 1
+                continue
+            changed.append(model(**dict(zip(dataset.fields, values))))
+        if changed:
+            manager.bulk_create(changed, **options)
+
+
+def drop_conflicts(dataset, cursor, table, columns, counts, report):
+    """
+    Delete the copied rows repeating a key of an earlier line, then the
+    ones reusing a unique value of another stored row or of an earlier
+    line, reporting the latter
+    """
+    key = dataset.key
+
+    def row(alias, fields):
+        return '({})'.format(
+            ', '.join(f'{alias}.{columns[field]}' for field in fields)
+        )
+
+    cursor.execute(
+        f'DELETE FROM import_rows AS r USING import_rows AS o '
+        f'WHERE {row("o", key)} = {row("r", key)} AND o.line < r.line'
+    )
+    for field in dataset.unique_fields:
+        column = columns[field]
+        cursor.execute(
+            f'DELETE FROM import_rows AS r WHERE EXISTS ('
+            f'SELECT 1 FROM {table} AS t WHERE t.{column} = r.{column} '
+            f'AND {row("t", key)} <> {row("r", key)}) OR EXISTS ('
+            f'SELECT 1 FROM import_rows AS o WHERE o.{column} = r.{column} '
+            f'AND o.line < r.line) RETURNING r.line, r.{column}'
+        )
+        for line, value in sorted(cursor.fetchall()):
+            counts['conflicting'] += 1
+            report(conflict_message(dataset, line, field, value))
+
+
+def copy(dataset, rows, batch_size, counts, using, report):
+    """
+    Postgres fast path: COPY the batches into a temporary table, drop
+    duplicate and conflicting rows, then upsert the rest with one
+    INSERT ... SELECT ... ON CONFLICT that reports how many rows it
+    inserted and updated.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    opts = dataset.model._meta
+    table = quote(opts.db_table)
+    columns = {
+        field: quote(opts.get_field(field).column) for field in dataset.fields
+    }
+    names = ', '.join(columns.values())
+    key = ', '.join(columns[field] for field in dataset.key)
+    if dataset.update_fields:
+        updated = [columns[field] for field in dataset.update_fields]
+        conflict = 'DO UPDATE SET {} WHERE ({}) IS DISTINCT FROM ({})'.format(
+            ', '.join(f'{column} = EXCLUDED.{column}' for column in updated),
+            ', '.join(f'{table}.{column}' for column in updated),
+            ', '.join(f'EXCLUDED.{column}' for column in updated),
+        )
+    else:
+        conflict = 'DO NOTHING'
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE import_rows (line bigint, {}) '
+            'ON COMMIT DROP'.format(
+                ', '.join(f'{column} text' for column in columns.values())
+            )
+        )
+        for batch in batches(dataset, rows, batch_size, counts):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(
+                (line, *values) for line, values in batch
+            )
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY import_rows (line, {names}) FROM STDIN '
+                f'WITH (FORMAT csv)', buffer
+            )
+            total += len(batch)
+        drop_conflicts(dataset, cursor, table, columns, counts, report)
+        cursor.execute(
+            f'WITH upserted AS ('
+            f'INSERT INTO {table} ({names}) '
+            f'SELECT {names} FROM ('
+            f'SELECT DISTINCT ON ({key}) * FROM import_rows '
+            f'ORDER BY {key}, line) AS first_rows '
+            f'ON CONFLICT ({key}) {conflict} '
+            f'RETURNING xmax = 0 AS inserted) '
+            f'SELECT count(*) FILTER (WHERE inserted), '
+            f'count(*) FILTER (WHERE NOT inserted) FROM upserted'
+        )
+        inserted, updated = cursor.fetchone()
+    counts['inserted'] += inserted
+    counts['updated'] += updated
+    counts['skipped'] += total - inserted - updated
+
+
+def load(name, file, file_format, batch_size, dry_run=False,
+         use_copy=False, using='default', report=None):
+    """
+    Import reference data from an open CSV or JSON file in a single
+    transaction and return the numbers of inserted, updated and skipped
+    rows. Skipped rows conflicting with other rows on a unique field are
+    also counted apart and passed to `report`. A dry run does the same
+    work and rolls it back.
+    """
+    dataset = DATASETS[name]
+    if use_copy and connections[using].vendor != 'postgresql':
+        raise DataImportError('COPY is only available on PostgreSQL.')
+    counts = Counter(inserted=0, updated=0, skipped=0, conflicting=0)
+    rows = READERS[file_format](file)
+    with transaction.atomic(using=using):
+        (copy if use_copy else upsert)(
+            dataset, rows, batch_size, counts, using,
+            report or (lambda message: None)
+        )
+        if dry_run:
+            transaction.set_rollback(True, using=using)
+        elif counts['inserted'] or counts['updated']:
+            for invalidate in dataset.invalidate:
+                transaction.on_commit(invalidate, using=using)
+    return counts
@@ -0,0 +1,216 @@
+import math
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from recipes.seeding import power_law
+
+PERCENTILES = (50, 95, 99)
+EXPONENT = 1.1
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a non-empty list
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Catalog:
+    """
+    Ids the workload picks from: recipes and authors by power law of
+    their position, like the popularity generated by seed_load
+    """
+    def __init__(self, rnd, recipe_ids, author_ids, ingredient_ids,
+                 ingredient_names, tag_slugs):
+        self.rnd = rnd
+        self.recipe = power_law(rnd, recipe_ids, EXPONENT)
+        self.author = power_law(rnd, author_ids, EXPONENT)
+        self.ingredient_ids = ingredient_ids
+        self.ingredient_names = ingredient_names
+        self.tag_slugs = tag_slugs
+
+
+def recipe_list(catalog):
+    page = min(20, int(catalog.rnd.paretovariate(1.5)))
+    return 'get', f'/api/recipes/?page={page}&limit=6', None
+
+
+def recipe_list_by_tag(catalog):
+    slug = catalog.rnd.choice(catalog.tag_slugs)
+    return 'get', f'/api/recipes/?tags={slug}&limit=6', None
+
+
+def recipe_detail(catalog):
+    return 'get', f'/api/recipes/{catalog.recipe()[0]}/', None
+
+
+def recipe_search(catalog):
+    return 'get', f'/api/recipes/?search={catalog.recipe()[0]}', None
+
+
+def ingredient_search(catalog):
+    name = catalog.rnd.choice(catalog.ingredient_names)
+    return 'get', f'/api/ingredients/?name={name[:3]}', None
+
+
+def tag_list(catalog):
+    return 'get', '/api/tags/', None
+
+
+def cook(catalog):
+    ingredients = '&'.join(
+        f'ingredients={pk}' for pk in catalog.rnd.sample(
+            catalog.ingredient_ids, min(10, len(catalog.ingredient_ids))
+        )
+    )
+    return 'get', f'/api/recipes/cook/?{ingredients}', None
+
+
+def subscriptions(catalog):
+    return 'get', '/api/users/subscriptions/?recipes_limit=3', None
+
+
+def download_shopping_cart(catalog):
+    return 'get', '/api/recipes/download_shopping_cart/?type=txt', None
+
+
+def toggle(route, method):
+    def request(catalog):
+        return method, f'/api/recipes/{catalog.recipe()[0]}/{route}/', None
+
+    return request
+
+
+def subscribe(method):
+    def request(catalog):
+        return method, f'/api/users/{catalog.author()[0]}/subscribe/', None
+
+    return request
+
+
+# Endpoint: weight in the mix, whether it needs a token, request builder
+MIX = {
+    'recipes-list': (30, False, recipe_list),
+    'recipes-list tags': (8, False, recipe_list_by_tag),
+    'recipes-detail': (20, False, recipe_detail),
+    'recipes-search': (4, False, recipe_search),
+    'ingredients-list': (8, False, ingredient_search),
+    'tags-list': (3, False, tag_list),
+    'cook': (2, False, cook),
+    'subscriptions': (5, True, subscriptions),
+    'download_shopping_cart': (1, True, download_shopping_cart),
+    'favorite add': (5, True, toggle('favorite', 'post')),
+    'favorite remove': (5, True, toggle('favorite', 'delete')),
+    'shopping_cart add': (3, True, toggle('shopping_cart', 'post')),
+    'shopping_cart remove': (3, True, toggle('shopping_cart', 'delete')),
+    'subscribe add': (1, True, subscribe('post')),
+    'subscribe remove': (1, True, subscribe('delete')),
+}
+
+
+def login(session, base_url, email, password):
+    response = session.post(
+        f'{base_url}/api/auth/token/login/',
+        json={'email': email, 'password': password}
+    )
+    response.raise_for_status()
+    session.headers['Authorization'] = (
+        f'Token {response.json()["auth_token"]}'
+    )
+
+
+def virtual_user(base_url, catalog, credentials, deadline, requests_limit,
+                 session_factory):
+    """
+    Send requests of the mix one after another until the deadline or the
+    request limit and return the latencies and errors per endpoint
+    """
+    session = session_factory()
+    if credentials:
+        login(session, base_url, *credentials)
+    names = [
+        name for name, (_, auth, _) in MIX.items()
+        if credentials or not auth
+    ]
+    weights = [MIX[name][0] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    sent = 0
+    while time.monotonic() < deadline and sent < requests_limit:
+        name = catalog.rnd.choices(names, weights)[0]
+        method, path, data = MIX[name][2](catalog)
+        start = time.perf_counter()
+        response = session.request(method, base_url + path, json=data)
+        latencies[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors[name] += 1
+        sent += 1
+    return latencies, errors
+
+
+def run(base_url, credentials, catalog_data, virtual_users=10,
+        duration=60, max_requests=None, anonymous=0.0, seed=None,
+        session_factory=requests.Session):
+    """
+    Replay the mixed workload with `virtual_users` concurrent clients,
+    a share of them anonymous, and return the latency report
+    """
+    rnd = random.Random(seed)
+    for ids in (catalog_data['recipe_ids'], catalog_data['author_ids']):
+        rnd.shuffle(ids)
+    start = time.monotonic()
+    deadline = start + duration
+    limit = math.inf if max_requests is None else math.ceil(
+        max_requests / virtual_users
+    )
+    arguments = []
+    for num in range(virtual_users):
+        catalog = Catalog(random.Random(rnd.random()), **catalog_data)
+        user = None
+        if credentials and rnd.random() >= anonymous:
+            user = credentials[num % len(credentials)]
+        arguments.append(
+            (base_url, catalog, user, deadline, limit, session_factory)
+        )
+    if virtual_users == 1:
+        results = [virtual_user(*arguments[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=virtual_users) as executor:
+            results = list(executor.map(
+                lambda args: virtual_user(*args), arguments
+            ))
+    return report(results, time.monotonic() - start)
+
+
+def report(results, elapsed):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for user_latencies, user_errors in results:
+        for name, values in user_latencies.items():
+            latencies[name].extend(values)
+        for name, count in user_errors.items():
+            errors[name] += count
+    rows = []
+    for name in sorted(latencies):
+        values = latencies[name]
+        rows.append({
+            'endpoint': name,
+            'requests': len(values),
+            'errors': errors[name],
+            **{
+                f'p{percent}': round(percentile(values, percent), 2)
+                for percent in PERCENTILES
+            },
+        })
+    total = sum(row['requests'] for row in rows)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'rps': round(total / elapsed, 2) if elapsed else 0,
+        'endpoints': rows,
+    }
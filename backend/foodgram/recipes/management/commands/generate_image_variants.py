@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="regenerate variants of every recipe, not only missing ones"
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(image_thumbnail=None)
+        total = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            generate_variants(recipe_id)
+            total += 1
+        self.stdout.write(f'Generated image variants of {total} recipes')
@@ -0,0 +1,68 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importers import DATASETS, FORMATS, DataImportError, load
+
+
+class Command(BaseCommand):
+    help = (
+        'Import ingredients or tags from a CSV or JSON file, inserting new '
+        'rows and updating changed ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=DATASETS)
+        parser.add_argument("path", type=str, help="file path")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="file format, taken from the file extension by default"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.DATA_IMPORT_BATCH_SIZE,
+            help="rows per query"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="report the counts and roll the import back"
+        )
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="load the file with COPY, PostgreSQL only"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path
+        )[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Unknown file format "{file_format}", use --format'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size has to be positive')
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                counts = load(
+                    options['dataset'], file, file_format,
+                    options['batch_size'], dry_run=options['dry_run'],
+                    use_copy=options['copy'], report=self.stderr.write
+                )
+        except (OSError, DataImportError) as error:
+            raise CommandError(error)
+        self.stdout.write(
+            '{}: {} inserted, {} updated, {} skipped{}{}'.format(
+                options['dataset'], counts['inserted'], counts['updated'],
+                counts['skipped'],
+                ', {} of them conflicting'.format(counts['conflicting'])
+                if counts['conflicting'] else '',
+                ' (dry run, nothing saved)' if options['dry_run'] else ''
+            )
+        )
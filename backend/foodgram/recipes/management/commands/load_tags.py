@@ -1,22 +1,15 @@
-import csv
-
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
-from recipes.models import Tag
-
 
 class Command(BaseCommand):
+    help = 'Import tags from a CSV file, same as load_data tags'
 
     def add_arguments(self, parser):
         parser.add_argument("--path", type=str, help="file path")
 
     def handle(self, *args, **options):
-        file_path = options["path"]
-
-        with open(file_path, encoding='utf-8') as file:
-            reader = csv.reader(file)
-            Tag.objects.bulk_create(
-                Tag(
-                    name=row[0], color=row[1], slug=row[2]
-                ) for row in reader
-            )
+        call_command(
+            'load_data', 'tags', str(options["path"]), format='csv',
+            stdout=self.stdout
+        )
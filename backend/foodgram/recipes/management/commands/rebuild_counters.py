@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import COUNTERS, count_mismatches, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify and rebuild denormalized counters: recipe favorites, '
+        'user recipes and subscribers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="only report mismatched counters, fail if there are any"
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, counter, counted_model, field in COUNTERS:
+            mismatches = count_mismatches(model, counter, counted_model, field)
+            total += mismatches
+            self.stdout.write(
+                f'{model.__name__}.{counter}: {mismatches} mismatched'
+            )
+            if mismatches and not options['check']:
+                rebuild(model, counter, counted_model, field)
+        if options['check'] and total:
+            raise CommandError(f'{total} counters are out of sync')
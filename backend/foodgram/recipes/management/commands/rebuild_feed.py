@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized subscription feeds of all users'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{rebuild()} feed entries written')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of recipes'
+
+    def handle(self, *args, **options):
+        update_search_index(Recipe.objects.all())
+        self.stdout.write('Recipe search index rebuilt')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.shopping_list import count_mismatches, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify and rebuild the materialized shopping lists of all users '
+        'from their shopping carts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="only report mismatched rows, fail if there are any"
+        )
+
+    def handle(self, *args, **options):
+        mismatches = count_mismatches()
+        self.stdout.write(f'Shopping lists: {mismatches} rows mismatched')
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'{mismatches} shopping list rows are out of sync'
+                )
+            return
+        if mismatches:
+            self.stdout.write(f'{rebuild()} shopping list rows written')
@@ -0,0 +1,107 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.loadtest import PERCENTILES, run
+from recipes.management.commands.seed_load import SEED_PASSWORD
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mixed read/write workload of seeded users against a '
+        'running API and report p50/p95/p99 latency per endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://localhost:8000",
+            help="base URL of the API"
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=10,
+            help="number of concurrent virtual users"
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=60,
+            help="seconds to run"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            help="stop after this many requests in total"
+        )
+        parser.add_argument(
+            "--anonymous",
+            type=float,
+            default=0.3,
+            help="share of virtual users sending anonymous requests"
+        )
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="username prefix of the users created by seed_load"
+        )
+        parser.add_argument("--password", default=SEED_PASSWORD)
+        parser.add_argument("--seed", type=int, help="random seed")
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="print the report as JSON"
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['duration'] <= 0:
+            raise CommandError('Users and duration have to be positive')
+        credentials = [
+            (email, options['password'])
+            for email in CustomUser.objects.filter(
+                username__startswith=options['prefix']
+            ).values_list('email', flat=True)[:options['users']]
+        ]
+        catalog = {
+            'recipe_ids': list(Recipe.objects.values_list('pk', flat=True)),
+            'author_ids': list(CustomUser.objects.filter(
+                recipes_count__gt=0
+            ).values_list('pk', flat=True)),
+            'ingredient_ids': list(
+                Ingredient.objects.values_list('pk', flat=True)
+            ),
+            'ingredient_names': list(
+                Ingredient.objects.values_list('name', flat=True)
+            ),
+            'tag_slugs': list(Tag.objects.values_list('slug', flat=True)),
+        }
+        if not all(catalog.values()):
+            raise CommandError('Seed the database with seed_load first')
+        result = run(
+            options['url'].rstrip('/'), credentials, catalog,
+            virtual_users=options['users'], duration=options['duration'],
+            max_requests=options['requests'],
+            anonymous=options['anonymous'], seed=options['seed']
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(
+            f'{"endpoint":<28}{"requests":>10}{"errors":>8}'
+            + ''.join(f'{f"p{percent}, ms":>11}' for percent in PERCENTILES)
+        )
+        for row in result['endpoints']:
+            self.stdout.write(
+                f'{row["endpoint"]:<28}{row["requests"]:>10}'
+                f'{row["errors"]:>8}'
+                + ''.join(
+                    f'{row[f"p{percent}"]:>11.2f}' for percent in PERCENTILES
+                )
+            )
+        self.stdout.write(
+            f'{result["requests"]} requests in {result["elapsed_s"]} s, '
+            f'{result["rps"]} requests per second'
+        )
@@ -0,0 +1,94 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cache import recipe_response_cache
+from recipes.models import Ingredient, Tag
+from recipes.seeding import seed
+
+SEED_PASSWORD = 'load-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate users, recipes, favorites, shopping carts and '
+        'subscriptions with power-law distributions for load testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--favorites",
+            type=float,
+            default=20,
+            help="mean number of favorites per user"
+        )
+        parser.add_argument(
+            "--shopping-cart",
+            type=float,
+            default=5,
+            help="mean number of shopping cart recipes per user"
+        )
+        parser.add_argument(
+            "--subscriptions",
+            type=float,
+            default=10,
+            help="mean number of subscriptions per user"
+        )
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=1.1,
+            help="power-law exponent of author, recipe and follow popularity"
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=8,
+            help="number of distinct small images shared by recipes"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, help="random seed")
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="username and email prefix of generated users"
+        )
+        parser.add_argument(
+            "--password",
+            default=SEED_PASSWORD,
+            help="password of generated users, used by run_load"
+        )
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['recipes'], options['images'],
+               options['favorites'], options['shopping_cart'],
+               options['subscriptions']) < 0:
+            raise CommandError('Populations have to be non-negative')
+        if options['batch_size'] < 1 or options['exponent'] <= 0:
+            raise CommandError(
+                'Batch size and exponent have to be positive'
+            )
+        if options['recipes'] and not options['users']:
+            raise CommandError('Recipes need at least one user')
+        if not (Ingredient.objects.exists() and Tag.objects.exists()):
+            raise CommandError(
+                'Load ingredients and tags with load_data first'
+            )
+        created = seed(
+            options['users'], options['recipes'], options['favorites'],
+            options['shopping_cart'], options['subscriptions'],
+            exponent=options['exponent'], images=options['images'],
+            password=options['password'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            prefix=options['prefix']
+        )
+        call_command('rebuild_counters', stdout=io.StringIO())
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        call_command('rebuild_feed', stdout=io.StringIO())
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        recipe_response_cache.invalidate()
+        for name, count in created.items():
+            self.stdout.write(f'{name}: {count} created')
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # A separate migration: on PostgreSQL the merge leaves deferred
+    # foreign key checks pending, and ALTER TABLE cannot run on the
+    # ingredient table until they are fired at commit
+
+    dependencies = [
+        ('recipes', '0009_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient_name_unit_unique'),
+        ),
+    ]
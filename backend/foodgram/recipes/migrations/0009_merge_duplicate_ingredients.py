@@ -0,0 +1,57 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:53
+
+from django.db import migrations
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Point recipes at the oldest of identical ingredients and delete the
+    rest. A recipe listing several of them keeps the oldest one only,
+    its ingredients_count is recounted.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    affected = set()
+    for group in duplicates:
+        others = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(pk=group['keep'])
+        for other in others.values_list('pk', flat=True):
+            relations = RecipeIngredient.objects.filter(ingredient_id=other)
+            repeated = relations.filter(
+                recipe__in=RecipeIngredient.objects.filter(
+                    ingredient_id=group['keep']
+                ).values('recipe')
+            )
+            affected.update(repeated.values_list('recipe_id', flat=True))
+            repeated.delete()
+            relations.update(ingredient_id=group['keep'])
+        others.delete()
+    Recipe.objects.filter(pk__in=affected).update(
+        ingredients_count=Coalesce(Subquery(
+            RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_ingredients_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
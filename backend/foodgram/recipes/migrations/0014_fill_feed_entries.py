@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_feed_entries(apps, schema_editor):
+    """
+    Write the feeds of the subscriptions which existed before the feed
+    table, the same way recipes.feed.rebuild does
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    authors = CustomUser.objects.filter(
+        subscribers_count__gt=0,
+        subscribers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', flat=True)
+    for author_id in authors.iterator():
+        recipes = list(Recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list(
+            'pk', 'pub_date'
+        )[:settings.FEED_BACKFILL_SIZE])
+        if not recipes:
+            continue
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id,
+                    author_id=author_id, pub_date=pub_date
+                )
+                for user_id in Subscription.objects.filter(
+                    author_id=author_id
+                ).values_list('user', flat=True)
+                for recipe_id, pub_date in recipes
+            ),
+            batch_size=settings.DATA_IMPORT_BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_fill_search_vector'),
+        ('users', '0003_subscription_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Value
+
+from users.models import CountersMixin, Subscription
 
 User = get_user_model()
 
@@ -18,6 +23,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='ingredient_name_unit_unique'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -45,7 +56,51 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self, user=None):
+        """
+        Load author, tags and ingredients of every recipe in a fixed
+        number of queries instead of one query per recipe. Ingredient
+        names are not joined: serializers take them from the in-memory
+        ingredient index.
+        """
+        authors = User.objects.all()
+        if user is not None and user.is_authenticated:
+            authors = authors.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user, author=OuterRef('pk')
+                )
+            ))
+        else:
+            authors = authors.annotate(is_subscribed=Value(False))
+        return self.prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            'ingredient_relation',
+        )
+
+    def with_user_flags(self, user):
+        """
+        Annotate recipes with is_favorited and is_in_shopping_cart
+        flags of the given user.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False)
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
+
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -71,6 +126,20 @@ class Recipe(models.Model):
         null=True,
         verbose_name='Изображение рецепта'
     )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/thumbnails/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Миниатюра изображения'
+    )
+    image_full = models.ImageField(
+        upload_to='recipes/full/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Изображение для страницы рецепта'
+    )
     cooking_time = models.IntegerField(
         verbose_name='Время приготовления в минутах',
         validators=[
@@ -86,11 +155,47 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
+    ingredients_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество ингредиентов'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    # ingredients_count is written with the ingredients by the serializer
+    counter_fields = ('favorites_count',)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -101,12 +206,16 @@ class RecipeIngredient(models.Model):
         Recipe,
         related_name='ingredient_relation',
         on_delete=models.CASCADE,
+        # Leading column of recipe_ingredient_unique
+        db_index=False,
         verbose_name='Рецепт'
     )
     ingredient = models.ForeignKey(
         Ingredient,
         related_name='recipe_relation',
         on_delete=models.CASCADE,
+        # Leading column of recipe_ingredient_lookup_idx
+        db_index=False,
         verbose_name='Ингредиент'
     )
     amount = models.IntegerField(verbose_name='Кол-во ингредиентов')
@@ -120,6 +229,12 @@ class RecipeIngredient(models.Model):
                 name='recipe_ingredient_unique'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipe_ingredient_lookup_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.recipe}{self.ingredient}'
@@ -129,6 +244,8 @@ class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        # Leading column of user_shoppingcart_unique
+        db_index=False,
         verbose_name='Пользователь'
     )
     recipe = models.ForeignKey(
@@ -151,10 +268,45 @@ class ShoppingCart(models.Model):
         return f'{self.user} добавил {self.recipe} в список покупок'
 
 
+class ShoppingListItem(models.Model):
+    """
+    Amount of an ingredient summed over the recipes in the shopping cart
+    of a user. Recounted when the cart or the ingredients of its recipes
+    change, so a shopping list is a read of the user's rows.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        # Leading column of user_shopping_list_item_unique
+        db_index=False,
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField(verbose_name='Кол-во ингредиента')
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='user_shopping_list_item_unique'
+            )
+        ]
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        # Leading column of user_favorite_unique
+        db_index=False,
         verbose_name='Пользователь'
     )
     recipe = models.ForeignKey(
@@ -175,3 +327,51 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в избранное'
+
+
+class FeedEntry(models.Model):
+    """
+    Recipe in the subscription feed of a user. Written when a followed
+    author publishes a recipe or the user subscribes to an author, so a
+    feed page is a range scan of the user's entries.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        # Leading column of feed_entry_user_pub_date_idx
+        db_index=False,
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='user_feed_entry_unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
@@ -0,0 +1,78 @@
+from django.db import connections, router, transaction
+from django.dispatch import Signal
+
+# Sent after user relations (favorites, shopping cart, subscriptions)
+# were added or removed in bulk, with the action ('add' or 'remove'),
+# the user id and the ids of the rows actually inserted or deleted
+relations_changed = Signal()
+
+
+def execute(model, field, statement, params):
+    """
+    Run the statement over the table of the relation model and return
+    the related ids it reports. `statement` is formatted with the quoted
+    table, user and related columns.
+
+    The ORM cannot return the rows inserted by INSERT ... ON CONFLICT DO
+    NOTHING or removed by a DELETE, so the statements are written out.
+    They send no model signals, relations_changed replaces them.
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    opts = model._meta
+    sql = statement.format(
+        table=quote(opts.db_table),
+        user=quote(opts.get_field('user').column),
+        related=quote(opts.get_field(field).column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add(model, user, ids, field='recipe'):
+    """
+    Add relations of the user to the given objects in a single
+    INSERT ... ON CONFLICT DO NOTHING, existing ones are kept as is.
+    Return the ids of the added relations.
+    """
+    if not ids:
+        return []
+    values = ', '.join(['(%s, %s)'] * len(ids))
+    with transaction.atomic(using=router.db_for_write(model),
+                            savepoint=False):
+        added = execute(
+            model, field,
+            f'INSERT INTO {{table}} ({{user}}, {{related}}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING RETURNING {{related}}',
+            [value for pk in ids for value in (user.pk, pk)]
+        )
+        if added:
+            relations_changed.send(
+                sender=model, action='add', user_id=user.pk, ids=added
+            )
+    return added
+
+
+def remove(model, user, ids, field='recipe'):
+    """
+    Remove relations of the user to the given objects in a single
+    DELETE and return the number of removed rows.
+    """
+    if not ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(ids))
+    with transaction.atomic(using=router.db_for_write(model),
+                            savepoint=False):
+        removed = execute(
+            model, field,
+            f'DELETE FROM {{table}} WHERE {{user}} = %s '
+            f'AND {{related}} IN ({placeholders}) RETURNING {{related}}',
+            [user.pk, *ids]
+        )
+        if removed:
+            relations_changed.send(
+                sender=model, action='remove', user_id=user.pk, ids=removed
+            )
+    return len(removed)
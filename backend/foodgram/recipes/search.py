@@ -0,0 +1,140 @@
+import math
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, transaction
+from django.db.models import (Case, F, OuterRef, Subquery, TextField, Value,
+                              When)
+from django.db.models.functions import Coalesce
+
+from recipes.cache import ReferenceCache
+from recipes.models import Recipe, RecipeIngredient
+
+# Weights of the fields in the vector and in the fallback index,
+# the same as the default weights of ts_rank for labels A, B and C
+FIELD_WEIGHTS = {'name': ('A', 1.0), 'ingredients': ('B', 0.4),
+                 'text': ('C', 0.2)}
+
+
+def uses_postgres(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector():
+    """
+    Weighted vector over the recipe name, its ingredient names and text
+    """
+    ingredients = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector(
+            'name', weight=FIELD_WEIGHTS['name'][0], config=config
+        )
+        + SearchVector(
+            Coalesce(ingredients, Value(''), output_field=TextField()),
+            weight=FIELD_WEIGHTS['ingredients'][0], config=config
+        )
+        + SearchVector(
+            'text', weight=FIELD_WEIGHTS['text'][0], config=config
+        )
+    )
+
+
+def update_search_index(recipes):
+    """
+    Refresh the search vector of the given recipes queryset, or drop the
+    in-memory index after commit when the database has no full-text search
+    """
+    if uses_postgres(recipes.db):
+        recipes.update(search_vector=search_vector())
+    else:
+        transaction.on_commit(recipe_search_index.invalidate)
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower().replace('ё', 'е'))
+
+
+class RecipeSearchIndex(ReferenceCache):
+    """
+    Pure-Python inverted index used where the database has no full-text
+    search. Maps every word of the name, ingredients and text of a recipe
+    to the recipe id and a score weighted like the Postgres vector.
+    """
+    version_key = 'recipes:search:version'
+
+    def build(self):
+        documents = defaultdict(lambda: defaultdict(list))
+        for pk, name, text in Recipe.objects.values_list(
+                'pk', 'name', 'text').iterator():
+            documents[pk]['name'].append(name)
+            documents[pk]['text'].append(text)
+        for pk, name in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient__name').iterator():
+            documents[pk]['ingredients'].append(name)
+        index = defaultdict(dict)
+        for pk, fields in documents.items():
+            scores = defaultdict(float)
+            length = 0
+            for field, values in fields.items():
+                weight = FIELD_WEIGHTS[field][1]
+                for value in values:
+                    for token in tokenize(value):
+                        scores[token] += weight
+                        length += 1
+            norm = 1 + math.log(1 + length)
+            for token, score in scores.items():
+                index[token][pk] = score / norm
+        return dict(index)
+
+    def search(self, query):
+        """
+        Ids of the recipes containing every word of the query,
+        from the best to the worst ranked
+        """
+        index = self.get_snapshot()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        postings = [index.get(token, {}) for token in tokens]
+        matches = set.intersection(*(set(posting) for posting in postings))
+        ranks = {
+            pk: sum(posting[pk] for posting in postings) for pk in matches
+        }
+        return sorted(ranks, key=lambda pk: (-ranks[pk], -pk))
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """
+    Recipes of the queryset matching the query, ranked by relevance
+    """
+    if uses_postgres(queryset.db):
+        search_query = SearchQuery(
+            query, config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-id')
+    ranked = recipe_search_index.search(query)[
+        :settings.RECIPE_SEARCH_FALLBACK_LIMIT
+    ]
+    if not ranked:
+        return queryset.none()
+    return queryset.filter(pk__in=ranked).order_by(Case(
+        *[When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ranked)]
+    ))
@@ -0,0 +1,167 @@
+import io
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from PIL import Image
+
+from recipes.images import VARIANT_EXTENSION, VARIANTS, render_variant
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Subscription
+
+IMAGE_SIZE = (96, 96)
+
+
+def power_law(rnd, objects, exponent):
+    """
+    Weighted picker of objects by rank: the object at rank r is chosen
+    with probability proportional to r ** -exponent (Zipf's law)
+    """
+    objects = list(objects)
+    weights = itertools.accumulate(
+        rank ** -exponent for rank in range(1, len(objects) + 1)
+    )
+    cum_weights = list(weights)
+
+    def pick(count=1):
+        if not count:
+            return []
+        return rnd.choices(objects, cum_weights=cum_weights, k=count)
+
+    return pick
+
+
+def pareto_count(rnd, mean, exponent, limit):
+    """
+    Heavy-tailed non-negative count with the given mean: most users
+    have a few relations and some have a lot
+    """
+    alpha = 1 + exponent
+    scale = mean * (alpha - 1) / alpha
+    return min(limit, int(scale * rnd.paretovariate(alpha)))
+
+
+def insert(model, objects, batch_size, ignore_conflicts=False):
+    objects = iter(objects)
+    total = 0
+    while batch := list(itertools.islice(objects, batch_size)):
+        model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+        total += len(batch)
+    return total
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def new_pks(model, start):
+    return list(
+        model.objects.filter(pk__gte=start).values_list('pk', flat=True)
+    )
+
+
+def create_images(rnd, count):
+    """
+    Store a few small solid-colour images with their variants, shared by
+    the generated recipes, and return their field values
+    """
+    images = []
+    for num in range(count):
+        image = Image.new('RGB', IMAGE_SIZE, tuple(
+            rnd.randrange(256) for _ in range(3)
+        ))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG')
+        fields = {'image': default_storage.save(
+            f'recipes/images/seed-{num}.jpg', ContentFile(buffer.getvalue())
+        )}
+        for field, size in VARIANTS.items():
+            fields[field] = default_storage.save(
+                f'recipes/images/seed-{num}-{field}.{VARIANT_EXTENSION}',
+                render_variant(image, size)
+            )
+        images.append(fields)
+    return images
+
+
+def seed(users, recipes, favorites, shopping_cart, subscriptions,
+         exponent=1.1, images=8, password='', batch_size=1000, seed=None,
+         prefix='load'):
+    """
+    Generate users, recipes with tags, ingredients and images, favorites,
+    shopping carts and subscriptions. Authors, recipes and followed
+    authors are picked by power law, and the number of favorites, cart
+    items and subscriptions of a user follows a Pareto distribution with
+    the given mean. Returns the number of created rows per model.
+    """
+    rnd = random.Random(seed)
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+    rnd.shuffle(ingredient_ids)
+    tag_ids = list(Tag.objects.values_list('pk', flat=True))
+    created = {}
+
+    start = next_pk(CustomUser)
+    password = make_password(password)
+    created['users'] = insert(CustomUser, (
+        CustomUser(
+            email=f'{prefix}{start + num}@foodgram.test',
+            username=f'{prefix}{start + num}',
+            first_name=f'Name{start + num}',
+            last_name=f'Surname{start + num}',
+            password=password,
+        ) for num in range(users)
+    ), batch_size)
+    user_ids = new_pks(CustomUser, start)
+
+    start = next_pk(Recipe)
+    pick_author = power_law(rnd, user_ids, exponent)
+    image_fields = create_images(rnd, images)
+    created['recipes'] = insert(Recipe, (
+        Recipe(
+            author_id=pick_author()[0],
+            name=f'Recipe {start + num}',
+            text=f'Text of recipe {start + num}',
+            cooking_time=rnd.randint(1, 240),
+            **(rnd.choice(image_fields) if image_fields else {}),
+        ) for num in range(recipes)
+    ), batch_size)
+    recipe_ids = new_pks(Recipe, start)
+
+    created['recipe tags'] = insert(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tag_ids)))
+    ), batch_size)
+    pick_ingredients = power_law(rnd, ingredient_ids, exponent)
+    created['recipe ingredients'] = insert(RecipeIngredient, (
+        RecipeIngredient(
+            recipe_id=recipe_id, ingredient_id=ingredient_id,
+            amount=rnd.randint(1, 500),
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in set(pick_ingredients(rnd.randint(3, 12)))
+    ), batch_size)
+
+    pick_recipes = power_law(rnd, recipe_ids, exponent)
+    for model, name, mean in (
+            (Favorite, 'favorites', favorites),
+            (ShoppingCart, 'shopping_cart', shopping_cart)):
+        created[name] = insert(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in set(pick_recipes(pareto_count(
+                rnd, mean, exponent, len(recipe_ids)
+            )))
+        ), batch_size, ignore_conflicts=True)
+    created['subscriptions'] = insert(Subscription, (
+        Subscription(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in set(pick_author(pareto_count(
+            rnd, subscriptions, exponent, len(user_ids)
+        ))) - {user_id}
+    ), batch_size, ignore_conflicts=True)
+    return created
@@ -0,0 +1,101 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+USER = 'recipe__shoppingcart__user'
+
+
+def cart_totals(users=None, ingredients=None):
+    """
+    Summed amounts of ingredients over the shopping carts of the users
+    (all users by default): (user id, ingredient id, amount) rows
+    """
+    # A single filter() call, so that the cart is joined once
+    lookups = {f'{USER}__isnull': False}
+    if users is not None:
+        lookups[f'{USER}__in'] = users
+    if ingredients is not None:
+        lookups['ingredient__in'] = ingredients
+    return RecipeIngredient.objects.filter(**lookups).values_list(
+        USER, 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def ingredients_of(recipe_ids):
+    return RecipeIngredient.objects.filter(
+        recipe__in=recipe_ids
+    ).values('ingredient')
+
+
+def write(rows):
+    """
+    Store the (user id, ingredient id, amount) rows in batches, replacing
+    the amounts of rows written concurrently
+    """
+    items = (
+        ShoppingListItem(user_id=user_id, ingredient_id=pk, amount=amount)
+        for user_id, pk, amount in rows
+    )
+    total = 0
+    while batch := list(islice(items, settings.DATA_IMPORT_BATCH_SIZE)):
+        ShoppingListItem.objects.bulk_create(
+            batch, update_conflicts=True,
+            unique_fields=['user', 'ingredient'], update_fields=['amount']
+        )
+        total += len(batch)
+    return total
+
+
+def refresh(users, ingredients):
+    """
+    Recount the shopping list rows of the users for the ingredients from
+    their carts: only the rows a change of the carts or of the recipe
+    ingredients can affect are rewritten
+    """
+    # Callers in a transaction roll back on errors, no savepoint needed
+    with transaction.atomic(savepoint=False):
+        ShoppingListItem.objects.filter(
+            user__in=users, ingredient__in=ingredients
+        ).delete()
+        write(cart_totals(users, ingredients).iterator())
+
+
+def refresh_recipe(recipe_id, ingredient_ids):
+    """
+    Recount the changed ingredients of a recipe for every user who has
+    it in the shopping cart
+    """
+    carts = ShoppingCart.objects.filter(recipe_id=recipe_id)
+    if ingredient_ids and carts.exists():
+        refresh(carts.values('user'), ingredient_ids)
+
+
+def count_mismatches():
+    """
+    Number of shopping list rows whose amount differs from the carts,
+    plus the number of cart totals without a row
+    """
+    stored = {
+        (user_id, pk): amount for user_id, pk, amount
+        in ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'amount'
+        ).iterator()
+    }
+    mismatches = 0
+    for user_id, pk, amount in cart_totals().iterator():
+        if stored.pop((user_id, pk), None) != amount:
+            mismatches += 1
+    return mismatches + len(stored)
+
+
+def rebuild():
+    """
+    Rewrite the shopping lists of all users from their carts
+    """
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        return write(cart_totals().iterator())
@@ -0,0 +1,177 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes import counters, shopping_list
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_response_cache, tag_cache
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.relations import relations_changed
+from recipes.search import update_search_index
+
+User = get_user_model()
+
+
+def deleted_with(origin, model):
+    """
+    Whether a delete was started from objects of the model, an instance
+    or a queryset: rows removed by its cascade need no counter updates
+    when the counted objects are deleted as well
+    """
+    return isinstance(origin, model) or (
+        getattr(origin, 'model', None) is model
+    )
+
+
+def invalidate_reference(reference):
+    """
+    Invalidate a reference cache right away, so the writer sees its
+    change, and once more after commit: another worker may rebuild the
+    snapshot from the rows before the commit in the meantime
+    """
+    reference.invalidate()
+    transaction.on_commit(reference.invalidate)
+    transaction.on_commit(recipe_response_cache.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    invalidate_reference(ingredient_index)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_in_search_index(instance, created, **kwargs):
+    if not created:
+        update_search_index(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_cache(**kwargs):
+    invalidate_reference(tag_cache)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+def invalidate_recipe_responses(**kwargs):
+    """
+    Tags and ingredients of a recipe are always changed together with
+    the recipe itself, and the invalidation runs after commit, so no
+    m2m_changed or RecipeIngredient post_delete receivers are needed:
+    they would disable fast deletes and add a query to every m2m add.
+    """
+    transaction.on_commit(recipe_response_cache.invalidate)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_in_recipe_responses(
+        instance, created, update_fields, **kwargs):
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+    transaction.on_commit(recipe_response_cache.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def invalidate_user_flags(instance, origin=None, **kwargs):
+    # Flags of a deleted recipe are never shown
+    if not deleted_with(origin, Recipe):
+        transaction.on_commit(
+            lambda: recipe_response_cache.invalidate_user(instance.user_id)
+        )
+
+
+@receiver(relations_changed, sender=Favorite)
+@receiver(relations_changed, sender=ShoppingCart)
+def invalidate_changed_user_flags(user_id, **kwargs):
+    transaction.on_commit(
+        lambda: recipe_response_cache.invalidate_user(user_id)
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        counters.increment(Recipe, [instance.recipe_id], 'favorites_count')
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(instance, origin, **kwargs):
+    if not deleted_with(origin, Recipe):
+        counters.decrement(Recipe, [instance.recipe_id], 'favorites_count')
+
+
+@receiver(relations_changed, sender=Favorite)
+def update_favorites_count(action, ids, **kwargs):
+    """
+    Toggles report the recipes whose favorites were actually added or
+    removed, each counter moves by one
+    """
+    if action == 'add':
+        counters.increment(Recipe, ids, 'favorites_count')
+    else:
+        counters.decrement(Recipe, ids, 'favorites_count')
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        counters.increment(User, [instance.author_id], 'recipes_count')
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    counters.decrement(User, [instance.author_id], 'recipes_count')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        shopping_list.refresh([instance.user_id], shopping_list.ingredients_of(
+            [instance.recipe_id]
+        ))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, origin, **kwargs):
+    """
+    Carts removed with their recipe are handled by the Recipe receivers,
+    shopping lists of a deleted user are removed with the user
+    """
+    if not (deleted_with(origin, Recipe) or deleted_with(origin, User)):
+        shopping_list.refresh([instance.user_id], shopping_list.ingredients_of(
+            [instance.recipe_id]
+        ))
+
+
+@receiver(relations_changed, sender=ShoppingCart)
+def refresh_shopping_list(user_id, ids, **kwargs):
+    shopping_list.refresh([user_id], shopping_list.ingredients_of(ids))
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_shopping_lists(instance, **kwargs):
+    """
+    Shopping lists of the users who have a deleted recipe in their carts
+    are recounted once after the delete, instead of once per cart row:
+    their users and the recipe ingredients are kept for post_delete
+    """
+    instance._shopping_list_users = list(ShoppingCart.objects.filter(
+        recipe=instance
+    ).values_list('user', flat=True))
+    if instance._shopping_list_users:
+        instance._shopping_list_ingredients = list(
+            shopping_list.ingredients_of([instance.pk]).values_list(
+                'ingredient', flat=True
+            )
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def refresh_shopping_lists(instance, **kwargs):
+    users = getattr(instance, '_shopping_list_users', None)
+    if users:
+        shopping_list.refresh(users, instance._shopping_list_ingredients)
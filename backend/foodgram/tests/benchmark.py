@@ -0,0 +1,109 @@
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'baselines.json'
+TIME_TOLERANCE = float(os.getenv('BENCH_TIME_TOLERANCE', 3.0))
+TIME_SLACK_MS = float(os.getenv('BENCH_TIME_SLACK_MS', 25.0))
+ROUNDS = int(os.getenv('BENCH_ROUNDS', 3))
+
+
+@dataclass
+class Measurement:
+    endpoint: str
+    status_code: int
+    queries: int
+    time_ms: float
+    peak_memory_kb: float
+
+
+def measure(endpoint, client, method, url, data=None, rounds=1):
+    """
+    Call the endpoint `rounds` times and return the worst query count,
+    the best wall time and the worst peak of traced memory.
+    Streaming responses are consumed completely inside the measurement.
+    """
+    result = None
+    for _ in range(rounds):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        current = Measurement(
+            endpoint=endpoint,
+            status_code=response.status_code,
+            queries=len(context.captured_queries),
+            time_ms=round(elapsed, 2),
+            peak_memory_kb=round(peak / 1024, 1),
+        )
+        if result is not None:
+            current.queries = max(current.queries, result.queries)
+            current.time_ms = min(current.time_ms, result.time_ms)
+            current.peak_memory_kb = max(
+                current.peak_memory_kb, result.peak_memory_kb
+            )
+        result = current
+    return result
+
+
+def load_baselines():
+    if not BASELINES_PATH.exists():
+        return {'dataset': {}, 'endpoints': {}}
+    with open(BASELINES_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baselines(dataset, measurements):
+    baselines = {
+        'dataset': dataset,
+        'endpoints': {
+            measurement.endpoint: {
+                'queries': measurement.queries,
+                'time_ms': measurement.time_ms,
+                'peak_memory_kb': measurement.peak_memory_kb,
+            } for measurement in sorted(
+                measurements, key=lambda item: item.endpoint
+            )
+        },
+    }
+    with open(BASELINES_PATH, 'w', encoding='utf-8') as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def check_against_baseline(measurement, baselines, dataset):
+    """
+    Return a list of regressions of the measurement compared to the
+    stored baseline. Latency is only compared when the baseline was
+    recorded on a dataset of the same size.
+    """
+    baseline = baselines['endpoints'].get(measurement.endpoint)
+    if baseline is None:
+        return [
+            f'{measurement.endpoint}: no baseline stored, '
+            f'run pytest with --update-baselines'
+        ]
+    errors = []
+    if measurement.queries > baseline['queries']:
+        errors.append(
+            f'{measurement.endpoint}: {measurement.queries} queries, '
+            f'baseline is {baseline["queries"]}'
+        )
+    time_limit = baseline['time_ms'] * TIME_TOLERANCE + TIME_SLACK_MS
+    if baselines['dataset'] == dataset and measurement.time_ms > time_limit:
+        errors.append(
+            f'{measurement.endpoint}: {measurement.time_ms} ms, '
+            f'limit is {time_limit:.2f} ms'
+        )
+    return errors
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.autocomplete import ingredient_index
+from recipes.cache import recipe_response_cache, tag_cache
+from tests import benchmark, dataset
+from users.models import CustomUser
+from users.tokens import token_cache
+
+DATASET = {
+    'users': int(os.getenv('BENCH_USERS', 20)),
+    'recipes': int(os.getenv('BENCH_RECIPES', 200)),
+}
+MEASUREMENTS = []
+# Serialization path: cost of one recipe, µs
+SERIALIZATION_COSTS = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--update-baselines',
+        action='store_true',
+        help='Store measured query counts and latencies as new baselines',
+    )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if SERIALIZATION_COSTS:
+        terminalreporter.section('recipe serialization')
+        for name, cost in SERIALIZATION_COSTS.items():
+            terminalreporter.write_line(f'{name:<56}{cost:>9.1f} µs/recipe')
+    if not MEASUREMENTS:
+        return
+    terminalreporter.section('endpoint benchmarks')
+    terminalreporter.write_line(
+        f'{"endpoint":<56}{"status":>8}{"queries":>9}'
+        f'{"time, ms":>11}{"peak, KiB":>12}'
+    )
+    for item in sorted(MEASUREMENTS, key=lambda item: item.endpoint):
+        terminalreporter.write_line(
+            f'{item.endpoint:<56}{item.status_code:>8}{item.queries:>9}'
+            f'{item.time_ms:>11.2f}{item.peak_memory_kb:>12.1f}'
+        )
+    if config.getoption('--update-baselines'):
+        benchmark.save_baselines(DATASET, MEASUREMENTS)
+        terminalreporter.write_line(
+            f'Baselines saved to {benchmark.BASELINES_PATH}'
+        )
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        dataset.seed(**DATASET)
+        ingredient_index.get_snapshot()
+        tag_cache.get_snapshot()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture(autouse=True)
+def recipe_responses(db):
+    """
+    Start every test with a cold response cache: test transactions are
+    rolled back without running on_commit invalidation.
+    """
+    recipe_response_cache.invalidate()
+    cache.delete_many([
+        recipe_response_cache.user_flags_key(pk)
+        for pk in CustomUser.objects.values_list('pk', flat=True)
+    ])
+    return recipe_response_cache
+
+
+@pytest.fixture(autouse=True)
+def cold_token_cache():
+    token_cache.clear()
+    return token_cache
+
+
+@pytest.fixture
+def heavy_user(db):
+    return CustomUser.objects.order_by('id').first()
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(heavy_user):
+    client = APIClient()
+    client.force_authenticate(heavy_user)
+    return client
+
+
+@pytest.fixture(scope='session')
+def baselines():
+    return benchmark.load_baselines()
+
+
+@pytest.fixture
+def bench(request, baselines):
+    """
+    Measure a single endpoint call, record it for the summary and
+    fail the test when it regresses past the stored baseline.
+    """
+    update = request.config.getoption('--update-baselines')
+
+    def run(endpoint, client, method, url, data=None, expected=200):
+        rounds = benchmark.ROUNDS if method == 'get' else 1
+        measurement = benchmark.measure(
+            endpoint, client, method, url, data, rounds
+        )
+        MEASUREMENTS.append(measurement)
+        assert measurement.status_code == expected, endpoint
+        if not update:
+            errors = benchmark.check_against_baseline(
+                measurement, baselines, DATASET
+            )
+            assert not errors, '\n'.join(errors)
+        return measurement
+
+    return run
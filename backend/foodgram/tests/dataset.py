@@ -0,0 +1,89 @@
+import io
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Subscription
+
+DATA_DIR = settings.BASE_DIR / 'recipes' / 'data'
+PASSWORD = 'benchmark-password'
+
+
+def seed(users, recipes, seed=2023):
+    """
+    Fill the database with a reproducible synthetic dataset:
+    the full ingredient and tag catalogs, users, recipes with
+    tags and ingredients, favorites, shopping carts and subscriptions.
+    The first user is the "heavy" one that follows every other user.
+    """
+    rnd = random.Random(seed)
+    call_command('load_data', 'ingredients', DATA_DIR / 'ingredients.csv',
+                 stdout=io.StringIO())
+    call_command('load_data', 'tags', DATA_DIR / 'tags.csv',
+                 stdout=io.StringIO())
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    password = make_password(PASSWORD)
+    CustomUser.objects.bulk_create(
+        CustomUser(
+            email=f'user{num}@foodgram.test',
+            username=f'user{num}',
+            first_name=f'Name{num}',
+            last_name=f'Surname{num}',
+            password=password,
+        ) for num in range(users)
+    )
+    user_ids = list(
+        CustomUser.objects.order_by('id').values_list('id', flat=True)
+    )
+
+    Recipe.objects.bulk_create(
+        Recipe(
+            author_id=rnd.choice(user_ids),
+            name=f'Recipe {num}',
+            text=f'Text of recipe {num}',
+            cooking_time=rnd.randint(1, 600),
+        ) for num in range(recipes)
+    )
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tag_ids)))
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+            amount=rnd.randint(1, 500),
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rnd.sample(ingredient_ids, rnd.randint(3, 12))
+    )
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rnd.sample(
+                recipe_ids, min(len(recipe_ids), rnd.randint(5, 25))
+            )
+        )
+    heavy_user, *authors = user_ids
+    Subscription.objects.bulk_create(
+        [Subscription(user_id=heavy_user, author_id=author_id)
+         for author_id in authors]
+        + [Subscription(user_id=user_id, author_id=author_id)
+           for user_id in authors
+           for author_id in rnd.sample(authors, min(len(authors), 5))
+           if author_id != user_id]
+    )
+    call_command('rebuild_counters', stdout=io.StringIO())
+    call_command('rebuild_search_index', stdout=io.StringIO())
+    call_command('rebuild_feed', stdout=io.StringIO())
+    call_command('rebuild_shopping_lists', stdout=io.StringIO())
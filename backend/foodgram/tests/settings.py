@@ -0,0 +1,28 @@
+import os
+
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import DATABASES
+
+# Benchmarks run against SQLite unless a real database engine is
+# requested explicitly, e.g. DB_ENGINE=django.db.backends.postgresql.
+if 'DB_ENGINE' not in os.environ:
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+
+# A separate empty database standing in for a replica which has not
+# caught up yet. Routing to it is enabled by the tests that use it.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': None if 'DB_ENGINE' not in os.environ else (
+        f'test_{DATABASES["default"]["NAME"]}_replica'
+    )},
+}
+DATABASE_REPLICAS = []
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+IMAGE_PROCESSING_WORKERS = 0
@@ -0,0 +1,151 @@
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+
+from api.metrics import registry
+from foodgram.asgi import AsyncReadHandler
+from recipes.models import Recipe
+from tests.test_endpoints import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+READ_URLS = [
+    '/api/recipes/',
+    '/api/recipes/?page=3&limit=6',
+    '/api/recipes/?limit=3&cursor=&count=exact',
+    '/api/recipes/?tags=lunch&tags=salad',
+    '/api/recipes/?tags=missing',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+    '/api/recipes/?page=1000',
+    '/api/recipes/5/',
+    '/api/recipes/nope/',
+    '/api/tags/',
+    '/api/tags/2/',
+    '/api/ingredients/?name=са&limit=5',
+    '/api/ingredients/10/',
+    '/api/users/subscriptions/?recipes_limit=2',
+    '/api/users/subscriptions/?recipes_limit=0',
+]
+
+
+@pytest.fixture
+def token(heavy_user):
+    return Token.objects.create(user=heavy_user).key
+
+
+@pytest.fixture
+def asgi(settings):
+    """
+    Send a request to the ASGI URLconf with the async test client
+    """
+    client = AsyncClient()
+
+    async def send(method, url, **extra):
+        return await getattr(client, method)(url, **extra)
+
+    def request(method, url, token=None, **extra):
+        if token:
+            extra['AUTHORIZATION'] = f'Token {token}'
+        settings.ROOT_URLCONF = 'foodgram.asgi_urls'
+        try:
+            return async_to_sync(send)(method, url, **extra)
+        finally:
+            settings.ROOT_URLCONF = 'foodgram.urls'
+
+    return request
+
+
+def wsgi(url, token=None, **extra):
+    if token:
+        extra['HTTP_AUTHORIZATION'] = f'Token {token}'
+    return Client().get(url, **extra)
+
+
+@pytest.mark.parametrize('authenticated', [False, True])
+@pytest.mark.parametrize('url', READ_URLS)
+def test_async_responses_match_sync(asgi, token, url, authenticated):
+    token = token if authenticated else None
+    # The second round is served from the response cache
+    for _ in range(2):
+        expected = wsgi(url, token)
+        response = asgi('get', url, token)
+        assert response.status_code == expected.status_code
+        assert response.content == expected.content
+        assert dict(response.headers) == dict(expected.headers)
+
+
+@pytest.mark.parametrize('url', ['/api/recipes/', '/api/recipes/{pk}/'])
+def test_cached_image_urls_follow_the_request_origin(asgi, url):
+    recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+    Recipe.objects.filter(pk=recipe.pk).update(image='recipes/images/a.jpg')
+    url = url.format(pk=recipe.pk)
+    # The async test client of Django 4.1 cannot replace the host
+    for scheme in ('http', 'https'):
+        body = asgi('get', url, secure=scheme == 'https').json()
+        if 'results' in body:
+            body = body['results'][0]
+        assert body['image'].startswith(f'{scheme}://testserver/')
+
+
+def test_conditional_request(asgi, token):
+    response = asgi('get', '/api/recipes/5/', token)
+    assert asgi(
+        'get', '/api/recipes/5/', token, IF_NONE_MATCH=response['ETag']
+    ).status_code == 304
+
+
+def test_invalid_token(asgi):
+    response = asgi('get', '/api/recipes/', 'nope')
+    assert response.status_code == 401
+    assert response.content == wsgi('/api/recipes/', 'nope').content
+
+
+def test_other_methods_fall_back_to_sync_views(asgi, token):
+    response = asgi(
+        'post', '/api/recipes/', token, data=recipe_payload(),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    assert Recipe.objects.filter(pk=response.json()['id']).exists()
+    assert asgi(
+        'get', '/api/recipes/', token, ACCEPT='text/html'
+    )['Content-Type'].startswith('text/html')
+
+
+def test_streaming_response_and_metrics(asgi, token):
+    registry.reset()
+    response = asgi('get', '/api/recipes/download_shopping_cart/', token)
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content)
+    assert 'api:download_shopping_cart' in registry.render()
+
+
+def test_streaming_content_is_sent_chunk_by_chunk():
+    sent, produced = [], []
+
+    def content():
+        for part in (b'first', b'second', b'third'):
+            produced.append((threading.get_ident(), len(sent)))
+            yield part
+
+    async def send(message):
+        sent.append(message)
+
+    async def respond():
+        await AsyncReadHandler().send_response(
+            StreamingHttpResponse(content()), send
+        )
+        return threading.get_ident()
+
+    loop_thread = async_to_sync(respond)()
+    assert [message.get('body') for message in sent[1:]] == [
+        b'first', b'second', b'third', None
+    ]
+    # Every chunk is read once the previous one is sent, out of the loop
+    assert [messages for _, messages in produced] == [1, 2, 3]
+    assert loop_thread not in {thread for thread, _ in produced}
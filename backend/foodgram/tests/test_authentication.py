@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from tests import dataset
+from tests.test_counters import assert_counters_in_sync
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/users/me/'
+
+
+@pytest.fixture
+def token(heavy_user):
+    return Token.objects.create(user=heavy_user)
+
+
+@pytest.fixture
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def get(client, url=URL):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, len(context.captured_queries)
+
+
+def test_token_is_resolved_once(token_client, heavy_user):
+    response, queries = get(token_client)
+    assert response.status_code == 200
+    assert response.json()['id'] == heavy_user.id
+    response, cached_queries = get(token_client)
+    assert response.json()['id'] == heavy_user.id
+    assert cached_queries == queries - 1
+
+
+def test_shared_cache_backs_local_cache(
+        token_client, token, cold_token_cache):
+    _, queries = get(token_client)
+    cold_token_cache.clear()
+    assert get(token_client)[1] == queries - 1
+    cold_token_cache.clear()
+    cache.delete(cold_token_cache.key(token.key))
+    assert get(token_client)[1] == queries
+
+
+def test_logout_revokes_cached_token(token_client):
+    get(token_client)
+    assert token_client.post('/api/auth/token/logout/').status_code == 204
+    assert get(token_client)[0].status_code == 401
+
+
+def test_user_changes_drop_cached_token(token_client, heavy_user):
+    get(token_client)
+    heavy_user.first_name = 'Changed'
+    heavy_user.save()
+    assert get(token_client)[0].json()['first_name'] == 'Changed'
+    heavy_user.is_active = False
+    heavy_user.save()
+    assert get(token_client)[0].status_code == 401
+
+
+def test_readers_get_copies(token_client, token, cold_token_cache):
+    get(token_client)
+    cold_token_cache.get(token.key).user.is_subscribed = True
+    assert not hasattr(cold_token_cache.get(token.key).user, 'is_subscribed')
+
+
+def test_process_local_backend_keeps_tokens_for_the_local_ttl(
+        token_client, token, cold_token_cache, monkeypatch, settings):
+    get(token_client)
+    key = cold_token_cache.key(token.key)
+    assert cache.get(key) is not None
+    now = time.time()
+    monkeypatch.setattr(
+        time, 'time', lambda: now + settings.TOKEN_CACHE_LOCAL_TTL + 1
+    )
+    assert cache.get(key) is None
+
+
+def test_saving_cached_user_keeps_counters(token_client, heavy_user):
+    get(token_client)
+    follower = APIClient()
+    follower.force_authenticate(CustomUser.objects.create_user(
+        email='follower@foodgram.test', username='follower',
+        first_name='New', last_name='Follower', password=dataset.PASSWORD
+    ))
+    assert follower.post(
+        f'/api/users/{heavy_user.id}/subscribe/'
+    ).status_code == 201
+    assert token_client.post('/api/users/set_password/', {
+        'current_password': dataset.PASSWORD, 'new_password': 'N3w-pa55word'
+    }).status_code == 204
+    assert_counters_in_sync()
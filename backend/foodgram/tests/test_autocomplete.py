@@ -0,0 +1,52 @@
+import pytest
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+def names(client, **params):
+    response = client.get('/api/ingredients/', params)
+    assert response.status_code == 200
+    return [ingredient['name'] for ingredient in response.json()]
+
+
+def test_prefix_matches_come_first(anon_client):
+    found = names(anon_client, name='Сок', limit=100)
+    prefixed = sorted(Ingredient.objects.filter(
+        name__istartswith='сок'
+    ).values_list('name', flat=True), key=str.lower)
+    assert prefixed and len(found) > len(prefixed)
+    assert found[:len(prefixed)] == prefixed
+    assert all(
+        'сок' in name and not name.startswith('сок')
+        for name in found[len(prefixed):]
+    )
+
+
+def test_substring_matches_fill_the_limit():
+    snapshot = ingredient_index.build()
+    keys = snapshot[0]
+    prefixed = sum(key.startswith('сок') for key in keys)
+    found = ingredient_index.search('сок', prefixed + 1, snapshot)
+    assert len(found) == prefixed + 1
+    assert 'сок' in found[-1]['name'] and not found[-1]['name'].startswith(
+        'сок'
+    )
+
+
+@pytest.mark.parametrize('limit, expected', [
+    ('5', 5), ('0', 1), ('-3', 1), ('nope', 20), ('100000', 100),
+])
+def test_limit_is_clamped(anon_client, settings, limit, expected):
+    settings.INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+    settings.INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = 100
+    assert len(names(anon_client, name='а', limit=limit)) == expected
+
+
+@pytest.mark.parametrize('name', ['', '   '])
+def test_empty_query_lists_all_ingredients(anon_client, name):
+    found = names(anon_client, name=name)
+    assert len(found) == Ingredient.objects.count()
+    assert found == sorted(found, key=str.lower)
@@ -0,0 +1,118 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.autocomplete import ingredient_index
+from recipes.cache import tag_cache
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+def revalidate(client, url, **headers):
+    first = client.get(url)
+    assert first.status_code == 200
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'], **headers)
+    return first, response, len(context.captured_queries)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/tags/', '/api/ingredients/?name=мол', '/api/ingredients/1/',
+])
+def test_reference_tables_are_revalidated_without_queries(anon_client, url):
+    first, response, queries = revalidate(anon_client, url)
+    assert response.status_code == 304
+    assert queries == 0
+    assert response['ETag'] == first['ETag']
+    assert first.has_header('Last-Modified')
+
+
+def test_tag_change_changes_etag(anon_client):
+    etag = anon_client.get('/api/tags/')['ETag']
+    Tag.objects.create(name='Новый', color='#123456', slug='new')
+    response = anon_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.parametrize('reference, change', [
+    (tag_cache, lambda: Tag.objects.create(
+        name='Новый', color='#123456', slug='new'
+    )),
+    (ingredient_index, lambda: Ingredient.objects.create(
+        name='вода ключевая', measurement_unit='мл'
+    )),
+])
+def test_snapshot_rebuilt_before_commit_is_dropped(
+        django_capture_on_commit_callbacks, reference, change):
+    with django_capture_on_commit_callbacks() as callbacks:
+        change()
+        # Another worker rebuilding meanwhile would not see the new row
+        version = reference.version
+    for callback in callbacks:
+        callback()
+    assert reference.version != version
+
+
+def test_recipe_is_revalidated_without_queries(anon_client):
+    recipe = Recipe.objects.first()
+    first, response, queries = revalidate(
+        anon_client, f'/api/recipes/{recipe.id}/'
+    )
+    assert response.status_code == 304
+    assert queries == 0
+    response = anon_client.get(
+        f'/api/recipes/{recipe.id}/',
+        HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+    )
+    assert response.status_code == 304
+
+
+def test_cold_recipe_is_revalidated_from_the_loaded_row(
+        anon_client, recipe_responses):
+    recipe = Recipe.objects.first()
+    url = f'/api/recipes/{recipe.id}/'
+    first = anon_client.get(url)
+    recipe_responses.invalidate()
+    with CaptureQueriesContext(connection) as context:
+        assert anon_client.get(url).status_code == 200
+    recipe_responses.invalidate()
+    with CaptureQueriesContext(connection) as revalidation:
+        response = anon_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == 304
+    assert len(revalidation.captured_queries) == len(
+        context.captured_queries
+    )
+
+
+def test_recipe_etag_follows_changes(
+        anon_client, django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.first()
+    url = f'/api/recipes/{recipe.id}/'
+    etag = anon_client.get(url)['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.save()
+    assert anon_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+    etag = anon_client.get(url)['ETag']
+    Ingredient.objects.create(name='новый', measurement_unit='г')
+    assert anon_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_recipe_etag_covers_user_flags(
+        user_client, heavy_user, django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.exclude(favorite__user=heavy_user).first()
+    url = f'/api/recipes/{recipe.id}/'
+    first, response, _ = revalidate(user_client, url)
+    assert response.status_code == 304
+    assert not first.has_header('Last-Modified')
+    assert 'Authorization' in first['Vary']
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.create(user=heavy_user, recipe=recipe)
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == 200
+    assert response.json()['is_favorited'] is True
+
+
+def test_missing_recipe_is_not_found(anon_client):
+    assert anon_client.get('/api/recipes/0/').status_code == 404
@@ -0,0 +1,71 @@
+import pytest
+
+from recipes.models import Ingredient, RecipeIngredient
+from tests.test_endpoints import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def expected_ranking(ingredient_ids, max_missing=None):
+    recipes = {}
+    for relation in RecipeIngredient.objects.select_related('recipe'):
+        recipes.setdefault(relation.recipe, set()).add(relation.ingredient_id)
+    ranking = []
+    for recipe, ingredients in recipes.items():
+        covered = len(ingredients & ingredient_ids)
+        missing = len(ingredients) - covered
+        if covered and (max_missing is None or missing <= max_missing):
+            ranking.append((-covered, missing, recipe.pub_date, recipe.id))
+    ranking.sort(key=lambda item: (item[0], item[1], -item[2].timestamp(),
+                                   -item[3]))
+    return [(recipe_id, -covered, missing)
+            for covered, missing, _, recipe_id in ranking]
+
+
+@pytest.mark.parametrize('max_missing', [None, 5])
+def test_ranking_matches_python(anon_client, max_missing):
+    ingredient_ids = set(
+        Ingredient.objects.values_list('id', flat=True)[:500:5]
+    )
+    params = {'ingredients': list(ingredient_ids), 'limit': 1000}
+    if max_missing is not None:
+        params['max_missing'] = max_missing
+    response = anon_client.get('/api/recipes/cook/', params)
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [
+        (recipe['id'], recipe['covered'], recipe['missing'])
+        for recipe in results
+    ] == expected_ranking(ingredient_ids, max_missing)
+    assert all(
+        len(recipe['ingredients']) == recipe['covered'] + recipe['missing']
+        for recipe in results
+    )
+
+
+@pytest.mark.parametrize('params', [
+    {}, {'ingredients': 'salt'}, {'ingredients': 1, 'max_missing': -1},
+])
+def test_invalid_parameters(anon_client, params):
+    response = anon_client.get('/api/recipes/cook/', params)
+    assert response.status_code == 400
+
+
+def test_ingredients_count_is_maintained(user_client):
+    payload = recipe_payload()
+    recipe = user_client.post('/api/recipes/', payload, format='json').json()
+    ingredient = payload['ingredients'][0]['id']
+    response = user_client.get(
+        '/api/recipes/cook/', {'ingredients': ingredient, 'limit': 1000}
+    )
+    found = {item['id']: item for item in response.json()['results']}
+    assert found[recipe['id']]['missing'] == len(payload['ingredients']) - 1
+    user_client.patch(
+        f'/api/recipes/{recipe["id"]}/',
+        {'ingredients': payload['ingredients'][:2]}, format='json'
+    )
+    response = user_client.get(
+        '/api/recipes/cook/', {'ingredients': ingredient, 'limit': 1000}
+    )
+    found = {item['id']: item for item in response.json()['results']}
+    assert found[recipe['id']]['missing'] == 1
@@ -0,0 +1,106 @@
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import F
+
+from recipes.cache import recipe_response_cache
+from recipes.models import Favorite, FeedEntry, Recipe, ShoppingCart
+from tests.test_shopping_list import assert_consistent
+from users.models import CustomUser, Subscription
+
+pytestmark = pytest.mark.django_db
+
+
+def test_check_reports_and_rebuild_fixes_counters(heavy_user):
+    recipe = Recipe.objects.order_by('id').first()
+    favorites_count = recipe.favorites_count
+    Recipe.objects.filter(pk=recipe.pk).update(
+        favorites_count=favorites_count + 5
+    )
+    CustomUser.objects.filter(pk=heavy_user.pk).update(
+        recipes_count=F('recipes_count') + 1
+    )
+    out = io.StringIO()
+    with pytest.raises(CommandError, match='2 counters'):
+        call_command('rebuild_counters', check=True, stdout=out)
+    assert 'Recipe.favorites_count: 1 mismatched' in out.getvalue()
+    assert 'CustomUser.recipes_count: 1 mismatched' in out.getvalue()
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == favorites_count + 5
+
+    call_command('rebuild_counters', stdout=io.StringIO())
+    recipe.refresh_from_db()
+    heavy_user.refresh_from_db()
+    assert recipe.favorites_count == favorites_count
+    assert heavy_user.recipes_count == heavy_user.recipes.count()
+    call_command('rebuild_counters', check=True, stdout=io.StringIO())
+
+
+def assert_counters_in_sync():
+    call_command('rebuild_counters', check=True, stdout=io.StringIO())
+
+
+def test_bulk_toggles_move_counters_by_the_changed_rows(
+        user_client, heavy_user):
+    favorite = Favorite.objects.filter(user=heavy_user).first().recipe_id
+    new = list(Recipe.objects.exclude(
+        favorite__user=heavy_user
+    ).values_list('id', flat=True)[:3])
+    counts = dict(Recipe.objects.filter(
+        pk__in=[favorite, *new]
+    ).values_list('id', 'favorites_count'))
+    response = user_client.post(
+        '/api/recipes/favorite/', {'recipes': [favorite, *new]},
+        format='json'
+    )
+    assert response.status_code == 201
+    assert dict(Recipe.objects.filter(
+        pk__in=[favorite, *new]
+    ).values_list('id', 'favorites_count')) == {
+        **{pk: counts[pk] + 1 for pk in new}, favorite: counts[favorite]
+    }
+    assert_counters_in_sync()
+    response = user_client.delete(
+        '/api/recipes/favorite/', {'recipes': new[:2]}, format='json'
+    )
+    assert response.status_code == 204
+    assert_counters_in_sync()
+
+
+def test_orm_deletes_update_counters_and_lists(
+        heavy_user, django_capture_on_commit_callbacks):
+    recipe_response_cache.user_flags(heavy_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.filter(user=heavy_user).first().delete()
+        ShoppingCart.objects.filter(user=heavy_user).first().delete()
+        Subscription.objects.filter(pk__in=Subscription.objects.filter(
+            user=heavy_user
+        ).values('pk')[:2]).delete()
+    assert_counters_in_sync()
+    assert_consistent()
+    flags = recipe_response_cache.user_flags(heavy_user)
+    assert flags['favorites'] == set(Favorite.objects.filter(
+        user=heavy_user
+    ).values_list('recipe_id', flat=True))
+    assert flags['shopping_cart'] == set(ShoppingCart.objects.filter(
+        user=heavy_user
+    ).values_list('recipe_id', flat=True))
+    authors = Subscription.objects.filter(
+        user=heavy_user
+    ).values('author')
+    assert not FeedEntry.objects.filter(user=heavy_user).exclude(
+        author__in=authors
+    ).exists()
+
+
+@pytest.mark.parametrize('model', [Recipe, CustomUser])
+def test_cascade_deletes_update_counters_and_lists(heavy_user, model):
+    if model is Recipe:
+        Recipe.objects.filter(favorites_count__gt=0).first().delete()
+    else:
+        CustomUser.objects.exclude(pk=heavy_user.pk).filter(
+            subscribers_count__gt=0, follower__isnull=False
+        ).first().delete()
+    assert_counters_in_sync()
+    assert_consistent()
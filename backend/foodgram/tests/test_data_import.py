@@ -0,0 +1,127 @@
+import io
+import json
+
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+
+from recipes import importers
+from recipes.models import Ingredient, Tag
+
+pytestmark = pytest.mark.django_db
+
+DATA_DIR = settings.BASE_DIR.parent.parent / 'data'
+
+
+def load_data(*args, **options):
+    stdout = io.StringIO()
+    call_command('load_data', *args, stdout=stdout, **options)
+    return stdout.getvalue().strip()
+
+
+def test_reloading_catalog_inserts_nothing():
+    total = Ingredient.objects.count()
+    for path in ('ingredients.csv', 'ingredients.json'):
+        assert load_data(
+            'ingredients', DATA_DIR / path, batch_size=500
+        ) == f'ingredients: 0 inserted, 0 updated, {total} skipped'
+    assert Ingredient.objects.count() == total
+
+
+def test_json_is_read_in_chunks(monkeypatch):
+    monkeypatch.setattr(importers, 'JSON_CHUNK_SIZE', 7)
+    path = DATA_DIR / 'ingredients.json'
+    with open(path, encoding='utf-8') as file:
+        rows = list(importers.JSONArrayReader(file))
+    with open(path, encoding='utf-8') as file:
+        assert rows == json.load(file)
+
+
+@pytest.mark.parametrize('content', ['{}', '[{"name": "a"}', '[1]', '[{}{}]'])
+def test_malformed_json(tmp_path, content):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(content, encoding='utf-8')
+    with pytest.raises(CommandError):
+        load_data('ingredients', path)
+
+
+def test_new_duplicate_and_invalid_rows(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        'вода талая,мл\n'
+        'вода талая,мл\n'
+        ' лёд колотый ,г\n'
+        'без единицы\n'
+        ',г\n'
+        f'{"x" * 201},г\n',
+        encoding='utf-8'
+    )
+    assert load_data('ingredients', path, batch_size=2) == (
+        'ingredients: 2 inserted, 0 updated, 4 skipped'
+    )
+    assert Ingredient.objects.filter(
+        name__in=['вода талая', 'лёд колотый'],
+        measurement_unit__in=['мл', 'г']
+    ).count() == 2
+
+
+def test_tags_are_updated_by_slug(tmp_path):
+    tag = Tag.objects.first()
+    path = tmp_path / 'tags.json'
+    path.write_text(json.dumps([
+        {'name': 'Новое имя', 'color': tag.color, 'slug': tag.slug},
+        {'name': 'Перекус', 'color': '#123456', 'slug': 'snack'},
+    ]), encoding='utf-8')
+    assert load_data('tags', path) == (
+        'tags: 1 inserted, 1 updated, 0 skipped'
+    )
+    tag.refresh_from_db()
+    assert tag.name == 'Новое имя'
+    assert load_data('tags', path) == (
+        'tags: 0 inserted, 0 updated, 2 skipped'
+    )
+
+
+@pytest.mark.parametrize('batch_size', [1, 500])
+def test_tags_reusing_a_unique_value_are_skipped(tmp_path, batch_size):
+    first, second = Tag.objects.order_by('id')[:2]
+    path = tmp_path / 'tags.json'
+    path.write_text(json.dumps([
+        {'name': first.name, 'color': '#654321', 'slug': 'copy'},
+        {'name': 'Полдник', 'color': second.color, 'slug': 'teatime'},
+        {'name': second.name, 'color': second.color, 'slug': second.slug},
+        {'name': 'Бранч', 'color': '#abcdef', 'slug': 'brunch'},
+        {'name': 'Бранч', 'color': '#fedcba', 'slug': 'late-brunch'},
+    ]), encoding='utf-8')
+    stderr = io.StringIO()
+    assert load_data(
+        'tags', path, batch_size=batch_size, stderr=stderr
+    ) == (
+        'tags: 1 inserted, 0 updated, 4 skipped, 3 of them conflicting'
+    )
+    assert stderr.getvalue().splitlines() == [
+        f'line 1: name "{first.name}" belongs to another tag, skipped',
+        f'line 2: color "{second.color}" belongs to another tag, skipped',
+        'line 5: name "Бранч" belongs to another tag, skipped',
+    ]
+    assert not Tag.objects.filter(
+        slug__in=['copy', 'teatime', 'late-brunch']
+    ).exists()
+    assert Tag.objects.filter(slug='brunch').exists()
+
+
+def test_dry_run_saves_nothing(tmp_path):
+    path = tmp_path / 'ingredients'
+    path.write_text('вода родниковая,мл\n', encoding='utf-8')
+    assert load_data(
+        'ingredients', path, format='csv', dry_run=True
+    ) == (
+        'ingredients: 1 inserted, 0 updated, 0 skipped '
+        '(dry run, nothing saved)'
+    )
+    assert not Ingredient.objects.filter(name='вода родниковая').exists()
+
+
+def test_copy_needs_postgres():
+    with pytest.raises(CommandError, match='PostgreSQL'):
+        load_data('tags', DATA_DIR / 'tags.csv', copy=True)
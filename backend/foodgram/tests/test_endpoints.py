@@ -0,0 +1,229 @@
+import base64
+import io
+
+import pytest
+from django.urls import URLPattern
+from PIL import Image
+
+from api import urls as api_urls
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from tests import dataset
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+COVERED_ROUTES = {
+    'recipes-list', 'recipes-detail', 'ingredients-list',
+    'ingredients-detail', 'tags-list', 'tags-detail', 'favorite',
+    'subscribe', 'subscription', 'shopping_cart', 'download_shopping_cart',
+    'cook', 'favorite_bulk', 'shopping_cart_bulk', 'feed',
+}
+
+
+def recipe_payload():
+    return {
+        'ingredients': [
+            {'id': ingredient_id, 'amount': 10}
+            for ingredient_id in Ingredient.objects.values_list(
+                'id', flat=True)[:10]
+        ],
+        'tags': list(Tag.objects.values_list('id', flat=True)),
+        'image': make_image(),
+        'name': 'Benchmark recipe',
+        'text': 'Benchmark recipe text',
+        'cooking_time': 15,
+    }
+
+
+@pytest.fixture
+def own_recipe(heavy_user):
+    return Recipe.objects.filter(author=heavy_user).first() or (
+        Recipe.objects.create(
+            author=heavy_user, name='Own', text='Own', cooking_time=5
+        )
+    )
+
+
+@pytest.fixture
+def new_author():
+    return CustomUser.objects.create_user(
+        email='new-author@foodgram.test', username='new-author',
+        first_name='New', last_name='Author', password=dataset.PASSWORD
+    )
+
+
+def test_every_api_route_is_benchmarked():
+    routes = {
+        pattern.name for pattern in api_urls.urlpatterns
+        if isinstance(pattern, URLPattern)
+    } | {
+        pattern.name for pattern in api_urls.router.urls
+        if pattern.name != 'api-root'
+    }
+    assert routes <= COVERED_ROUTES, routes - COVERED_ROUTES
+
+
+@pytest.mark.parametrize('query', ['', '?limit=50', '?page=3&limit=6'])
+def test_recipe_list_anonymous(bench, anon_client, query):
+    bench(f'recipes-list anon {query}', anon_client, 'get',
+          f'/api/recipes/{query}')
+
+
+@pytest.mark.parametrize('depth', [0, 20])
+def test_recipe_list_cursor(bench, anon_client, depth):
+    url = '/api/recipes/?cursor=&limit=6'
+    for _ in range(depth):
+        url = anon_client.get(url).json()['next']
+    bench(f'recipes-list cursor depth {depth}', anon_client, 'get', url)
+
+
+@pytest.mark.parametrize('query', [
+    '?limit=50',
+    '?is_favorited=1&limit=50',
+    '?is_in_shopping_cart=1&limit=50',
+    '?tags=breakfast&tags=lunch&limit=50',
+])
+def test_recipe_list_authenticated(bench, user_client, query):
+    bench(f'recipes-list user {query}', user_client, 'get',
+          f'/api/recipes/{query}')
+
+
+def test_recipe_detail(bench, user_client):
+    recipe = Recipe.objects.first()
+    bench('recipes-detail', user_client, 'get', f'/api/recipes/{recipe.id}/')
+
+
+def test_recipe_create(bench, user_client):
+    bench('recipes-create', user_client, 'post', '/api/recipes/',
+          recipe_payload(), expected=201)
+
+
+def test_recipe_update(bench, user_client, own_recipe):
+    bench('recipes-update', user_client, 'patch',
+          f'/api/recipes/{own_recipe.id}/', recipe_payload())
+
+
+def test_recipe_delete(bench, user_client, own_recipe):
+    bench('recipes-delete', user_client, 'delete',
+          f'/api/recipes/{own_recipe.id}/', expected=204)
+
+
+def test_tag_list(bench, anon_client):
+    bench('tags-list', anon_client, 'get', '/api/tags/')
+
+
+def test_tag_detail(bench, anon_client):
+    tag = Tag.objects.first()
+    bench('tags-detail', anon_client, 'get', f'/api/tags/{tag.id}/')
+
+
+@pytest.mark.parametrize('name', ['', 'а', 'мол', 'сахар'])
+def test_ingredient_search(bench, anon_client, name):
+    bench(f'ingredients-list {name!r}', anon_client, 'get',
+          f'/api/ingredients/?name={name}')
+
+
+def test_ingredient_detail(bench, anon_client):
+    ingredient = Ingredient.objects.first()
+    bench('ingredients-detail', anon_client, 'get',
+          f'/api/ingredients/{ingredient.id}/')
+
+
+@pytest.mark.parametrize('model, route', [
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+])
+def test_toggle_add(bench, user_client, heavy_user, model, route):
+    recipe = Recipe.objects.exclude(
+        id__in=model.objects.filter(user=heavy_user).values('recipe')
+    ).first()
+    bench(f'{route} add', user_client, 'post',
+          f'/api/recipes/{recipe.id}/{route}/', expected=201)
+
+
+@pytest.mark.parametrize('model, route', [
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+])
+def test_toggle_remove(bench, user_client, heavy_user, model, route):
+    recipe = model.objects.filter(user=heavy_user).first().recipe
+    bench(f'{route} remove', user_client, 'delete',
+          f'/api/recipes/{recipe.id}/{route}/', expected=204)
+
+
+@pytest.mark.parametrize('model, route', [
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+])
+def test_toggle_bulk_add(bench, user_client, heavy_user, model, route):
+    recipes = list(Recipe.objects.exclude(
+        id__in=model.objects.filter(user=heavy_user).values('recipe')
+    ).values_list('id', flat=True)[:20])
+    bench(f'{route} bulk add', user_client, 'post',
+          f'/api/recipes/{route}/', {'recipes': recipes}, expected=201)
+
+
+@pytest.mark.parametrize('model, route', [
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+])
+def test_toggle_bulk_remove(bench, user_client, heavy_user, model, route):
+    recipes = list(model.objects.filter(
+        user=heavy_user
+    ).values_list('recipe', flat=True)[:20])
+    bench(f'{route} bulk remove', user_client, 'delete',
+          f'/api/recipes/{route}/', {'recipes': recipes}, expected=204)
+
+
+@pytest.mark.parametrize('depth', [0, 3])
+def test_feed(bench, user_client, depth):
+    url = '/api/recipes/feed/?limit=20'
+    for _ in range(depth):
+        url = user_client.get(url).json()['next']
+    bench(f'feed depth {depth}', user_client, 'get', url)
+
+
+def test_subscribe(bench, user_client, new_author):
+    bench('subscribe add', user_client, 'post',
+          f'/api/users/{new_author.id}/subscribe/', expected=201)
+
+
+def test_unsubscribe(bench, user_client, heavy_user):
+    author = CustomUser.objects.filter(author__user=heavy_user).first()
+    bench('subscribe remove', user_client, 'delete',
+          f'/api/users/{author.id}/subscribe/', expected=204)
+
+
+@pytest.mark.parametrize('query', ['', '?recipes_limit=3&limit=20'])
+def test_subscriptions(bench, user_client, query):
+    bench(f'subscriptions {query}', user_client, 'get',
+          f'/api/users/subscriptions/{query}')
+
+
+@pytest.mark.parametrize('query', ['', '&max_missing=3'])
+def test_cook(bench, user_client, query):
+    ingredients = '&'.join(
+        f'ingredients={pk}'
+        for pk in Ingredient.objects.values_list('id', flat=True)[:300:10]
+    )
+    bench(f'cook {query}', user_client, 'get',
+          f'/api/recipes/cook/?{ingredients}{query}')
+
+
+@pytest.mark.parametrize('file_type', ['txt', 'csv', 'pdf'])
+def test_download_shopping_cart(bench, user_client, file_type):
+    bench(f'download_shopping_cart {file_type}', user_client, 'get',
+          f'/api/recipes/download_shopping_cart/?type={file_type}')
+
+
+def test_user_list(bench, user_client):
+    bench('users-list', user_client, 'get', '/api/users/?limit=50')
+
+
+def test_user_me(bench, user_client):
+    bench('users-me', user_client, 'get', '/api/users/me/')
@@ -0,0 +1,137 @@
+import importlib
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from tests import dataset
+from tests.test_endpoints import recipe_payload
+from users.models import CustomUser, Subscription
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def author():
+    return CustomUser.objects.create_user(
+        email='feed-author@foodgram.test', username='feed-author',
+        first_name='Feed', last_name='Author', password=dataset.PASSWORD
+    )
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+def read_feed(client, limit=7):
+    ids = []
+    url = f'/api/recipes/feed/?limit={limit}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids.extend(recipe['id'] for recipe in response.json()['results'])
+        url = response.json()['next']
+    return ids
+
+
+def expected_feed(user):
+    return list(Recipe.objects.filter(
+        author__author__user=user
+    ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+
+def test_feed_matches_subscriptions(user_client, heavy_user):
+    assert FeedEntry.objects.filter(user=heavy_user).exists()
+    assert read_feed(user_client) == expected_feed(heavy_user)
+
+
+def test_migration_fills_existing_feeds(user_client, heavy_user):
+    entries = set(FeedEntry.objects.values_list('user', 'recipe'))
+    FeedEntry.objects.all().delete()
+    importlib.import_module(
+        'recipes.migrations.0014_fill_feed_entries'
+    ).fill_feed_entries(apps, connection.schema_editor())
+    assert set(FeedEntry.objects.values_list('user', 'recipe')) == entries
+    assert read_feed(user_client) == expected_feed(heavy_user)
+
+
+def test_new_recipe_is_fanned_out(user_client, author, author_client):
+    assert user_client.post(
+        f'/api/users/{author.id}/subscribe/'
+    ).status_code == 201
+    response = author_client.post(
+        '/api/recipes/', recipe_payload(), format='json'
+    )
+    assert response.status_code == 201
+    feed = user_client.get('/api/recipes/feed/').json()['results']
+    assert feed[0]['id'] == response.json()['id']
+    assert feed[0]['author']['is_subscribed'] is True
+
+
+def test_subscription_backfills_and_unsubscribe_drops(
+        user_client, heavy_user, author):
+    recipes = [
+        Recipe.objects.create(
+            author=author, name=f'Feed {num}', text='Feed', cooking_time=5
+        ) for num in range(3)
+    ]
+    assert not {recipe.id for recipe in recipes} & set(read_feed(user_client))
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    assert read_feed(user_client) == expected_feed(heavy_user)
+    assert {recipe.id for recipe in recipes} <= set(read_feed(user_client))
+    user_client.delete(f'/api/users/{author.id}/subscribe/')
+    assert not FeedEntry.objects.filter(user=heavy_user, author=author)
+    assert read_feed(user_client) == expected_feed(heavy_user)
+
+
+def test_popular_authors_are_merged_on_read(
+        settings, user_client, heavy_user, author, author_client):
+    settings.FEED_FANOUT_LIMIT = 1
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    response = author_client.post(
+        '/api/recipes/', recipe_payload(), format='json'
+    )
+    assert not FeedEntry.objects.filter(recipe=response.json()['id'])
+    FeedEntry.objects.filter(user=heavy_user).delete()
+    assert read_feed(user_client) == expected_feed(heavy_user)
+
+
+@pytest.mark.parametrize('through_api', [True, False])
+def test_author_fanned_out_again_is_refilled(
+        settings, user_client, heavy_user, author, author_client,
+        through_api):
+    settings.FEED_FANOUT_LIMIT = 2
+    follower = CustomUser.objects.exclude(
+        pk__in=[heavy_user.pk, author.pk]
+    ).first()
+    other_client = APIClient()
+    other_client.force_authenticate(follower)
+    for client in (user_client, other_client):
+        client.post(f'/api/users/{author.id}/subscribe/')
+    response = author_client.post(
+        '/api/recipes/', recipe_payload(), format='json'
+    )
+    assert not FeedEntry.objects.filter(recipe=response.json()['id'])
+    if through_api:
+        other_client.delete(f'/api/users/{author.id}/subscribe/')
+    else:
+        Subscription.objects.get(user=follower, author=author).delete()
+    assert FeedEntry.objects.filter(
+        user=heavy_user, recipe=response.json()['id']
+    ).exists()
+    assert not FeedEntry.objects.filter(user=follower, author=author)
+    assert read_feed(user_client) == expected_feed(heavy_user)
+
+
+def test_feed_needs_authentication(anon_client):
+    assert anon_client.get('/api/recipes/feed/').status_code == 401
+
+
+def test_invalid_cursor(user_client):
+    response = user_client.get('/api/recipes/feed/?cursor=nope')
+    assert response.status_code == 404
@@ -0,0 +1,59 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from recipes.images import VARIANTS
+from recipes.models import Recipe
+from tests.test_endpoints import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def encode_image(size, image_format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, format=image_format)
+    return f'data:image/{image_format.lower()};base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def test_variants_are_generated_after_commit(
+        user_client, django_capture_on_commit_callbacks):
+    payload = {**recipe_payload(), 'image': encode_image((2000, 1000))}
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 201, response.data
+    assert response.data['image_thumbnail'] is None
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    for field, size in VARIANTS.items():
+        with Image.open(getattr(recipe, field).path) as image:
+            assert image.size == (size[0], size[0] // 2)
+    response = user_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.data['image_thumbnail'].endswith(
+        recipe.image_thumbnail.url
+    )
+
+
+@pytest.mark.parametrize('image, error', [
+    ('not an image', 'invalid'),
+    ('data:image/png;base64,!!!!', 'invalid'),
+    ('data:image/png;base64,' + base64.b64encode(b'text').decode(),
+     'invalid'),
+    (encode_image((8, 8), 'BMP'), 'invalid_format'),
+])
+def test_invalid_image_is_rejected(user_client, image, error):
+    payload = {**recipe_payload(), 'image': image}
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert response.data['image'][0].code == error
+
+
+def test_image_size_is_checked_before_decoding(user_client, settings):
+    settings.RECIPE_IMAGE_MAX_SIZE = 1024
+    payload = {**recipe_payload(), 'image': encode_image((256, 256), 'PNG')}
+    payload['image'] += 'A' * 2048
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert response.data['image'][0].code == 'too_large'
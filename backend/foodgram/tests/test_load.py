@@ -0,0 +1,81 @@
+import io
+import statistics
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+from rest_framework.test import RequestsClient
+
+from recipes import loadtest
+from recipes.models import Ingredient, Recipe, Tag
+from tests import dataset
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def test_seed_load_creates_skewed_population():
+    recipes = Recipe.objects.count()
+    stdout = io.StringIO()
+    call_command(
+        'seed_load', users=40, recipes=200, favorites=5, shopping_cart=3,
+        subscriptions=4, images=2, seed=1, prefix='seeded', stdout=stdout
+    )
+    assert 'users: 40 created' in stdout.getvalue()
+    assert 'recipes: 200 created' in stdout.getvalue()
+    users = CustomUser.objects.filter(username__startswith='seeded')
+    assert users.count() == 40
+    created = Recipe.objects.order_by('-pk')[:200]
+    assert Recipe.objects.count() == recipes + 200
+    assert all(recipe.image and recipe.image_thumbnail for recipe in created)
+    per_author = sorted(users.annotate(
+        total=Count('recipes')
+    ).values_list('total', flat=True), reverse=True)
+    assert per_author[0] > 4 * statistics.median(per_author)
+    call_command('rebuild_counters', check=True, stdout=io.StringIO())
+
+
+def test_seed_load_needs_reference_data():
+    Recipe.tags.through.objects.all().delete()
+    Tag.objects.all().delete()
+    with pytest.raises(CommandError, match='load_data'):
+        call_command('seed_load', users=1, recipes=1, stdout=io.StringIO())
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert [loadtest.percentile(values, percent) for percent in (
+        50, 95, 99, 100
+    )] == [50, 95, 99, 100]
+    assert loadtest.percentile([7], 99) == 7
+
+
+def test_load_driver_reports_every_endpoint():
+    credentials = [
+        (email, dataset.PASSWORD) for email in CustomUser.objects.order_by(
+            'pk'
+        ).values_list('email', flat=True)[:3]
+    ]
+    catalog = {
+        'recipe_ids': list(Recipe.objects.values_list('pk', flat=True)),
+        'author_ids': list(CustomUser.objects.values_list('pk', flat=True)),
+        'ingredient_ids': list(
+            Ingredient.objects.values_list('pk', flat=True)
+        ),
+        'ingredient_names': list(
+            Ingredient.objects.values_list('name', flat=True)
+        ),
+        'tag_slugs': list(Tag.objects.values_list('slug', flat=True)),
+    }
+    result = loadtest.run(
+        'http://testserver', credentials, catalog, virtual_users=1,
+        max_requests=150, seed=1, session_factory=RequestsClient
+    )
+    assert result['requests'] == 150
+    rows = {row['endpoint']: row for row in result['endpoints']}
+    assert set(rows) <= set(loadtest.MIX)
+    assert 'favorite add' in rows and 'recipes-list' in rows
+    for name, row in rows.items():
+        assert row['p50'] <= row['p95'] <= row['p99']
+        if not name.startswith('subscribe'):
+            assert row['errors'] == 0, name
@@ -0,0 +1,93 @@
+import re
+
+import pytest
+from django.test import Client
+from django.urls import resolve
+
+from api.metrics import DURATION_BUCKETS, registry
+
+pytestmark = pytest.mark.django_db
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def scrape(**extra):
+    return Client().get('/metrics/', **extra)
+
+
+def samples(text):
+    """
+    (name, labels, value) of every sample line, comments are checked
+    to precede the samples of their metric
+    """
+    described = set()
+    result = []
+    for line in text.splitlines():
+        if line.startswith('# '):
+            kind, name = line.split()[1:3]
+            assert kind in ('HELP', 'TYPE')
+            described.add(name)
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        assert re.sub(r'_(bucket|sum|count)$', '', name) in described
+        result.append((name, dict(
+            pair.split('=') for pair in (labels or '').split(',') if pair
+        ), float(value)))
+    return result
+
+
+def test_metrics_format(anon_client):
+    registry.reset()
+    for _ in range(3):
+        assert anon_client.get('/api/tags/').status_code == 200
+    response = scrape()
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    view = f'"{resolve("/api/tags/").view_name}"'
+    found = samples(response.content.decode())
+    assert ('foodgram_requests_total', {
+        'view': view, 'method': '"GET"', 'status': '"200"'
+    }, 3) in found
+    buckets = [
+        (labels['le'], value) for name, labels, value in found
+        if name == 'foodgram_request_duration_seconds_bucket'
+        and labels['view'] == view
+    ]
+    assert [bound for bound, _ in buckets] == [
+        f'"{bound}"' for bound in DURATION_BUCKETS
+    ] + ['"+Inf"']
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts) and counts[-1] == 3
+    assert ('foodgram_db_queries_count', {'view': view}, 3) in found
+
+
+@pytest.mark.parametrize('extra, status', [
+    ({}, 200),
+    ({'REMOTE_ADDR': '10.0.3.7'}, 200),
+    ({'REMOTE_ADDR': '172.18.0.5'}, 200),
+    ({'REMOTE_ADDR': '203.0.113.9'}, 403),
+    ({'REMOTE_ADDR': 'unknown'}, 403),
+    ({'HTTP_X_FORWARDED_FOR': '127.0.0.1'}, 403),
+])
+def test_metrics_access(extra, status):
+    assert scrape(**extra).status_code == status
+
+
+def test_metrics_networks_setting(settings):
+    settings.METRICS_ALLOWED_NETWORKS = ['203.0.113.0/24']
+    assert scrape().status_code == 403
+    assert scrape(REMOTE_ADDR='203.0.113.9').status_code == 200
+
+
+def test_serialization_and_render_time(anon_client):
+    registry.reset()
+    assert anon_client.get('/api/users/').status_code == 200
+    view = f'"{resolve("/api/users/").view_name}"'
+    sums = {
+        name: value for name, labels, value in samples(
+            scrape().content.decode()
+        ) if name.endswith('_sum') and labels['view'] == view
+    }
+    serialization = sums['foodgram_serialization_duration_seconds_sum']
+    assert 0 < serialization < sums['foodgram_request_duration_seconds_sum']
+    assert sums['foodgram_render_duration_seconds_sum'] > 0
@@ -0,0 +1,105 @@
+import re
+
+import pytest
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from api.filters import RecipeFilter
+from recipes import feed
+from recipes.models import Recipe, Tag
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT)(\w+)\b(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+# Small lookup tables a full scan is cheaper for
+SMALL_TABLES = {Tag._meta.db_table}
+
+
+def explain(queryset):
+    """
+    Query plan of the queryset. The test database is tiny, so on
+    PostgreSQL sequential scans are turned off to see which index the
+    planner would pick on production data
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def assert_uses_index(queryset, index=None):
+    plan = explain(queryset)
+    scanned = set(FULL_SCAN[connection.vendor].findall(plan))
+    assert not scanned - SMALL_TABLES, plan
+    if index is not None:
+        assert index in plan, plan
+
+
+def recipe_list(user, **params):
+    return RecipeFilter(params, Recipe.objects.with_user_flags(user).defer(
+        'search_vector'
+    ).order_by('-pub_date', '-id'), request=type(
+        'Request', (), {'user': user}
+    )).qs[:6]
+
+
+def test_recipe_list(heavy_user):
+    assert_uses_index(recipe_list(heavy_user), 'recipe_pub_date_id_idx')
+
+
+def test_recipes_of_author(heavy_user):
+    assert_uses_index(
+        recipe_list(heavy_user, author=heavy_user.pk),
+        'recipe_author_pub_date_idx'
+    )
+
+
+def test_recipes_by_tag(heavy_user):
+    assert_uses_index(
+        recipe_list(heavy_user, tags=[Tag.objects.first().slug]),
+        'recipe_tags_tag_recipe_idx'
+    )
+
+
+@pytest.mark.parametrize('flag', ['is_favorited', 'is_in_shopping_cart'])
+def test_recipes_of_user(heavy_user, flag):
+    assert_uses_index(recipe_list(heavy_user, **{flag: 1}))
+
+
+def test_subscriptions(heavy_user):
+    recipes = Recipe.objects.filter(pk__in=Subquery(
+        Recipe.objects.filter(author=OuterRef('author')).values('pk')[:3]
+    ), author__in=CustomUser.objects.filter(author__user=heavy_user))
+    assert_uses_index(
+        CustomUser.objects.filter(author__user=heavy_user)[:6]
+    )
+    assert_uses_index(recipes, 'recipe_author_pub_date_idx')
+
+
+def test_fan_out_followers(heavy_user):
+    assert_uses_index(
+        feed.followers(heavy_user.pk), 'subscription_author_user_idx'
+    )
+
+
+def test_feed_page(heavy_user):
+    recipe = Recipe.objects.order_by('-pub_date', '-id')[10]
+    position = (recipe.pub_date, recipe.pk)
+    assert_uses_index(
+        feed.entry_keys(heavy_user, position)[:6],
+        'feed_entry_user_pub_date_idx'
+    )
+    assert_uses_index(feed.merged_keys(heavy_user, position)[:6])
+
+
+def test_cook():
+    assert_uses_index(Recipe.objects.filter(
+        ingredient_relation__ingredient_id__in=[1, 2, 3]
+    ).annotate(
+        covered=Count('ingredient_relation__ingredient')
+    ).values_list('pk', 'covered'), 'recipe_ingredient_lookup_idx')
@@ -0,0 +1,103 @@
+import pytest
+
+from api.serializers import CreateRecipeSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from tests.test_endpoints import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def missing_id(model):
+    return model.objects.order_by('-id').values_list('id', flat=True)[0] + 1
+
+
+@pytest.fixture
+def recipe(user_client):
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(), format='json'
+    )
+    assert response.status_code == 201
+    return Recipe.objects.get(pk=response.json()['id'])
+
+
+def relations(recipe):
+    return {
+        relation.ingredient_id: (relation.pk, relation.amount)
+        for relation in RecipeIngredient.objects.filter(recipe=recipe)
+    }
+
+
+def test_missing_ingredients_are_reported(user_client):
+    payload = recipe_payload()
+    missing = missing_id(Ingredient)
+    payload['ingredients'].append({'id': missing, 'amount': 1})
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert response.json() == {
+        'ingredients': [f'Ingredients do not exist: [{missing}]']
+    }
+
+
+def test_missing_tags_are_reported(user_client):
+    payload = recipe_payload()
+    missing = missing_id(Tag)
+    payload['tags'].append(missing)
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert response.json() == {'tags': [f'Tags do not exist: [{missing}]']}
+
+
+def test_recipe_without_tags(user_client):
+    payload = recipe_payload()
+    payload['tags'] = []
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 201
+    assert response.json()['tags'] == []
+
+
+def test_update_writes_only_the_difference(user_client, recipe):
+    before = relations(recipe)
+    ingredients = [
+        {'id': pk, 'amount': amount}
+        for pk, (_, amount) in before.items()
+    ]
+    removed = ingredients.pop(0)['id']
+    changed = ingredients[0]['id']
+    ingredients[0]['amount'] += 5
+    added = Ingredient.objects.exclude(
+        id__in=before
+    ).values_list('id', flat=True)[0]
+    ingredients.append({'id': added, 'amount': 3})
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'ingredients': ingredients},
+        format='json'
+    )
+    assert response.status_code == 200
+    after = relations(recipe)
+    assert removed not in after
+    assert after[changed] == (before[changed][0], before[changed][1] + 5)
+    assert after[added][1] == 3
+    for pk in before.keys() - {removed, changed}:
+        assert after[pk] == before[pk]
+    recipe.refresh_from_db()
+    assert recipe.ingredients_count == len(ingredients)
+
+
+def test_update_ingredients_returns_the_changed_ids(recipe):
+    before = relations(recipe)
+    ingredients = [
+        {'id': pk, 'amount': amount}
+        for pk, (_, amount) in before.items()
+    ]
+    removed = ingredients.pop()['id']
+    ingredients[0]['amount'] += 1
+    added = Ingredient.objects.exclude(
+        id__in=before
+    ).values_list('id', flat=True)[0]
+    ingredients.append({'id': added, 'amount': 1})
+    assert CreateRecipeSerializer().update_ingredients(
+        ingredients, recipe
+    ) == {removed, ingredients[0]['id'], added}
+    assert CreateRecipeSerializer().update_ingredients(
+        ingredients, Recipe.objects.get(pk=recipe.pk)
+    ) == set()
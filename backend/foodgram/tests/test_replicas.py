@@ -0,0 +1,96 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import AsyncClient
+
+from foodgram import routers
+from foodgram.routers import pin_key, primary_reads, use_replicas
+from recipes.cache import RecipeResponseCache, new_version, tag_cache
+from recipes.models import Recipe
+from tests.test_endpoints import recipe_payload
+
+# The replica database is empty: whatever a request reads from it is
+# missing from the response
+pytestmark = pytest.mark.django_db(databases=['default', 'replica'])
+
+
+@pytest.fixture(autouse=True)
+def replicas(db, settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ['replica']
+    # The test runs in atomic blocks of its own, only the blocks opened
+    # by the code under test are transactions for the router
+    connection = connections[DEFAULT_DB_ALIAS]
+    depth = len(connection.atomic_blocks)
+    monkeypatch.setattr(
+        routers, 'in_transaction',
+        lambda: len(connection.atomic_blocks) > depth
+    )
+
+
+def count(client, url='/api/recipes/'):
+    response = client.get(url)
+    assert response.status_code == 200
+    return len(response.json()['results'])
+
+
+def test_reads_go_to_replicas(anon_client, user_client):
+    assert count(anon_client) == 0
+    assert count(user_client, '/api/users/subscriptions/') == 0
+
+
+def test_other_views_read_from_primary(user_client):
+    assert count(user_client, '/api/recipes/feed/') > 0
+
+
+def test_reference_caches_are_built_from_primary(anon_client):
+    tag_cache.invalidate()
+    assert anon_client.get('/api/tags/').json() == tag_cache.all()
+    assert tag_cache.all()
+
+
+def test_writer_is_pinned_to_primary(
+        recipe_responses, anon_client, user_client, heavy_user):
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(), format='json'
+    )
+    assert response.status_code == 201
+    url = f'/api/recipes/{response.json()["id"]}/'
+    assert Recipe.objects.filter(pk=response.json()['id']).exists()
+    assert anon_client.get(url).status_code == 404
+    assert user_client.get(url).status_code == 200
+    recipe_responses.invalidate()
+    cache.delete(pin_key(heavy_user.pk))
+    assert user_client.get(url).status_code == 404
+
+
+def test_transactions_read_from_primary():
+    with primary_reads():
+        use_replicas()
+        assert not Recipe.objects.exists()
+        with transaction.atomic():
+            assert Recipe.objects.exists()
+
+
+def test_async_reads_go_to_replicas(settings):
+    async def get(url):
+        return await AsyncClient().get(url)
+
+    settings.ROOT_URLCONF = 'foodgram.asgi_urls'
+    response = async_to_sync(get)('/api/recipes/')
+    assert response.status_code == 200
+    assert response.json()['results'] == []
+
+
+def test_fresh_replica_responses_expire_with_the_lag(settings):
+    version = new_version()
+    responses = RecipeResponseCache()
+    with primary_reads():
+        assert responses.timeout(version) == (
+            settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+        )
+        use_replicas()
+        assert responses.timeout(version) <= settings.DATABASE_REPLICA_LAG
+        assert responses.timeout(str(int(version) - 10 ** 11)) == (
+            settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+        )
@@ -0,0 +1,117 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.views import RecipeViewSet
+from recipes import relations
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+pytestmark = pytest.mark.django_db
+
+LIST_URL = '/api/recipes/?limit=50'
+
+
+def get(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return response.json(), len(context.captured_queries)
+
+
+def test_anonymous_response_is_served_from_cache(anon_client):
+    body, queries = get(anon_client, LIST_URL)
+    assert queries > 0
+    assert get(anon_client, LIST_URL) == (body, 0)
+
+
+def test_query_string_is_normalized(anon_client):
+    get(anon_client, '/api/recipes/?tags=lunch&tags=breakfast&limit=50')
+    _, queries = get(
+        anon_client, '/api/recipes/?limit=50&tags=breakfast&tags=lunch'
+    )
+    assert queries == 0
+
+
+@pytest.mark.parametrize('url', [LIST_URL, '/api/recipes/{pk}/'])
+def test_image_urls_follow_the_request_origin(anon_client, url):
+    recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+    Recipe.objects.filter(pk=recipe.pk).update(image='recipes/images/a.jpg')
+    url = url.format(pk=recipe.pk)
+    for host, secure in [
+        ('one.example', False), ('two.example', False), ('one.example', True)
+    ]:
+        response = anon_client.get(url, HTTP_HOST=host, secure=secure)
+        body = response.json()
+        if 'results' in body:
+            body = next(
+                item for item in body['results'] if item['id'] == recipe.pk
+            )
+        image = body['image']
+        scheme = 'https' if secure else 'http'
+        assert image.startswith(f'{scheme}://{host}/'), image
+
+
+def test_shared_body_gets_user_flags(anon_client, user_client, monkeypatch):
+    get(anon_client, LIST_URL)
+    cached, queries = get(user_client, LIST_URL)
+    assert queries == 3
+    monkeypatch.setattr(
+        RecipeViewSet, 'is_cacheable', lambda self, request: False
+    )
+    assert cached == get(user_client, LIST_URL)[0]
+    monkeypatch.undo()
+    flags = {
+        (recipe['is_favorited'], recipe['is_in_shopping_cart'],
+         recipe['author']['is_subscribed'])
+        for recipe in cached['results']
+    }
+    assert len(flags) > 1
+    assert get(user_client, LIST_URL) == (cached, 0)
+
+
+def test_user_filters_are_not_cached(user_client):
+    get(user_client, '/api/recipes/?is_favorited=1')
+    _, queries = get(user_client, '/api/recipes/?is_favorited=1')
+    assert queries > 0
+
+
+@pytest.mark.parametrize('model, flag', [
+    (Favorite, 'is_favorited'), (ShoppingCart, 'is_in_shopping_cart')
+])
+def test_toggle_invalidates_user_flags(
+        user_client, heavy_user, django_capture_on_commit_callbacks,
+        model, flag):
+    recipe = Recipe.objects.exclude(
+        id__in=model.objects.filter(user=heavy_user).values('recipe')
+    ).first()
+    url = f'/api/recipes/{recipe.id}/'
+    assert get(user_client, url)[0][flag] is False
+    with django_capture_on_commit_callbacks(execute=True):
+        model.objects.create(user=heavy_user, recipe=recipe)
+    assert get(user_client, url)[0][flag] is True
+
+
+def test_subscription_invalidates_user_flags(
+        user_client, heavy_user, django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.filter(author__author__user=heavy_user).first()
+    url = f'/api/recipes/{recipe.id}/'
+    assert get(user_client, url)[0]['author']['is_subscribed'] is True
+    with django_capture_on_commit_callbacks(execute=True):
+        relations.remove(
+            Subscription, heavy_user, [recipe.author_id], field='author'
+        )
+    assert get(user_client, url)[0]['author']['is_subscribed'] is False
+
+
+def test_recipe_change_invalidates_bodies(
+        anon_client, django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.first()
+    url = f'/api/recipes/{recipe.id}/'
+    get(anon_client, url)
+    get(anon_client, LIST_URL)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Renamed'
+        recipe.save()
+    assert get(anon_client, url)[0]['name'] == 'Renamed'
+    assert get(anon_client, LIST_URL)[1] > 0
@@ -0,0 +1,95 @@
+import importlib
+
+import pytest
+from django.apps import apps
+from django.db import connection
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.search import recipe_search_index
+from tests.test_endpoints import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def search(client, query):
+    response = client.get('/api/recipes/', {'search': query, 'limit': 50})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.fixture
+def soup(heavy_user):
+    recipe = Recipe.objects.create(
+        author=heavy_user, name='Борщ украинский', cooking_time=90,
+        text='Свёклу натереть, капусту нашинковать'
+    )
+    RecipeIngredient.objects.create(
+        recipe=recipe, amount=300,
+        ingredient=Ingredient.objects.get_or_create(
+            name='капуста савойская', measurement_unit='г'
+        )[0]
+    )
+    recipe_search_index.invalidate()
+    return recipe
+
+
+def test_search_by_name_ingredient_and_text(anon_client, soup):
+    assert search(anon_client, 'борщ') == [soup.id]
+    assert search(anon_client, 'савойская') == [soup.id]
+    assert search(anon_client, 'свеклу') == [soup.id]
+    assert search(anon_client, 'борщ савойская') == [soup.id]
+    assert search(anon_client, 'борщ пицца') == []
+
+
+def test_name_matches_rank_first(anon_client, heavy_user, soup):
+    by_name = Recipe.objects.create(
+        author=heavy_user, name='Капуста тушёная', text='Тушить',
+        cooking_time=40
+    )
+    recipe_search_index.invalidate()
+    found = search(anon_client, 'капуста')
+    assert found[0] == by_name.id
+    assert soup.id in found
+
+
+def test_search_is_maintained_on_write(
+        user_client, django_capture_on_commit_callbacks):
+    payload = {**recipe_payload(), 'name': 'Шарлотка яблочная'}
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe_id = user_client.post(
+            '/api/recipes/', payload, format='json'
+        ).json()['id']
+    assert search(user_client, 'шарлотка') == [recipe_id]
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(
+            f'/api/recipes/{recipe_id}/', {'name': 'Пирог'}, format='json'
+        )
+    assert search(user_client, 'шарлотка') == []
+    assert search(user_client, 'пирог') == [recipe_id]
+
+
+def test_fallback_index_tokens(soup):
+    index = recipe_search_index.get_snapshot()
+    assert soup.id in index['свеклу']
+    assert index['борщ'][soup.id] > index['свеклу'][soup.id]
+
+
+def test_search_has_no_cursor_pages(anon_client, soup):
+    response = anon_client.get(
+        '/api/recipes/', {'search': 'борщ', 'cursor': ''}
+    )
+    assert response.status_code == 400
+    assert 'cursor' in response.json()
+    response = anon_client.get('/api/recipes/', {'search': '', 'cursor': ''})
+    assert response.status_code == 200
+
+
+def test_migration_fills_existing_recipes(anon_client, soup):
+    if connection.vendor != 'postgresql':
+        pytest.skip('the search vector is stored on PostgreSQL only')
+    Recipe.objects.update(search_vector=None)
+    assert search(anon_client, 'борщ') == []
+    importlib.import_module(
+        'recipes.migrations.0013_fill_search_vector'
+    ).fill_search_vector(apps, connection.schema_editor())
+    assert search(anon_client, 'борщ') == [soup.id]
@@ -0,0 +1,110 @@
+import datetime
+import decimal
+import time
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import ORJSONRenderer
+from api.representation import CompiledRepresentationMixin
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe
+from tests import conftest
+
+pytestmark = pytest.mark.django_db
+
+URLS = [
+    '/api/recipes/?limit=50',
+    '/api/recipes/?page=2&limit=10',
+    '/api/recipes/5/',
+    '/api/recipes/feed/',
+    '/api/recipes/cook/?ingredients=1&ingredients=2&max_missing=20',
+    '/api/users/',
+    '/api/users/me/',
+    '/api/users/subscriptions/?recipes_limit=2',
+    '/api/tags/',
+    '/api/ingredients/?name=са',
+]
+
+DATA = [
+    {'text': 'Борщ     \x00\x1f\x7f "quoted" \\ / \n\t 🍲'},
+    {1: 'int key', 'lazy': gettext_lazy('Not found.')},
+    {'error': [ErrorDetail('Invalid token.', code='authentication_failed')]},
+    {'decimal': decimal.Decimal('1.50'), 'float': 0.1, 'big': 2 ** 70},
+    {'datetime': datetime.datetime(
+        2023, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc
+    ), 'date': datetime.date(2023, 1, 2), 'time': datetime.time(1, 2, 3)},
+    [None, True, False, [], {}, '', -1, 1.5, 123456.789],
+]
+
+
+def use_stock(monkeypatch):
+    """
+    Serialize with the DRF field machinery and the standard renderer
+    """
+    monkeypatch.setattr(
+        CompiledRepresentationMixin, 'to_representation',
+        lambda self, instance: super(
+            CompiledRepresentationMixin, self
+        ).to_representation(instance)
+    )
+    monkeypatch.setattr(ORJSONRenderer, 'render', JSONRenderer.render)
+
+
+@pytest.mark.parametrize('data', DATA)
+@pytest.mark.parametrize('media_type', [None, 'application/json; indent=2'])
+def test_renderer_matches_json_renderer(data, media_type):
+    assert ORJSONRenderer().render(data, media_type) == JSONRenderer().render(
+        data, media_type
+    )
+
+
+@pytest.mark.parametrize('authenticated', [False, True])
+@pytest.mark.parametrize('url', URLS)
+def test_responses_match_stock_serializers(
+        monkeypatch, recipe_responses, anon_client, user_client, url,
+        authenticated):
+    client = user_client if authenticated else anon_client
+    response = client.get(url)
+    use_stock(monkeypatch)
+    recipe_responses.invalidate()
+    expected = client.get(url)
+    assert response.status_code == expected.status_code
+    assert response.content == expected.content
+
+
+def serialization_cost(recipes, request, renderer, rounds=5):
+    """
+    Best time of serializing and rendering the recipes, per recipe, µs
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        renderer.render(RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(recipes) * 10 ** 6
+
+
+def test_serialization_cost(heavy_user, monkeypatch):
+    """
+    Report both costs in the terminal summary. Wall-clock timings are
+    not compared: they depend on the machine and its load.
+    """
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = heavy_user
+    recipes = list(
+        Recipe.objects.with_related(heavy_user).with_user_flags(heavy_user)
+    )
+    compiled = serialization_cost(recipes, request, ORJSONRenderer())
+    use_stock(monkeypatch)
+    stock = serialization_cost(recipes, request, JSONRenderer())
+    conftest.SERIALIZATION_COSTS.update(
+        {'compiled + orjson': compiled, 'DRF + json': stock}
+    )
@@ -0,0 +1,166 @@
+import importlib
+import io
+
+import pytest
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+from recipes.shopping_list import cart_totals
+from tests.test_endpoints import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+def assert_consistent():
+    assert set(ShoppingListItem.objects.values_list(
+        'user', 'ingredient', 'amount'
+    )) == set(cart_totals())
+
+
+def test_seeded_lists_match_carts():
+    assert ShoppingListItem.objects.exists()
+    assert_consistent()
+
+
+def test_toggles_keep_lists(user_client, heavy_user):
+    recipe_id = Recipe.objects.exclude(
+        id__in=ShoppingCart.objects.filter(user=heavy_user).values('recipe')
+    ).values_list('id', flat=True).first()
+    url = f'/api/recipes/{recipe_id}/shopping_cart/'
+    assert user_client.post(url).status_code == 201
+    assert_consistent()
+    assert user_client.delete(url).status_code == 204
+    assert_consistent()
+
+
+def test_bulk_toggles_keep_lists(user_client, heavy_user):
+    recipes = list(Recipe.objects.exclude(
+        id__in=ShoppingCart.objects.filter(user=heavy_user).values('recipe')
+    ).values_list('id', flat=True)[:20])
+    response = user_client.post(
+        '/api/recipes/shopping_cart/', {'recipes': recipes}, format='json'
+    )
+    assert response.status_code == 201
+    assert_consistent()
+    response = user_client.delete(
+        '/api/recipes/shopping_cart/', {'recipes': recipes[:10]},
+        format='json'
+    )
+    assert response.status_code == 204
+    assert_consistent()
+
+
+def test_recipe_changes_keep_lists(user_client):
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(), format='json'
+    )
+    assert response.status_code == 201
+    url = f'/api/recipes/{response.json()["id"]}/'
+    assert user_client.post(f'{url}shopping_cart/').status_code == 201
+    payload = recipe_payload()
+    ingredients = payload['ingredients'][3:]
+    ingredients[0]['amount'] = 25
+    ingredients.append({
+        'id': Ingredient.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first(),
+        'amount': 7,
+    })
+    payload['ingredients'] = ingredients
+    assert user_client.patch(url, payload, format='json').status_code == 200
+    assert_consistent()
+    assert user_client.delete(url).status_code == 204
+    assert_consistent()
+
+
+def admin_change_data(recipe, relations, extra):
+    """
+    POST data of the admin change form of the recipe, with an inline
+    form per relation dict and the extra new relations
+    """
+    prefix = 'ingredient_relation'
+    data = {
+        'author': recipe.author_id, 'name': recipe.name, 'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': list(recipe.tags.values_list('id', flat=True)),
+        f'{prefix}-TOTAL_FORMS': len(relations) + len(extra),
+        f'{prefix}-INITIAL_FORMS': len(relations),
+        f'{prefix}-MIN_NUM_FORMS': 0,
+        f'{prefix}-MAX_NUM_FORMS': 1000,
+    }
+    for num, relation in enumerate([*relations, *extra]):
+        data.update({
+            f'{prefix}-{num}-{field}': value
+            for field, value in relation.items()
+        })
+    return data
+
+
+def test_admin_changes_keep_lists(admin_client):
+    recipe = Recipe.objects.filter(shoppingcart__isnull=False).first()
+    relations = [
+        {
+            'id': relation.pk, 'recipe': recipe.pk,
+            'ingredient': relation.ingredient_id, 'amount': relation.amount
+        } for relation in RecipeIngredient.objects.filter(recipe=recipe)
+    ]
+    relations[0]['amount'] += 5
+    relations[1]['DELETE'] = 'on'
+    added = Ingredient.objects.exclude(
+        id__in=[relation['ingredient'] for relation in relations]
+    ).values_list('id', flat=True).first()
+    response = admin_client.post(
+        f'/admin/recipes/recipe/{recipe.pk}/change/',
+        admin_change_data(recipe, relations, [
+            {'recipe': recipe.pk, 'ingredient': added, 'amount': 3}
+        ])
+    )
+    assert response.status_code == 302
+    recipe.refresh_from_db()
+    assert recipe.ingredients_count == len(relations)
+    assert_consistent()
+    cart = ShoppingCart.objects.filter(recipe=recipe).first()
+    response = admin_client.post(
+        f'/admin/recipes/shoppingcart/{cart.pk}/delete/', {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    assert not ShoppingCart.objects.filter(pk=cart.pk).exists()
+    assert_consistent()
+
+
+def test_download_reads_the_list(user_client, heavy_user):
+    item = ShoppingListItem.objects.filter(user=heavy_user).select_related(
+        'ingredient'
+    ).first()
+    response = user_client.get(
+        '/api/recipes/download_shopping_cart/?type=txt'
+    )
+    assert response.status_code == 200
+    assert (
+        f'{item.ingredient.name} - {item.amount}'
+        f' {item.ingredient.measurement_unit}\n'
+    ) in b''.join(response.streaming_content).decode()
+
+
+def test_check_command_finds_and_rebuild_repairs_drift(heavy_user):
+    ShoppingListItem.objects.filter(user=heavy_user).update(amount=0)
+    ShoppingListItem.objects.exclude(user=heavy_user).first().delete()
+    with pytest.raises(CommandError):
+        call_command('rebuild_shopping_lists', '--check', stdout=io.StringIO())
+    out = io.StringIO()
+    call_command('rebuild_shopping_lists', stdout=out)
+    assert 'shopping list rows written' in out.getvalue()
+    assert_consistent()
+    call_command('rebuild_shopping_lists', '--check', stdout=io.StringIO())
+
+
+def test_migration_fills_lists_from_carts():
+    ShoppingListItem.objects.all().delete()
+    importlib.import_module(
+        'recipes.migrations.0012_shopping_list_item'
+    ).fill_shopping_lists(apps, connection.schema_editor())
+    assert ShoppingListItem.objects.exists()
+    assert_consistent()
@@ -0,0 +1,38 @@
+import pytest
+
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/users/subscriptions/'
+
+
+@pytest.mark.parametrize('limit', [1, 3])
+def test_recipes_limit_applies_per_author(user_client, limit):
+    response = user_client.get(URL, {'recipes_limit': limit, 'limit': 50})
+    assert response.status_code == 200
+    authors = response.json()['results']
+    assert authors
+    for author in authors:
+        expected = list(Recipe.objects.filter(
+            author=author['id']
+        ).values_list('id', flat=True)[:limit])
+        assert [recipe['id'] for recipe in author['recipes']] == expected
+        assert author['recipes_count'] >= len(expected)
+    assert any(
+        author['recipes_count'] > limit for author in authors
+    )
+
+
+def test_no_recipes_limit_returns_all_recipes(user_client):
+    response = user_client.get(URL, {'limit': 50})
+    assert response.status_code == 200
+    for author in response.json()['results']:
+        assert len(author['recipes']) == author['recipes_count']
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc', '1.5', ''])
+def test_invalid_recipes_limit(user_client, limit):
+    response = user_client.get(URL, {'recipes_limit': limit})
+    assert response.status_code == 400
+    assert 'recipes_limit' in response.json()
@@ -0,0 +1,138 @@
+import pytest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscription
+
+pytestmark = pytest.mark.django_db
+
+
+def free_recipes(model, user, count=1):
+    return list(Recipe.objects.exclude(
+        id__in=model.objects.filter(user=user).values('recipe')
+    ).values_list('id', flat=True)[:count])
+
+
+@pytest.mark.parametrize('model, route', [
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+])
+def test_toggle_is_idempotent(user_client, heavy_user, model, route):
+    recipe_id, = free_recipes(model, heavy_user)
+    url = f'/api/recipes/{recipe_id}/{route}/'
+    for _ in range(2):
+        response = user_client.post(url)
+        assert response.status_code == 201
+        assert response.json()['id'] == recipe_id
+    assert model.objects.filter(user=heavy_user, recipe=recipe_id).count() == 1
+    for _ in range(2):
+        assert user_client.delete(url).status_code == 204
+    assert not model.objects.filter(
+        user=heavy_user, recipe=recipe_id
+    ).exists()
+
+
+def test_favorites_count_follows_toggles(user_client, heavy_user):
+    recipe_id, = free_recipes(Favorite, heavy_user)
+    url = f'/api/recipes/{recipe_id}/favorite/'
+    count = Recipe.objects.get(pk=recipe_id).favorites_count
+    user_client.post(url)
+    user_client.post(url)
+    assert Recipe.objects.get(pk=recipe_id).favorites_count == count + 1
+    user_client.delete(url)
+    user_client.delete(url)
+    assert Recipe.objects.get(pk=recipe_id).favorites_count == count
+
+
+@pytest.mark.parametrize('method', ['post', 'delete'])
+@pytest.mark.parametrize('route', ['favorite', 'shopping_cart'])
+def test_toggle_of_unknown_recipe(user_client, method, route):
+    missing = Recipe.objects.order_by('-id').first().id + 1
+    response = getattr(user_client, method)(
+        f'/api/recipes/{missing}/{route}/'
+    )
+    assert response.status_code == 404
+
+
+def test_subscribe_is_idempotent(user_client, heavy_user):
+    author = CustomUser.objects.create_user(
+        email='toggle-author@foodgram.test', username='toggle-author',
+        first_name='Toggle', last_name='Author', password='password'
+    )
+    url = f'/api/users/{author.id}/subscribe/'
+    count = author.subscribers_count
+    for _ in range(2):
+        response = user_client.post(url)
+        assert response.status_code == 201
+        assert response.json()['is_subscribed'] is True
+    author.refresh_from_db()
+    assert author.subscribers_count == count + 1
+    for _ in range(2):
+        assert user_client.delete(url).status_code == 204
+    author.refresh_from_db()
+    assert author.subscribers_count == count
+    assert not Subscription.objects.filter(
+        user=heavy_user, author=author
+    ).exists()
+
+
+def test_subscribe_to_yourself(user_client, heavy_user):
+    response = user_client.post(f'/api/users/{heavy_user.id}/subscribe/')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('model, route', [
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+])
+def test_bulk_toggle(user_client, heavy_user, model, route):
+    recipe_ids = free_recipes(model, heavy_user, 5)
+    url = f'/api/recipes/{route}/'
+    response = user_client.post(
+        url, {'recipes': recipe_ids + recipe_ids[:1]}, format='json'
+    )
+    assert response.status_code == 201
+    assert [recipe['id'] for recipe in response.json()] == recipe_ids
+    assert user_client.post(
+        url, {'recipes': recipe_ids}, format='json'
+    ).status_code == 201
+    assert model.objects.filter(
+        user=heavy_user, recipe__in=recipe_ids
+    ).count() == len(recipe_ids)
+    assert user_client.delete(
+        url, {'recipes': recipe_ids}, format='json'
+    ).status_code == 204
+    assert not model.objects.filter(
+        user=heavy_user, recipe__in=recipe_ids
+    ).exists()
+
+
+@pytest.mark.parametrize('recipes', [[], [0], 'nope'])
+def test_bulk_toggle_rejects_bad_ids(user_client, recipes):
+    response = user_client.post(
+        '/api/recipes/favorite/', {'recipes': recipes}, format='json'
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_toggle_reports_unknown_recipes(user_client, heavy_user):
+    recipe_ids = free_recipes(Favorite, heavy_user, 2)
+    missing = Recipe.objects.order_by('-id').first().id + 1
+    response = user_client.post(
+        '/api/recipes/favorite/', {'recipes': recipe_ids + [missing]},
+        format='json'
+    )
+    assert response.status_code == 400
+    assert str(missing) in response.json()['recipes']
+    assert not Favorite.objects.filter(
+        user=heavy_user, recipe__in=recipe_ids
+    ).exists()
+
+
+def test_user_list_subscriptions(user_client, anon_client, heavy_user):
+    authors = set(Subscription.objects.filter(
+        user=heavy_user
+    ).values_list('author', flat=True))
+    users = user_client.get('/api/users/').json()
+    assert authors and {
+        user['id'] for user in users if user['is_subscribed']
+    } == authors & {user['id'] for user in users}
+    users = anon_client.get('/api/users/').json()
+    assert not any(user['is_subscribed'] for user in users)
@@ -8,7 +8,8 @@ from users.models import CustomUser, Subscription
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
     list_display = ('email', 'username', 'first_name',
-                    'last_name', 'is_staff', 'is_superuser', 'is_active',)
+                    'last_name', 'is_staff', 'is_superuser', 'is_active',
+                    'recipes_count', 'subscribers_count',)
     list_filter = ('email', 'username', 'first_name',
                    'last_name', 'is_staff', 'is_superuser', 'is_active',)
     fieldsets = (
@@ -32,7 +32,27 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, password, **other_fields)
 
 
-class CustomUser(AbstractUser):
+class CountersMixin:
+    """
+    Denormalized counters are moved by F() updates only: a full save of
+    an existing row leaves them alone, since the instance may be older
+    than their last update (like a user from the token cache)
+    """
+    counter_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None and not self._state.adding:
+            # Deferred fields are left out, as Model.save does
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+                and field.attname not in skipped
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class CustomUser(CountersMixin, AbstractUser):
     email = models.EmailField(
         max_length=256,
         unique=True,
@@ -42,6 +62,18 @@ class CustomUser(AbstractUser):
     last_name = models.CharField(max_length=128, verbose_name='Фамилия')
     username = models.CharField(max_length=128, verbose_name='Никнейм')
     password = models.CharField(max_length=128, verbose_name='Пароль')
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -62,12 +94,16 @@ class Subscription(models.Model):
         CustomUser,
         related_name='follower',
         on_delete=models.CASCADE,
+        # Leading column of user_subscription_unique
+        db_index=False,
         verbose_name='Подписчик'
     )
     author = models.ForeignKey(
         CustomUser,
         related_name='author',
         on_delete=models.CASCADE,
+        # Leading column of subscription_author_user_idx
+        db_index=False,
         verbose_name='Автор'
     )
 
@@ -80,6 +116,12 @@ class Subscription(models.Model):
                 name='user_subscription_unique'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Пользователь {self.user} подписался на {self.author}'
@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes import counters, feed
+from recipes.cache import recipe_response_cache
+from recipes.relations import relations_changed
+from users.models import CustomUser, Subscription
+from users.tokens import token_cache
+
+
+def invalidate_tokens(keys):
+    """
+    Drop the tokens from the token cache right away, and once more after
+    commit, so that a request racing the transaction cannot put the old
+    rows back
+    """
+    def invalidate():
+        for key in keys:
+            token_cache.invalidate(key)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(instance, created, update_fields, **kwargs):
+    """
+    Cached tokens carry their user: any change of the user, deactivation
+    included, drops them. Logins only update last_login.
+    """
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tokens(list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    ))
+
+
+def deletes_author(origin, instance):
+    """
+    Whether the subscription is removed together with its author
+    """
+    return isinstance(origin, CustomUser) and origin.pk == instance.author_id
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(instance, created, **kwargs):
+    if created:
+        counters.increment(
+            CustomUser, [instance.author_id], 'subscribers_count'
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(instance, origin, **kwargs):
+    if not deletes_author(origin, instance):
+        counters.decrement(
+            CustomUser, [instance.author_id], 'subscribers_count'
+        )
+
+
+@receiver(relations_changed, sender=Subscription)
+def update_subscribers_count(action, ids, **kwargs):
+    if action == 'add':
+        counters.increment(CustomUser, ids, 'subscribers_count')
+    else:
+        counters.decrement(CustomUser, ids, 'subscribers_count')
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_subscriber_flags(instance, **kwargs):
+    transaction.on_commit(
+        lambda: recipe_response_cache.invalidate_user(instance.user_id)
+    )
+
+
+@receiver(relations_changed, sender=Subscription)
+def invalidate_changed_subscriber_flags(user_id, **kwargs):
+    transaction.on_commit(
+        lambda: recipe_response_cache.invalidate_user(user_id)
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Subscription)
+def drop_from_feed(instance, origin, **kwargs):
+    if not deletes_author(origin, instance):
+        feed.drop(instance.user_id, [instance.author_id])
+        feed.refill([instance.author_id])
+
+
+@receiver(relations_changed, sender=Subscription)
+def update_feed(action, user_id, ids, **kwargs):
+    """
+    Subscribing adds the author's latest recipes to the user's feed,
+    unsubscribing removes all of them and refills the feeds of the
+    remaining subscribers if the author is fanned out again
+    """
+    if action == 'add':
+        feed.backfill(user_id, ids)
+    else:
+        feed.drop(user_id, ids)
+        feed.refill(ids)
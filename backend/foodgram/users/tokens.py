@@ -0,0 +1,107 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class TokenCache:
+    """
+    Authentication tokens with their users, so that token authentication
+    does not query the database on every request.
+
+    Tokens are looked up in a process-local LRU, whose entries live
+    TOKEN_CACHE_LOCAL_TTL seconds, then in the shared cache backend,
+    where they live TOKEN_CACHE_TIMEOUT seconds. `invalidate` drops a
+    token from the shared cache and from the LRU of the current process,
+    other processes drop it when its local TTL expires. A process-local
+    backend (LocMemCache) cannot be cleared by other processes, so its
+    entries live TOKEN_CACHE_LOCAL_TTL seconds as well. Cache keys are
+    digests of the tokens, and every reader gets its own copy of the
+    token and the user.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # digest: (expiry time, token)
+        self._local = OrderedDict()
+
+    def key(self, token_key):
+        digest = hashlib.sha256(token_key.encode()).hexdigest()
+        return f'auth:token:{digest}'
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[1]
+
+    def _set_local(self, key, token):
+        with self._lock:
+            self._local[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL, token
+            )
+            self._local.move_to_end(key)
+            while len(self._local) > settings.TOKEN_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def timeout(self):
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            return settings.TOKEN_CACHE_LOCAL_TTL
+        return settings.TOKEN_CACHE_TIMEOUT
+
+    def _copy(self, token):
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token
+
+    def get(self, token_key):
+        key = self.key(token_key)
+        token = self._get_local(key)
+        if token is not None:
+            return self._copy(token)
+        token = cache.get(key)
+        if token is not None:
+            self._set_local(key, self._copy(token))
+        return token
+
+    async def aget(self, token_key):
+        key = self.key(token_key)
+        token = self._get_local(key)
+        if token is not None:
+            return self._copy(token)
+        token = await cache.aget(key)
+        if token is not None:
+            self._set_local(key, self._copy(token))
+        return token
+
+    def set(self, token):
+        key = self.key(token.key)
+        cache.set(key, token, self.timeout())
+        self._set_local(key, self._copy(token))
+
+    async def aset(self, token):
+        key = self.key(token.key)
+        await cache.aset(key, token, self.timeout())
+        self._set_local(key, self._copy(token))
+
+    def invalidate(self, token_key):
+        key = self.key(token_key)
+        with self._lock:
+            self._local.pop(key, None)
+        cache.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+token_cache = TokenCache()